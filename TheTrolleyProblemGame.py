@@ -17,6 +17,8 @@ def main():
     active_scene = StartScene.StartScene(pygame.display.set_mode((1700, 800)))
 
     while active_scene is not None:
+        active_scene.latency.begin_frame()
+
         # process inputs
         pressed_keys = pygame.key.get_pressed()
         active_scene.process_input(events=pygame.event.get(), pressed_keys=pressed_keys)
@@ -25,10 +27,12 @@ def main():
         active_scene.update()
 
         # render
-        active_scene.render()
-        pygame.display.flip()
+        with active_scene.latency.measure("render"):
+            active_scene.render()
+            pygame.display.flip()
+        active_scene.latency.end_frame()
 
-        # Pause
+        # Pause to the render rate, the next update runs the dynamics substeps for the elapsed time
         active_scene.clock.tick(active_scene.sim_to_real.params.fps)
 
         active_scene = active_scene.next
@@ -12,3 +12,9 @@ class ControllerBase(ABC):
     @abstractmethod
     def set_params(self, params):
         ...
+
+    def preview_speed(self, speed_cmd: float, max_accel: float):
+        """
+        Hint of the upcoming speeds, for controllers that precompute speed dependent gains.
+        """
+        pass
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 import numpy as np
 
+from control.speed_profile import SpeedProfile
 from dynamics.Vehicle import Vehicle
 from paths.PathBase import PathBase
 
@@ -15,12 +16,20 @@ class SpeedControl:
         station_setpoint: float = 18
         p: float = 0.5
         p_d: float = 1.
+        max_lat_accel: float = SpeedProfile.Params.max_lat_accel  # [m/s^2]
 
     def __init__(self, params: Params):
         self._params = params
         self.station_to_setpoint = None
         self.speed_cmd = 10.
         self.nearest_pose = None
+        self.speed_profile = SpeedProfile(SpeedProfile.Params(
+            max_lat_accel=params.max_lat_accel, max_accel=params.max_accel, max_decel=-params.min_accel,
+            min_speed=params.min_speed, max_speed=params.max_speed))
+
+    @property
+    def max_accel(self) -> float:
+        return self._params.max_accel
 
     def update(self, car: Vehicle, path: PathBase, dt) -> float:
         if not path:
@@ -35,7 +44,9 @@ class SpeedControl:
             self.station_to_setpoint = station_to_setpoint
             accel = -self._params.p * (station_to_setpoint) - self._params.p_d * station_rate
             accel = max(self._params.min_accel, min(self._params.max_accel, accel))
-            self.speed_cmd = max(self._params.min_speed, min(self._params.max_speed, self.speed_cmd + dt * accel))
+            self.speed_profile.update(path)
+            max_speed = min(self._params.max_speed, self.speed_profile.get_speed_at_station(station))
+            self.speed_cmd = max(self._params.min_speed, min(max_speed, self.speed_cmd + dt * accel))
         return self.speed_cmd
 
 
@@ -1,9 +1,11 @@
 from dataclasses import dataclass
 import numpy as np
+from typing import Sequence, Union
 
 from dynamics.CartesianDynamicBicycleModel import Vehicle
 from paths.PathBase import PathBase
 from control.ControllerBase import ControllerBase
+from paths import path_utils
 import utils.math as math
 
 
@@ -14,13 +16,14 @@ class PurePursuitControl(ControllerBase):
 
     def __init__(self, params: Params):
         self.set_params(params)
-        self.nearest_pose = math.Pose(0, 0, 0)
+        self.nearest_pose = None
         self.steer_cont = 0
-        self.lookahead_pose = math.Pose(0, 0, 0)
+        self.lookahead_pose = None
         self.lookahead_dist = 0
         self.alpha = 0
         self.radius = 0
         self.car_rear_axle = None
+        self.steer_cont_batch = None
 
     def set_params(self, params: Params):
         self.params = params
@@ -42,3 +45,41 @@ class PurePursuitControl(ControllerBase):
             self.radius = self.lookahead_dist/(2*np.sin(self.alpha))
             self.steer_cont = np.arctan((car.params.lf + car.params.lr) / self.radius)
         return min(0.7, max(-0.7, self.steer_cont))
+
+    def update_batch(self, states: np.ndarray, car_params: Union[Vehicle.Params, Vehicle.BatchParams],
+                     paths: Union[PathBase, Sequence[PathBase]]) -> np.ndarray:
+        """
+        Steering commands of N vehicles at once, numerically the same as update on each vehicle.
+
+        Args:
+            states (np.ndarray): [N, n] states at the cog in the Vehicle.State.Idx layout.
+            car_params (Vehicle.BatchParams): per-vehicle params as (N,) columns, or one Vehicle.Params shared by all.
+            paths (Union[PathBase, Sequence[PathBase]]): one path shared by all vehicles, or one path per vehicle.
+
+        Returns:
+            np.ndarray: [N] tire angle commands, vehicles without a path hold their last command.
+        """
+        idx = Vehicle.State.Idx
+        theta = states[:, idx.THETA]
+        cos_theta = np.cos(theta)
+        sin_theta = np.sin(theta)
+        rear_axle = np.stack((states[:, idx.X] - car_params.lr * cos_theta,
+                              states[:, idx.Y] - car_params.lr * sin_theta), axis=1)
+        _, stations = path_utils.get_nearest_pose_array(paths, rear_axle)
+        lookahead_poses = path_utils.get_pose_array_at_station(
+            paths, stations + states[:, idx.VX] * self.params.lookahead_k)
+
+        # lookahead point in the car frame
+        dx = lookahead_poses[:, 0] - rear_axle[:, 0]
+        dy = lookahead_poses[:, 1] - rear_axle[:, 1]
+        alpha = np.arctan2(-sin_theta * dx + cos_theta * dy, cos_theta * dx + sin_theta * dy)
+        lookahead_dist = np.sqrt(dx ** 2 + dy ** 2)
+
+        with np.errstate(divide="ignore"):
+            radius = lookahead_dist / (2 * np.sin(alpha))
+        steer_cont = np.arctan((car_params.lf + car_params.lr) / radius)
+
+        if self.steer_cont_batch is None or len(self.steer_cont_batch) != len(states):
+            self.steer_cont_batch = np.zeros(len(states))
+        self.steer_cont_batch = np.where(np.isnan(steer_cont), self.steer_cont_batch, steer_cont)
+        return np.clip(self.steer_cont_batch, -0.7, 0.7)
@@ -1,5 +1,6 @@
 import numpy as np
 from dataclasses import dataclass
+from typing import Sequence, Union
 
 from dynamics.CartesianDynamicBicycleModel import Vehicle
 from paths.PathBase import PathBase
@@ -22,6 +23,7 @@ class StanleyControl(ControllerBase):
         self.cte = None
         self.path_unit_normal = None
         self.theta_e = None
+        self.steer_cont_batch = None
 
     def set_params(self, params: Params):
         self.params = params
@@ -37,3 +39,31 @@ class StanleyControl(ControllerBase):
             self.cte = path_utils.get_cross_err(self.nearest_pose, self.car_front_axle)
             self.steer_cont = -self.theta_e + np.arctan2(-self.params.k*self.cte, car.state_cog.vx + 0.1)
         return min(0.7, max(-0.7, self.steer_cont))
+
+    def update_batch(self, states: np.ndarray, car_params: Union[Vehicle.Params, Vehicle.BatchParams],
+                     paths: Union[PathBase, Sequence[PathBase]]) -> np.ndarray:
+        """
+        Steering commands of N vehicles at once, numerically the same as update on each vehicle.
+
+        Args:
+            states (np.ndarray): [N, n] states at the cog in the Vehicle.State.Idx layout.
+            car_params (Vehicle.BatchParams): per-vehicle params as (N,) columns, or one Vehicle.Params shared by all.
+            paths (Union[PathBase, Sequence[PathBase]]): one path shared by all vehicles, or one path per vehicle.
+
+        Returns:
+            np.ndarray: [N] tire angle commands, vehicles without a path hold their last command.
+        """
+        idx = Vehicle.State.Idx
+        theta = states[:, idx.THETA]
+        front_axle = np.stack((states[:, idx.X] + car_params.lf * np.cos(theta),
+                               states[:, idx.Y] + car_params.lf * np.sin(theta)), axis=1)
+        nearest_poses, _ = path_utils.get_nearest_pose_array(paths, front_axle)
+
+        theta_e = math.pi_2_pi(theta - nearest_poses[:, 2])
+        cte = path_utils.get_cross_err_array(nearest_poses, front_axle)
+        steer_cont = -theta_e + np.arctan2(-self.params.k * cte, states[:, idx.VX] + 0.1)
+
+        if self.steer_cont_batch is None or len(self.steer_cont_batch) != len(states):
+            self.steer_cont_batch = np.zeros(len(states))
+        self.steer_cont_batch = np.where(np.isnan(steer_cont), self.steer_cont_batch, steer_cont)
+        return np.clip(self.steer_cont_batch, -0.7, 0.7)
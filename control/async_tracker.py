@@ -0,0 +1,116 @@
+import copy
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass
+from typing import Optional
+
+from control.ControllerBase import ControllerBase
+from dynamics.Vehicle import Vehicle
+from paths.PathBase import PathBase
+from paths.path_query import PathQuery
+from utils import math
+
+
+class AsyncPathTracker(ControllerBase):
+    """
+    Runs the update of a path tracker on a worker thread and waits for it at most deadline_ms.
+
+    When the deadline is missed the tracker keeps running in the background, and the last good command is returned,
+    extrapolated along the distance driven since it was computed with the steer change per meter between the last two
+    good commands. A late result becomes the new last good command on the first update after it finishes, new updates
+    are only started once the tracker is idle. The tracker gets snapshots of the vehicle and the path, since both are
+updated in place while it runs, and speed previews are held back until it is idle.
+
+    Attributes other than the ControllerBase interface (e.g. draw of a sprite) are forwarded to the tracker.
+    """
+
+    @dataclass
+    class Params:
+        deadline_ms: float = 4.0
+        max_extrapolation_m: float = 2.0  # the command is held beyond this distance from where it was computed
+
+    def __init__(self, tracker: ControllerBase, params: Params):
+        self.tracker = tracker
+        self.params = params
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="async-tracker")
+        self._pending: Optional[Future] = None
+        self._preview: Optional[tuple] = None  # latest speed preview while the tracker is busy
+
+        # last two good commands with the vehicle poses they were computed at, latest last
+        self._commands = []
+        self.n_updates = 0
+        self.n_deadline_misses = 0
+        self.missed_deadline = False
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the wrapper itself
+        return getattr(self.tracker, name)
+
+    def update(self, car: Vehicle, path: PathBase) -> float:
+        self.n_updates += 1
+        if self._pending is not None and self._pending.done():
+            self._collect()
+
+        self.missed_deadline = True
+        if self._pending is None:
+            snapshot = car.copy()
+            path = copy.copy(path)
+            if isinstance(path, PathQuery):
+                path.car = snapshot
+            self._pending = self._executor.submit(self._run, snapshot, path, snapshot.pose)
+            try:
+                self._pending.result(timeout=1e-3 * self.params.deadline_ms)
+                self._collect()
+                self.missed_deadline = False
+            except TimeoutError:
+                pass
+        if self.missed_deadline:
+            self.n_deadline_misses += 1
+        return self._extrapolate(car)
+
+    def wait(self):
+        """
+        Blocks until the tracker is idle, e.g. before it is updated without the wrapper again.
+        """
+        if self._pending is not None:
+            self._collect()
+
+    def _run(self, car: Vehicle, path: PathBase, pose: math.Pose):
+        return self.tracker.update(car, path), pose
+
+    def _collect(self):
+        future, self._pending = self._pending, None
+        try:
+            self._commands = self._commands[-1:] + [future.result()]
+        finally:
+            if self._preview is not None:
+                preview, self._preview = self._preview, None
+                self.tracker.preview_speed(*preview)
+
+    def _extrapolate(self, car: Vehicle) -> float:
+        if not self._commands:
+            return car.state_cog.delta
+        delta, pose = self._commands[-1]
+        if len(self._commands) < 2:
+            return delta
+
+        delta_prev, pose_prev = self._commands[0]
+        ds_prev = math.distance(pose_prev, pose)
+        if ds_prev < 1e-3:
+            return delta
+        ds = min(math.distance(pose, car.pose), self.params.max_extrapolation_m)
+        delta_max = car.params.delta_max
+        return float(np.clip(delta + (delta - delta_prev) / ds_prev * ds, -delta_max, delta_max))
+
+    @property
+    def miss_ratio(self) -> float:
+        return self.n_deadline_misses / self.n_updates if self.n_updates else 0.0
+
+    def set_params(self, params):
+        self.tracker.set_params(params)
+
+    def preview_speed(self, speed_cmd: float, max_accel: float):
+        if self._pending is not None:
+            self._preview = speed_cmd, max_accel
+        else:
+            self.tracker.preview_speed(speed_cmd, max_accel)
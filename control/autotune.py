@@ -0,0 +1,343 @@
+import copy
+import enum
+import itertools
+import re
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple, Type
+
+from control.ControllerBase import ControllerBase
+from control.LowLevelControl import SpeedControl, SteerControl
+from dynamics.CartesianDynamicBicycleModel import CartesianDynamicBicycleModel
+from dynamics.motion_model_base import MotionModel
+from dynamics.Vehicle import Vehicle
+from paths.BSpline import BSplinePath
+from paths.path_generator import PathAutoGenerator
+from paths.path_query import PathQuery
+from paths import path_utils
+from utils import math
+from utils.pgutils.pgutils import SimToReal
+from utils.scheduler import MultiRateScheduler
+
+
+@dataclass
+class RolloutConfig:
+    """
+    Headless closed-loop scenario, set up like the sandbox: the auto generated path scrolls ahead of the vehicle.
+    """
+    duration_s: float = 20.0
+    settle_s: float = 2.0  # initial transient, not scored [s]
+    scroll_speed_mps: float = 14.0
+    screen_size: Tuple[int, int] = (1700, 800)
+    pxl_per_meter: float = 40
+    path: PathAutoGenerator.Params = field(default_factory=PathAutoGenerator.Params)
+    scheduler: MultiRateScheduler.Params = field(default_factory=MultiRateScheduler.Params)
+    vehicle: Vehicle.Params = field(default_factory=Vehicle.Params)
+    motion_model: Type[MotionModel] = CartesianDynamicBicycleModel
+    max_cte: float = 10.0  # the rollout is stopped as diverged past this cross track error [m]
+
+
+@dataclass
+class CostWeights:
+    cte: float = 1.0  # per rms cross track error [m]
+    yaw: float = 2.0  # per rms yaw error [rad]
+    steer_rate: float = 0.05  # per rms tire angle rate [rad/s]
+    diverged: float = 1e3
+
+
+@dataclass
+class RolloutResult:
+    cost: float
+    cte_rms: float
+    yaw_rms: float
+    steer_rate_rms: float
+    n_steps: int
+    diverged: bool
+
+
+def run_rollout(controller_type: Type[ControllerBase], params, config: RolloutConfig,
+                weights: CostWeights) -> RolloutResult:
+    """
+    Drive one closed-loop scenario and score it, the fixed update is the one of the scenes.
+    """
+    width, height = config.screen_size
+    sim_to_real = SimToReal(
+        SimToReal.Params(
+            pxl_per_meter=config.pxl_per_meter,
+            screen_ref_frame_rel_real=math.Pose(0, height / (2 * config.pxl_per_meter), 0),
+            fps=60,
+            sim_time_rel_real=1,
+            scheduler=config.scheduler,
+        )
+    )
+    scheduler = sim_to_real.scheduler
+    path_generator = PathAutoGenerator(copy.deepcopy(config.path), sim_to_real, width, height)
+    path = BSplinePath([], 11, 3, 0, 4)
+    car = (
+        Vehicle(params=copy.deepcopy(config.vehicle))
+        .build_pose(sim_to_real.get_real_from_sim(math.Pose(width / 4, height / 2, 0)))
+        .build_vel(10, 0)
+    )
+    motion_model = config.motion_model()
+    control = controller_type(copy.deepcopy(params))
+    speed_control = SpeedControl(SpeedControl.Params())
+    steer_control = SteerControl(SteerControl.Params())
+
+    steer_desired = car.state_cog.delta
+    steer_rate = car.state_cog.delta_rate
+    vel = car.state_cog.vx
+    n_steps = int(round(config.duration_s / scheduler.dynamics_dt))
+    n_settle = int(round(config.settle_s / scheduler.dynamics_dt))
+    errors = np.zeros((n_steps, 3))
+    tracked = np.zeros(n_steps, dtype=bool)  # steps with a nearest pose, the others are not scored
+    diverged = False
+    n_done = 0
+    while n_done < n_steps and not diverged:
+        # one dynamics step per frame, so that the catch up budget of the scheduler never drops time
+        for tick in scheduler.advance(scheduler.dynamics_dt):
+            sim_to_real.update()
+            motion_model.update(car, steer_rate, steer_desired, vel, tick.dt)
+
+            if tick.run_tracker:
+                path = path_generator.update(path, sim_to_real.time_s)
+            query = PathQuery(path, car)
+            if tick.run_tracker:
+                steer_desired = control.update(car, query)
+            if tick.run_low_level:
+                steer_rate = steer_control.update(car, steer_desired, scheduler.low_level_dt)
+                vel = speed_control.update(car, query, scheduler.low_level_dt)
+                control.preview_speed(vel, speed_control.max_accel)
+            sim_to_real.params.screen_ref_frame_rel_real.x += config.scroll_speed_mps * tick.dt
+
+            nearest_pose, _ = query.get_nearest_pose(car.pose)
+            if nearest_pose is not None:
+                cte = path_utils.get_cross_err(nearest_pose, car.pose)
+                yaw_err = math.pi_2_pi(car.pose.theta - nearest_pose.theta)
+                errors[n_done] = cte, yaw_err, car.state_cog.delta_rate
+                tracked[n_done] = True
+                # the path is still being generated ahead of the vehicle during the transient
+                diverged = n_done >= n_settle and not abs(cte) <= config.max_cte
+            n_done += 1
+
+    scored = slice(min(n_settle, n_done - 1), n_done)
+    errors = errors[scored][tracked[scored]]
+    if not len(errors):
+        # never on the path, as bad as diverging at the start
+        return RolloutResult(float(weights.diverged), float("nan"), float("nan"), float("nan"), n_done, True)
+    cte_rms, yaw_rms, steer_rate_rms = np.sqrt(np.mean(errors ** 2, axis=0))
+    cost = weights.cte * cte_rms + weights.yaw * yaw_rms + weights.steer_rate * steer_rate_rms
+    if diverged:
+        # earlier divergence costs more
+        cost += weights.diverged * (1.0 - n_done / n_steps)
+    return RolloutResult(float(cost), float(cte_rms), float(yaw_rms), float(steer_rate_rms), n_done, diverged)
+
+
+@dataclass
+class Dimension:
+    """
+    Tuned parameter, name is a field of the Params dataclass or an element of an array field, e.g. "Q[0,0]".
+    """
+    name: str
+    low: float
+    high: float
+    log: bool = False
+
+    def to_unit(self, val: float) -> float:
+        if self.log:
+            return (np.log(val) - np.log(self.low)) / (np.log(self.high) - np.log(self.low))
+        return (val - self.low) / (self.high - self.low)
+
+    def from_unit(self, u: float) -> float:
+        u = min(1.0, max(0.0, u))
+        if self.log:
+            return float(np.exp(np.log(self.low) + u * (np.log(self.high) - np.log(self.low))))
+        return float(self.low + u * (self.high - self.low))
+
+
+_ELEMENT_RE = re.compile(r"^(\w+)\[(\d+)\s*,\s*(\d+)\]$")
+
+
+def apply_values(params, dims: Sequence[Dimension], values: Sequence[float]):
+    """
+    Write tuned values into params in place.
+    """
+    for dim, val in zip(dims, values):
+        element = _ELEMENT_RE.match(dim.name)
+        if element:
+            name, row, col = element.group(1), int(element.group(2)), int(element.group(3))
+            getattr(params, name)[row, col] = val
+        else:
+            setattr(params, dim.name, val)
+    return params
+
+
+def _evaluate(controller_type, base_params, dims, values, config, weights) -> RolloutResult:
+    params = apply_values(copy.deepcopy(base_params), dims, values)
+    return run_rollout(controller_type, params, config, weights)
+
+
+@dataclass
+class Candidate:
+    values: List[float]
+    cost: float
+    results: List[RolloutResult]
+
+
+@dataclass
+class TuneResult:
+    best_params: object
+    best: Candidate
+    candidates: List[Candidate]
+    n_rollouts: int
+    wall_time_s: float
+    n_workers: int
+
+    @property
+    def rollouts_per_s_per_core(self) -> float:
+        return self.n_rollouts / self.wall_time_s / max(1, self.n_workers)
+
+    def write_back(self, params, dims: Sequence[Dimension]):
+        """
+        Write the best values into params in place, e.g. the Params of a running controller.
+        """
+        return apply_values(params, dims, self.best.values)
+
+
+class AutoTuner:
+    """
+    Tunes controller Params on headless closed-loop rollouts run in a process pool. Every candidate is scored by its
+    mean cost over all scenarios.
+
+    The search is a grid, uniform random samples, or a CMA-style evolution strategy with a diagonal covariance: the
+    mean and per-dimension spread of each generation are re-estimated from its best candidates.
+    """
+
+    class Method(enum.Enum):
+        grid = 0
+        random = 1
+        cma = 2
+
+    @dataclass
+    class Params:
+        method: "AutoTuner.Method" = None
+        n_candidates: int = 64  # total candidates, the grid uses the nearest whole number per dimension
+        population: int = 16  # candidates per generation of the cma search
+        n_workers: int = 0  # 0 runs the rollouts inline
+        seed: int = 0
+
+        def __post_init__(self):
+            if self.method is None:
+                self.method = AutoTuner.Method.random
+
+    def __init__(self, params: Params, scenarios: Optional[List[RolloutConfig]] = None,
+                 weights: Optional[CostWeights] = None):
+        self.params = params
+        self.scenarios = scenarios or [RolloutConfig()]
+        self.weights = weights or CostWeights()
+
+    def tune(self, controller_type: Type[ControllerBase], base_params, dims: Sequence[Dimension]) -> TuneResult:
+        start_time = time.perf_counter()
+        rng = np.random.default_rng(self.params.seed)
+        candidates: List[Candidate] = []
+
+        executor = ProcessPoolExecutor(self.params.n_workers) if self.params.n_workers > 0 else None
+        try:
+            def evaluate(unit_points: np.ndarray) -> List[Candidate]:
+                values = [[dim.from_unit(u) for dim, u in zip(dims, point)] for point in unit_points]
+                tasks = [(controller_type, base_params, dims, vals, scenario, self.weights)
+                         for vals in values for scenario in self.scenarios]
+                if executor is None:
+                    results = [_evaluate(*task) for task in tasks]
+                else:
+                    results = list(executor.map(_evaluate, *zip(*tasks)))
+                n_scenarios = len(self.scenarios)
+                new = [Candidate(vals, float(np.mean([r.cost for r in results[i:i + n_scenarios]])),
+                                 results[i:i + n_scenarios])
+                       for vals, i in zip(values, range(0, len(results), n_scenarios))]
+                candidates.extend(new)
+                return new
+
+            if self.params.method is AutoTuner.Method.grid:
+                n_per_dim = max(1, int(round(self.params.n_candidates ** (1.0 / len(dims)))))
+                axis = np.linspace(0.0, 1.0, n_per_dim) if n_per_dim > 1 else np.array([0.5])
+                evaluate(np.array(list(itertools.product(axis, repeat=len(dims)))))
+            elif self.params.method is AutoTuner.Method.random:
+                evaluate(rng.random((self.params.n_candidates, len(dims))))
+            else:
+                self._cma(evaluate, len(dims), rng)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        best = min(candidates, key=lambda candidate: candidate.cost)
+        return TuneResult(
+            best_params=apply_values(copy.deepcopy(base_params), dims, best.values),
+            best=best,
+            candidates=candidates,
+            n_rollouts=len(candidates) * len(self.scenarios),
+            wall_time_s=time.perf_counter() - start_time,
+            n_workers=max(1, self.params.n_workers),
+        )
+
+    def _cma(self, evaluate, n_dims: int, rng: np.random.Generator):
+        population = max(4, self.params.population)
+        n_elite = population // 2
+        # log weights of the elite, as in CMA-ES
+        elite_weights = np.log(n_elite + 0.5) - np.log(np.arange(1, n_elite + 1))
+        elite_weights /= elite_weights.sum()
+        mean = np.full(n_dims, 0.5)
+        sigma = np.full(n_dims, 0.3)
+
+        n_generations = max(1, self.params.n_candidates // population)
+        for _ in range(n_generations):
+            points = np.clip(mean + sigma * rng.standard_normal((population, n_dims)), 0.0, 1.0)
+            new = evaluate(points)
+            elite = points[np.argsort([candidate.cost for candidate in new])[:n_elite]]
+            spread = np.sqrt(elite_weights @ (elite - mean) ** 2)
+            mean = elite_weights @ elite
+            # smoothed so that one lucky generation does not collapse the search
+            sigma = np.maximum(0.5 * sigma + 0.5 * spread, 1e-3)
+
+
+def main():
+    import argparse
+    from control.StanleyControl import StanleyControl
+    from control.PurePursuitControl import PurePursuitControl
+    from control.lqr_path_tracker import LQRPathTrackerBase, KinematicLQRPathTracker, DynamicLQRPathTracker
+
+    lqr_Q = np.zeros((4, 4))
+    lqr_Q[0, 0] = 0.1
+    lqr_params = LQRPathTrackerBase.Params(Q=lqr_Q, R=5.0 * np.ones((1, 1)),
+                                           dt=MultiRateScheduler(RolloutConfig().scheduler).tracker_dt)
+    lqr_dims = [Dimension("Q[0,0]", 1e-3, 10.0, log=True), Dimension("Q[2,2]", 1e-3, 10.0, log=True),
+                Dimension("R[0,0]", 0.1, 100.0, log=True)]
+    problems = {
+        "stanley": (StanleyControl, StanleyControl.Params(k=2.0), [Dimension("k", 0.1, 20.0, log=True)]),
+        "pure_pursuit": (PurePursuitControl, PurePursuitControl.Params(lookahead_k=0.4),
+                         [Dimension("lookahead_k", 0.05, 2.0, log=True)]),
+        "kinematic_lqr": (KinematicLQRPathTracker, lqr_params, lqr_dims),
+        "dynamic_lqr": (DynamicLQRPathTracker, lqr_params, lqr_dims),
+    }
+
+    parser = argparse.ArgumentParser(description="Tune path tracker gains on headless closed-loop rollouts")
+    parser.add_argument("controller", choices=list(problems))
+    parser.add_argument("--method", choices=[m.name for m in AutoTuner.Method], default="cma")
+    parser.add_argument("--candidates", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    controller_type, base_params, dims = problems[args.controller]
+
+    scenarios = [RolloutConfig(path=PathAutoGenerator.Params(sin_period=period, sin_height=height))
+                 for period, height in [(4.0, 0.4), (3.0, 0.5), (2.0, 0.3)]]
+    tuner = AutoTuner(AutoTuner.Params(method=AutoTuner.Method[args.method], n_candidates=args.candidates,
+                                       n_workers=args.workers), scenarios)
+    result = tuner.tune(controller_type, base_params, dims)
+    print("best {} cost {:.3f}".format(result.best_params, result.best.cost))
+    print("{} rollouts in {:.1f} s, {:.2f} rollouts/s/core".format(
+        result.n_rollouts, result.wall_time_s, result.rollouts_per_s_per_core))
+
+
+if __name__ == "__main__":
+    main()
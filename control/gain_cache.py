@@ -0,0 +1,119 @@
+import os
+import hashlib
+import zipfile
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+def _default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "thetrolleyproblemgame", "lqr")
+
+
+class GainCache:
+    """
+    Content addressed on-disk cache of Riccati solutions, one compressed .npz per key, so that gain tables of equal
+    problems are solved once across runs.
+
+    Entries are only read when a key is requested. Reads refresh the modification time of the entry, and the least
+    recently used entries are deleted whenever the cache grows past max_bytes. A missing, unreadable or corrupt entry
+    is a cache miss, never an error.
+    """
+
+    # bump whenever the solvers change their results, so that stale solutions are never loaded
+    _FORMAT_VERSION = 2
+
+    @dataclass
+    class Params:
+        cache_dir: str = field(default_factory=_default_cache_dir)
+        max_bytes: int = 16 * 1024 ** 2
+
+    def __init__(self, params: Params):
+        self.params = params
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def key(cls, model_type: str, A: np.ndarray, B: np.ndarray, Q: np.ndarray, R: np.ndarray, dt: float) -> str:
+        """
+        Hash of the problem, A and B are the stacked [n_points, n, n] and [n_points, n, m] systems of a gain table.
+        """
+        digest = hashlib.sha1("{}:{}:{!r}".format(cls._FORMAT_VERSION, model_type, float(dt)).encode())
+        for arr in (A, B, Q, R):
+            arr = np.ascontiguousarray(arr, dtype=np.float64)
+            digest.update(str(arr.shape).encode())
+            digest.update(arr.tobytes())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        file_path = self._path(key)
+        try:
+            with np.load(file_path) as data:
+                gains = data["gains"]
+            os.utime(file_path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            self.misses += 1
+            self._remove(file_path)
+            return None
+        self.hits += 1
+        return gains
+
+    def store(self, key: str, gains: np.ndarray):
+        file_path = self._path(key)
+        # written next to the entry and renamed, so a concurrent reader never sees a partial file
+        tmp_path = "{}.{}.tmp.npz".format(file_path[:-len(".npz")], os.getpid())
+        try:
+            os.makedirs(self.params.cache_dir, exist_ok=True)
+            np.savez_compressed(tmp_path, gains=gains)
+            os.replace(tmp_path, file_path)
+        except OSError:
+            self._remove(tmp_path)
+            return
+        self._evict()
+
+    def size_bytes(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def clear(self):
+        for file_path, _, _ in self._entries():
+            self._remove(file_path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.params.cache_dir, key + ".npz")
+
+    def _entries(self):
+        try:
+            names = os.listdir(self.params.cache_dir)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith(".npz") or name.endswith(".tmp.npz"):
+                continue
+            file_path = os.path.join(self.params.cache_dir, name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            entries.append((file_path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for file_path, _, size in entries:
+            if total <= self.params.max_bytes:
+                break
+            self._remove(file_path)
+            total -= size
+
+    @staticmethod
+    def _remove(file_path: str):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
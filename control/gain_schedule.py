@@ -0,0 +1,130 @@
+import threading
+import numpy as np
+from typing import List, Optional
+
+from control.riccati import RiccatiSolveInfo
+
+
+class GainSchedule:
+    """
+    Feedback gains K(v) precomputed over a uniform speed grid and linearly interpolated at runtime, so that a speed
+    change never triggers a Riccati solve inside the control loop and the gain is continuous in the speed.
+
+    Speeds outside [v_min, v_max] use the gain at the closest end of the grid.
+    """
+
+    def __init__(self, speeds: np.ndarray, gains: np.ndarray, build_time_ms: float = 0.0,
+                 solve_infos: Optional[List[RiccatiSolveInfo]] = None):
+        """
+        Args:
+            speeds (np.ndarray): [n_points] uniformly spaced speeds [m/s], n_points at least 2.
+            gains (np.ndarray): [n_points, m, n] gains at the speeds.
+            build_time_ms (float): time it took to solve or load the gains.
+            solve_infos (Optional[List[RiccatiSolveInfo]]): telemetry of the solve at each speed, empty if the gains
+                were loaded.
+        """
+        self.speeds = speeds
+        self.gains = gains
+        self.build_time_ms = build_time_ms
+        self.solve_infos = solve_infos or []
+
+        self._v_min = float(speeds[0])
+        self._v_max = float(speeds[-1])
+        self._inv_spacing = (len(speeds) - 1) / (self._v_max - self._v_min)
+
+    @property
+    def n_points(self) -> int:
+        return len(self.speeds)
+
+    @property
+    def converged(self) -> bool:
+        return all(info.converged for info in self.solve_infos)
+
+    @property
+    def max_residual(self) -> float:
+        return max((info.residual for info in self.solve_infos), default=0.0)
+
+    @property
+    def size_bytes(self) -> int:
+        return self.speeds.nbytes + self.gains.nbytes
+
+    def gain(self, v: float) -> np.ndarray:
+        """
+        [m, n] gain at speed v [m/s], O(1) in the size of the table.
+        """
+        t = (min(max(v, self._v_min), self._v_max) - self._v_min) * self._inv_spacing
+        idx = min(int(t), len(self.speeds) - 2)
+        w = t - idx
+        return (1.0 - w) * self.gains[idx] + w * self.gains[idx + 1]
+
+    def __repr__(self):
+        return "GainSchedule({} speeds in [{:.1f}, {:.1f}] m/s, {:.1f} kB, built in {:.1f} ms)".format(
+            self.n_points, self._v_min, self._v_max, self.size_bytes / 1024, self.build_time_ms)
+
+
+class GainStore:
+    """
+    Thread-safe gain table over the speed grid of a GainSchedule that is filled one speed at a time, e.g. by a
+    background worker, while the control loop reads from it.
+
+    Lookups interpolate between solved neighbours and otherwise fall back to the gain at the closest solved speed.
+    """
+
+    def __init__(self, speeds: np.ndarray, gain_shape: tuple):
+        self.speeds = speeds
+        self._gains = np.zeros((len(speeds),) + gain_shape)
+        self._solved = np.zeros(len(speeds), dtype=bool)
+        self._solve_infos: List[Optional[RiccatiSolveInfo]] = [None] * len(speeds)
+        self._lock = threading.Lock()
+        self._inv_spacing = (len(speeds) - 1) / (speeds[-1] - speeds[0])
+
+    @property
+    def complete(self) -> bool:
+        return bool(self._solved.all())
+
+    @property
+    def n_solved(self) -> int:
+        return int(np.count_nonzero(self._solved))
+
+    def unsolved(self) -> np.ndarray:
+        with self._lock:
+            return np.flatnonzero(~self._solved)
+
+    def publish(self, idx: int, gain: np.ndarray, solve_info: Optional[RiccatiSolveInfo] = None):
+        with self._lock:
+            self._gains[idx] = gain
+            self._solve_infos[idx] = solve_info
+            self._solved[idx] = True
+
+    def publish_all(self, gains: np.ndarray):
+        with self._lock:
+            self._gains[:] = gains
+            self._solved[:] = True
+
+    def nearest_solved(self, idx: int) -> Optional[np.ndarray]:
+        """
+        Gain at the solved speed closest to speeds[idx], None if nothing is solved yet.
+        """
+        with self._lock:
+            solved = np.flatnonzero(self._solved)
+            if not len(solved):
+                return None
+            return self._gains[solved[np.argmin(np.abs(solved - idx))]].copy()
+
+    def index(self, v: float) -> int:
+        t = (min(max(v, self.speeds[0]), self.speeds[-1]) - self.speeds[0]) * self._inv_spacing
+        return int(round(t))
+
+    def gain(self, v: float) -> Optional[np.ndarray]:
+        t = (min(max(v, self.speeds[0]), self.speeds[-1]) - self.speeds[0]) * self._inv_spacing
+        idx = min(int(t), len(self.speeds) - 2)
+        w = t - idx
+        with self._lock:
+            if self._solved[idx] and self._solved[idx + 1]:
+                return (1.0 - w) * self._gains[idx] + w * self._gains[idx + 1]
+        return self.nearest_solved(int(round(t)))
+
+    def to_schedule(self, build_time_ms: float) -> GainSchedule:
+        with self._lock:
+            solve_infos = [info for info in self._solve_infos if info is not None]
+            return GainSchedule(self.speeds, self._gains.copy(), build_time_ms, solve_infos)
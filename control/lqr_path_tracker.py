@@ -2,11 +2,21 @@ import time
 import scipy.linalg as la
 import math
 import numpy as np
-from dataclasses import dataclass
-from functools import lru_cache
+from dataclasses import dataclass, astuple
 from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from typing import List, Optional, Tuple
 
 from control.ControllerBase import ControllerBase
+from control.gain_cache import GainCache
+from control.gain_schedule import GainStore
+from control.riccati import (
+    RiccatiSolveInfo,
+    solve_dare,
+    solve_care,
+    solve_dare_sda_batch,
+    solve_care_batch,
+)
 from paths.PathBase import PathBase
 from paths import path_utils
 from dynamics.Vehicle import Vehicle
@@ -18,73 +28,80 @@ def pi_2_pi(angle):
     return (angle + np.pi) % (2 * np.pi) - np.pi
 
 
-def solve_DARE(A, B, Q, R):
-    """
-    solve a discrete time_Algebraic Riccati equation (DARE)
-    """
-
-    X = Q
-    maxiter = 150
-    eps = 0.01
-
-    iter = 0
-    for i in range(maxiter):
-        iter += 1
-        Xn = A.T @ X @ A - A.T @ X @ B @ \
-             la.inv(R + B.T @ X @ B) @ B.T @ X @ A + Q
-        if (abs(Xn - X)).max() < eps:
-            break
-        X = Xn
-
-    print("iter: {}".format(iter))
-    np.set_printoptions(suppress=True)
-    return Xn
-
-
-@lru_cache
-def dlqr(A, B, Q, R):
+def dlqr(A, B, Q, R, K_init=None):
     """Solve the discrete time lqr controller.
     x[k+1] = A x[k] + B u[k]
     cost = sum x[k].T*Q*x[k] + u[k].T*R*u[k]
     # ref Bertsekas, p.151
+    K_init is an optional warm start, e.g. the gain at the closest solved speed.
     """
 
-    A = np.array(A)
-    B = np.array(B)
-    Q = np.array(Q)
-    R = np.array(R)
-
     # first, try to solve the ricatti equation
-    X = solve_DARE(A, B, Q, R)
-    # X1 = la.solve_discrete_are(A, B, Q, R)
-    # print(X - X1)
-
-    # compute the LQR gain
-    K = la.inv(B.T @ X @ B + R) @ (B.T @ X @ A)
-
-    # TODO time this
-    # eigVals, eigVecs = la.eig(A - B @ K)
+    X, info = solve_dare(A, B, Q, R, K_init)
 
-    return K, X
+    # compute the LQR gain, closed-loop poles over the speed range are in stability_map
+    K = la.solve(B.T @ X @ B + R, B.T @ X @ A, assume_a="sym")
 
-@lru_cache
-def lqr(A, B, Q, R):
+    return K, X, info
 
-    A = np.array(A)
-    B = np.array(B)
-    Q = np.array(Q)
-    R = np.array(R)
 
-    S = la.solve_continuous_are(A, B, Q, R)
-    K = la.inv(R) @ B.T @ S
-    return K
+def lqr(A, B, Q, R, K_init=None):
+    S, info = solve_care(A, B, Q, R, K_init)
+    K = la.solve(R, B.T @ S, assume_a="sym")
+    return K, info
 
 
-def arr_to_tuple_2d(X):
-    return tuple(tuple(x) for x in X)
+def dynamic_error_model(speeds: np.ndarray, car_params: Vehicle.Params) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Lateral error dynamics x_dot = A x + B delta + E curv of the states [e1, e1_dot, e2, e2_dot] at the cog, with the
+    cornering stiffness of each axle, at the [N] speeds. Returns [N, 4, 4] A, [N, 4] B and [N, 4] E.
+    ref Rajamani, Vehicle Dynamics and Control, eq. 2.45
+    """
+    cr = car_params.cr
+    cf = car_params.cf
+    lr = car_params.lr
+    lf = car_params.lf
+    m = car_params.m
+    Iz = car_params.Iz
+    vx = np.asarray(speeds, dtype=float)
+    A = np.zeros((len(vx), 4, 4))
+    A[:, 0, 1] = 1.0
+    A[:, 1, 1] = -(cf + cr)/(m*vx)
+    A[:, 1, 2] = (cf + cr)/m
+    A[:, 1, 3] = (-cf*lf + cr*lr)/(m*vx)
+    A[:, 2, 3] = 1.0
+    A[:, 3, 1] = -(cf*lf - cr*lr) / (Iz * vx)
+    A[:, 3, 2] = (cf*lf - cr*lr) / Iz
+    A[:, 3, 3] = -(cf * lf**2 + cr * lr**2) / (Iz * vx)
+    B = np.zeros((len(vx), 4))
+    B[:, 1] = cf/m
+    B[:, 3] = cf * lf / Iz
+    # desired yaw rate vx * curv enters as a disturbance
+    E = np.zeros((len(vx), 4))
+    E[:, 1] = (-(cf*lf - cr*lr)/(m*vx) - vx) * vx
+    E[:, 3] = -(cf * lf**2 + cr * lr**2) / Iz
+    return A, B, E
+
+
+def understeer_gradient(car_params: Vehicle.Params) -> float:
+    """
+    Kv [rad/(m/s^2)] of the steady state tire angle wb * curv + Kv * vx^2 * curv.
+    ref Rajamani, Vehicle Dynamics and Control
+    """
+    wb = car_params.wheel_base
+    return car_params.m / wb * (car_params.lr / car_params.cf - car_params.lf / car_params.cr)
 
 
 class LQRPathTrackerBase(ControllerBase, ABC):
+    # speed grid [m/s] of the gain schedule, speeds outside of it use the gain at the closest end
+    SCHEDULE_V_MIN = 0.5
+    SCHEDULE_V_MAX = 30.0
+    SCHEDULE_N_POINTS = 60
+    # how far ahead upcoming speeds are predicted from the speed command [s]
+    PREVIEW_HORIZON_S = 2.0
+    # the gains are those of the discrete time error dynamics, else of the continuous time ones
+    DISCRETE = True
+
     @dataclass
     class Params:
         Q: np.ndarray
@@ -95,8 +112,17 @@ class LQRPathTrackerBase(ControllerBase, ABC):
             # TODO add checks
             assert np.all(np.linalg.eigvals(self.Q) >= 0)
 
-    def __init__(self, params: Params):
+    def __init__(self, params: Params, gain_cache: Optional[GainCache] = None, executor: Optional[Executor] = None):
+        """
+        Args:
+            params (Params): weights and sample time.
+            gain_cache (Optional[GainCache]): on-disk cache of solved gain tables.
+            executor (Optional[Executor]): worker that fills the gain table in the background, if None the whole
+                table is solved inline.
+        """
         self.set_params(params)
+        self.gain_cache = gain_cache
+        self.executor = executor
 
         self.delta = 0.0
         self.nearest_pose = None
@@ -106,15 +132,139 @@ class LQRPathTrackerBase(ControllerBase, ABC):
         self.curv_ref = None
         self.solvetime_ms = None
         self.car_ref_pnt = None
+        self.gain_store = None
+        self.gain_schedule = None  # complete table, None while it is being filled
+        self._schedule_key = None
+        self._vel = 0.0
+        self._preview_speeds = None
+        self._fill_future = None
 
     def set_params(self, params: Params):
         self.params = params
 
+    def preview_speed(self, speed_cmd: float, max_accel: float):
+        """
+        Speeds the vehicle is about to reach are solved first, assuming it accelerates towards the speed command at
+        up to max_accel [m/s^2] for PREVIEW_HORIZON_S, and never past the command.
+        """
+        speed_err = speed_cmd - self._vel
+        reach = min(abs(speed_err), max_accel * self.PREVIEW_HORIZON_S)
+        self._preview_speeds = (self._vel, self._vel + np.sign(speed_err) * reach)
+
+    @abstractmethod
+    def state_space(self, vel: float, car_params: Vehicle.Params) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        A and B of the error dynamics linearized at speed vel [m/s].
+        """
+        pass
+
+    @abstractmethod
+    def _solve_gain(self, A: np.ndarray, B: np.ndarray, Q: np.ndarray, R: np.ndarray,
+                    K_init: Optional[np.ndarray]) -> Tuple[np.ndarray, RiccatiSolveInfo]:
+        """
+        Gain of the linearization (A, B), K_init is the gain at the closest solved speed, None for the first.
+        """
+        pass
+
+    def solve_gains(self, A: np.ndarray, B: np.ndarray, Q: np.ndarray,
+                     R: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gains [N, m, n] of the stacked linearizations A [N, n, n] and B [N, n, m] in one vectorized pass. Returns the
+        gains and their converged flags [N].
+        """
+        B_T = np.swapaxes(B, 1, 2)
+        if self.DISCRETE:
+            X, converged = solve_dare_sda_batch(A, B, Q, R)
+            return np.linalg.solve(R + B_T @ X @ B, B_T @ X @ A), converged
+        X, converged = solve_care_batch(A, B, Q, R)
+        return np.linalg.solve(R, B_T @ X), converged
+
+    def _gain(self, vel: float, car_params: Vehicle.Params) -> np.ndarray:
+        """
+        Interpolated gain at speed vel, the table is rebuilt whenever Q, R, dt or the vehicle params change. While it
+        is being filled in the background the gain at the closest solved speed is used.
+        """
+        self._vel = vel
+        if self._fill_future is not None and self._fill_future.done():
+            future, self._fill_future = self._fill_future, None
+            # re-raises an exception of the background solve
+            future.result()
+        # Q and R are edited in place by the menu sliders, so the key is their content rather than their identity
+        key = (self.params.Q.tobytes(), self.params.R.tobytes(), self.params.dt, astuple(car_params))
+        if key != self._schedule_key:
+            self._schedule_key = key
+            self._start_schedule(vel, car_params)
+        return self.gain_store.gain(vel)
+
+    def _start_schedule(self, vel: float, car_params: Vehicle.Params):
+        start_time = time.perf_counter()
+        # copies, the sliders may change the weights while the table is filled
+        Q = self.params.Q.copy()
+        R = self.params.R.copy()
+        speeds = np.linspace(self.SCHEDULE_V_MIN, self.SCHEDULE_V_MAX, self.SCHEDULE_N_POINTS)
+        systems = [self.state_space(v, car_params) for v in speeds]
+        store = GainStore(speeds, (R.shape[0], Q.shape[0]))
+        self.gain_store = store
+        self.gain_schedule = None
+
+        cache_key = None
+        if self.gain_cache is not None:
+            cache_key = GainCache.key(type(self).__name__, np.stack([A for A, _ in systems]),
+                                      np.stack([B for _, B in systems]), Q, R, self.params.dt)
+            gains = self.gain_cache.load(cache_key)
+            if gains is not None and gains.shape[0] == len(speeds):
+                store.publish_all(gains)
+                self.gain_schedule = store.to_schedule(1e3 * (time.perf_counter() - start_time))
+                return
+
+        # the current speed is solved inline so that there is always a gain to fall back to
+        idx = store.index(vel)
+        store.publish(idx, *self._solve_gain(*systems[idx], Q, R, None))
+
+        if self.executor is None:
+            self._fill_store(store, systems, Q, R, cache_key, start_time)
+        else:
+            self._fill_future = self.executor.submit(self._fill_store, store, systems, Q, R, cache_key, start_time)
+
+    def _fill_store(self, store: GainStore, systems: List[Tuple[np.ndarray, np.ndarray]], Q: np.ndarray,
+                    R: np.ndarray, cache_key: Optional[str], start_time: float):
+        while True:
+            if store is not self.gain_store:
+                # superseded by a newer table
+                return
+            unsolved = store.unsolved()
+            if not len(unsolved):
+                break
+            idx = unsolved[np.argmin(self._solve_priority(store.speeds[unsolved]))]
+            # warm started from the closest solved speed
+            store.publish(idx, *self._solve_gain(*systems[idx], Q, R, store.nearest_solved(idx)))
+
+        schedule = store.to_schedule(1e3 * (time.perf_counter() - start_time))
+        if store is self.gain_store:
+            self.gain_schedule = schedule
+        if cache_key is not None:
+            self.gain_cache.store(cache_key, schedule.gains)
+
+    def _solve_priority(self, speeds: np.ndarray) -> np.ndarray:
+        """
+        Lower first: the speeds between the current and the previewed speed by distance to the current speed, then
+        all others.
+        """
+        vel = self._vel
+        dist = np.abs(speeds - vel)
+        if self._preview_speeds is None:
+            return dist
+        v_lo, v_hi = sorted(self._preview_speeds)
+        spacing = (self.SCHEDULE_V_MAX - self.SCHEDULE_V_MIN) / (self.SCHEDULE_N_POINTS - 1)
+        ahead = (speeds >= v_lo - spacing) & (speeds <= v_hi + spacing)
+        return np.where(ahead, dist, dist + self.SCHEDULE_V_MAX)
+
 
 class KinematicLQRPathTracker(LQRPathTrackerBase):
 
-    def __init__(self, params: LQRPathTrackerBase.Params):
-        super().__init__(params)
+    def __init__(self, params: LQRPathTrackerBase.Params, gain_cache: Optional[GainCache] = None,
+                 executor: Optional[Executor] = None):
+        super().__init__(params, gain_cache, executor)
 
     def update(self, car: Vehicle, path: PathBase) -> float:
         start_time_ms = time.time_ns() * 1e-6
@@ -146,18 +296,7 @@ class KinematicLQRPathTracker(LQRPathTrackerBase):
         self.theta_e_dot = car_theta_dot - self.curv_ref * math.dot(self.car_vel, math.unit_vec2(
             self.nearest_pose.theta))  # TODO curv dot vel
 
-        A = np.zeros((4, 4))
-        A[0, 0] = 1.0
-        A[0, 1] = self.params.dt
-        A[1, 2] = np.round(vel)  # round vel for lru caching of LQR soln
-        A[2, 2] = 1.0
-        A[2, 3] = self.params.dt
-
-        B = np.zeros((4, 1))
-        B[3, 0] = np.round(vel) / car.params.wheel_base
-
-        K, _ = dlqr(arr_to_tuple_2d(A), arr_to_tuple_2d(B), arr_to_tuple_2d(self.params.Q),
-                    arr_to_tuple_2d(self.params.R))
+        K = self._gain(vel, car.params)
 
         x = np.zeros((4, 1))
 
@@ -175,10 +314,30 @@ class KinematicLQRPathTracker(LQRPathTrackerBase):
         self.solvetime_ms = time.time_ns() * 1e-6 - start_time_ms
         return self.delta
 
+    def state_space(self, vel: float, car_params: Vehicle.Params) -> Tuple[np.ndarray, np.ndarray]:
+        A = np.zeros((4, 4))
+        A[0, 0] = 1.0
+        A[0, 1] = self.params.dt
+        A[1, 2] = vel
+        A[2, 2] = 1.0
+        A[2, 3] = self.params.dt
+
+        B = np.zeros((4, 1))
+        B[3, 0] = vel / car_params.wheel_base
+        return A, B
+
+    def _solve_gain(self, A: np.ndarray, B: np.ndarray, Q: np.ndarray, R: np.ndarray,
+                    K_init: Optional[np.ndarray]) -> Tuple[np.ndarray, RiccatiSolveInfo]:
+        K, _, info = dlqr(A, B, Q, R, K_init)
+        return K, info
+
 
 class DynamicLQRPathTracker(LQRPathTrackerBase):
-    def __init__(self, params: LQRPathTrackerBase.Params):
-        super().__init__(params)
+    DISCRETE = False
+
+    def __init__(self, params: LQRPathTrackerBase.Params, gain_cache: Optional[GainCache] = None,
+                 executor: Optional[Executor] = None):
+        super().__init__(params, gain_cache, executor)
 
     def update(self, car: Vehicle, path: PathBase) -> float:
         start_time_ms = time.time_ns() * 1e-6
@@ -204,31 +363,8 @@ class DynamicLQRPathTracker(LQRPathTrackerBase):
         thetadot_ref = self.curv_ref * math.dot(self.car_vel, math.unit_vec2(self.nearest_pose.theta))
         self.theta_e_dot = car.state_cog.thetadot - thetadot_ref
 
-
-        # A and B
-        cr = car.params.cr
-        cf = car.params.cf
-        lr = car.params.lr
-        lf = car.params.lf
-        wb = lf + lr
-        m = car.params.m
-        Iz = car.params.Iz
-        vx = max(1e-2, round(self.car_vel.x))  # round for lru caching of lqr soln and avoid div by zero
-        A = np.zeros((4, 4))
-        A[0, 1] = 1.0
-        A[1, 1] = -(cf + cr)/(m*vx)
-        A[1, 2] = (cf + cr)/m
-        A[1, 3] = (-cf*lf + cr*lr)/(m*vx)
-        A[2, 3] = 1.0
-        A[3, 1] = -(cf*lf + cr*lr) / (Iz * vx)
-        A[3, 2] = (cf*lf - cr*lr) / Iz
-        A[3, 3] = (-cf * lf**2 + cr * lr**2) / (Iz * vx)
-
-        B = np.zeros((4, 1))
-        B[1, 0] = cf/m
-        B[3, 0] = cf * lf / Iz
-
-        K = lqr(arr_to_tuple_2d(A), arr_to_tuple_2d(B), arr_to_tuple_2d(self.params.Q), arr_to_tuple_2d(self.params.R))
+        vx = max(1e-2, self.car_vel.x)  # avoid div by zero
+        K = self._gain(vx, car.params)
 
         x = np.zeros((4, 1))
 
@@ -237,12 +373,29 @@ class DynamicLQRPathTracker(LQRPathTrackerBase):
         x[2, 0] = self.theta_e
         x[3, 0] = self.theta_e_dot
 
-        Kv = lf * m / (wb * cf) - lr * m / (wb * cr)
-        e2_ss = -lr*self.curv_ref + (lf * m * vx**2 * self.curv_ref) / (cr * wb)
-        ff = wb * self.curv_ref + Kv * vx ** 2 * self.curv_ref + K[0, 3] * e2_ss
+        ff = self._feedforward(vx, self.curv_ref, K, car.params)
         fb = (-K @ x)[0, 0]
 
         self.delta = ff + fb
 
         self.solvetime_ms = time.time_ns() * 1e-6 - start_time_ms
         return self.delta
+
+    @staticmethod
+    def _feedforward(vx: float, curv: float, K: np.ndarray, car_params: Vehicle.Params) -> float:
+        """
+        Tire angle that holds the steady state of the closed loop on a constant curvature at e1 = 0, the steady state
+        heading error e2_ss is left to the gain on e2.
+        """
+        lf = car_params.lf
+        lr = car_params.lr
+        e2_ss = -lr*curv + (lf * car_params.m * vx**2 * curv) / (car_params.cr * car_params.wheel_base)
+        return car_params.wheel_base * curv + understeer_gradient(car_params) * vx ** 2 * curv + K[0, 2] * e2_ss
+
+    def state_space(self, vel: float, car_params: Vehicle.Params) -> Tuple[np.ndarray, np.ndarray]:
+        A, B, _ = dynamic_error_model(np.array([vel]), car_params)
+        return A[0], B[0][:, None]
+
+    def _solve_gain(self, A: np.ndarray, B: np.ndarray, Q: np.ndarray, R: np.ndarray,
+                    K_init: Optional[np.ndarray]) -> Tuple[np.ndarray, RiccatiSolveInfo]:
+        return lqr(A, B, Q, R, K_init)
@@ -0,0 +1,249 @@
+import enum
+import time
+import numpy as np
+import scipy.linalg as la
+from dataclasses import dataclass, field
+
+from control.ControllerBase import ControllerBase
+from control.lqr_path_tracker import dynamic_error_model, pi_2_pi, understeer_gradient
+from control.qp_solver import AdmmQPSolver, QPSolveInfo
+from control.riccati import solve_dare
+from paths.PathBase import PathBase
+from paths import path_utils
+from dynamics.Vehicle import Vehicle
+from utils import math
+
+
+class MPCPathTracker(ControllerBase):
+    """
+    Linear time-varying MPC of the path tracking error dynamics. The error model is linearized at the speeds the
+    vehicle is expected to reach over the horizon and driven by the curvature preview of the path, the steering
+    sequence is the solution of a condensed QP with tire angle and tire angle rate limits, warm started from the
+    shifted solution of the previous update. The terminal state is weighted by the infinite horizon LQR cost at the
+    last stage, so a short horizon does not trade the heading for a fast but overshooting cte correction.
+
+    The horizon adapts so that an update fits in budget_ms.
+    """
+
+    class Model(enum.Enum):
+        kinematic = 0  # states [e1, e2] at the rear axle
+        dynamic = 1  # states [e1, e1_dot, e2, e2_dot] at the cog
+
+    @dataclass
+    class Params:
+        Q: np.ndarray  # [4, 4] weights of [e1, e1_dot, e2, e2_dot], the kinematic model uses the e1 and e2 entries
+        R: float  # tire angle weight
+        R_rate: float  # tire angle change weight
+        dt: float  # stage duration [s]
+        model: "MPCPathTracker.Model" = None
+        horizon_min: int = 10
+        horizon_max: int = 30
+        budget_ms: float = 4.0
+        qp: AdmmQPSolver.Params = field(default_factory=AdmmQPSolver.Params)
+
+        def __post_init__(self):
+            if self.model is None:
+                self.model = MPCPathTracker.Model.dynamic
+            assert np.all(np.linalg.eigvals(self.Q) >= 0)
+            assert 1 <= self.horizon_min <= self.horizon_max
+
+    # lowest speed of the linearizations [m/s], the dynamic model is singular at standstill
+    V_MIN = 1.0
+
+    def __init__(self, params: Params):
+        self.set_params(params)
+
+        self.delta = 0.0
+        self.nearest_pose = None
+        self.path = None
+        self.car = None
+        self.cte = None
+        self.cte_dot = None
+        self.theta_e = None
+        self.theta_e_dot = None
+        self.curv_ref = None
+        self.solvetime_ms = None
+        self.car_ref_pnt = None
+        self.qp_info: QPSolveInfo = None
+        self.predicted_delta = None
+        self._speed_cmd = None
+        self._max_accel = 0.0
+        self._x_warm = None
+        self._y_warm = None
+        self._K_terminal = None
+
+    def set_params(self, params: Params):
+        self.params = params
+        self.horizon = params.horizon_max
+        self._qp_solver = AdmmQPSolver(params.qp)
+        self._x_warm = None
+        self._y_warm = None
+        self._K_terminal = None
+
+    def preview_speed(self, speed_cmd: float, max_accel: float):
+        self._speed_cmd = speed_cmd
+        self._max_accel = max_accel
+
+    def update(self, car: Vehicle, path: PathBase) -> float:
+        start_time_ms = time.time_ns() * 1e-6
+        kinematic = self.params.model is MPCPathTracker.Model.kinematic
+        self.car_ref_pnt = car.pose_rear_axle.point if kinematic else car.pose.point
+        self.nearest_pose, station = path.get_nearest_pose(self.car_ref_pnt)
+        self.car = car
+        self.path = path
+
+        if not self.nearest_pose:
+            return self.delta
+
+        self.path_unit_normal = path_utils.get_path_unit_norm(self.nearest_pose)
+        self.cte = path_utils.get_cross_err(self.nearest_pose, self.car_ref_pnt)
+        self.theta_e = pi_2_pi(car.pose.theta - self.nearest_pose.theta)
+        self.car_vel = car.vel_at_pnt(math.Point(-car.params.lr, 0)) if kinematic else car.vel_cog
+        self.cte_dot = math.dot(self.car_vel, self.path_unit_normal)
+        self.curv_ref = path.get_curv_at_station(station)
+        if np.isnan(self.curv_ref):
+            self.curv_ref = 0
+        thetadot_ref = self.curv_ref * math.dot(self.car_vel, math.unit_vec2(self.nearest_pose.theta))
+        self.theta_e_dot = car.state_cog.thetadot - thetadot_ref
+
+        if kinematic:
+            x0 = np.array([self.cte, self.theta_e])
+        else:
+            x0 = np.array([self.cte, self.cte_dot, self.theta_e, self.theta_e_dot])
+
+        n_stages = self.horizon
+        speeds = self._speed_preview(max(self.V_MIN, car.state_cog.vx), n_stages)
+        stations = station + np.cumsum(speeds) * self.params.dt - speeds[0] * self.params.dt
+        curvs = np.nan_to_num(path.get_curv_array_at_station(stations))
+
+        A, B, c = self._discrete_model(speeds, curvs, car.params)
+        delta_seq = self._solve(x0, A, B, c, self._feedforward(speeds, curvs, car.params), car.params)
+        self.predicted_delta = delta_seq
+        self.delta = delta_seq[0]
+
+        self.solvetime_ms = time.time_ns() * 1e-6 - start_time_ms
+        self._adapt_horizon(self.solvetime_ms)
+        return self.delta
+
+    def _speed_preview(self, vel: float, n_stages: int) -> np.ndarray:
+        """
+        Speeds at the stages, approaching the previewed speed command at max_accel.
+        """
+        if self._speed_cmd is None:
+            return np.full(n_stages, vel)
+        step = self._max_accel * self.params.dt * np.arange(n_stages)
+        target = max(self.V_MIN, self._speed_cmd)
+        return np.where(target >= vel, np.minimum(vel + step, target), np.maximum(vel - step, target))
+
+    def _continuous_model(self, speeds: np.ndarray, car_params: Vehicle.Params):
+        """
+        [N, n, n] A, [N, n] B and [N, n] E of x_dot = A x + B delta + E curv at the stage speeds.
+        """
+        n_stages = len(speeds)
+        if self.params.model is MPCPathTracker.Model.kinematic:
+            A = np.zeros((n_stages, 2, 2))
+            A[:, 0, 1] = speeds
+            B = np.zeros((n_stages, 2))
+            B[:, 1] = speeds / car_params.wheel_base
+            E = np.zeros((n_stages, 2))
+            E[:, 1] = -speeds
+            return A, B, E
+
+        return dynamic_error_model(speeds, car_params)
+
+    def _discrete_model(self, speeds: np.ndarray, curvs: np.ndarray, car_params: Vehicle.Params):
+        """
+        Zero order hold discretization x[k+1] = A[k] x[k] + B[k] delta[k] + c[k] of all stages in one batched expm.
+        """
+        A_c, B_c, E_c = self._continuous_model(speeds, car_params)
+        n_stages, n = B_c.shape
+        M = np.zeros((n_stages, n + 2, n + 2))
+        M[:, :n, :n] = A_c
+        M[:, :n, n] = B_c
+        M[:, :n, n + 1] = E_c
+        Phi = la.expm(M * self.params.dt)
+        return Phi[:, :n, :n], Phi[:, :n, n], Phi[:, :n, n + 1] * curvs[:, None]
+
+    def _feedforward(self, speeds: np.ndarray, curvs: np.ndarray, car_params: Vehicle.Params) -> np.ndarray:
+        """
+        Steady state tire angles on the previewed curvature, the tire angle weight R is on the deviation from them so
+        that curves are followed without offset.
+        """
+        wb = car_params.wheel_base
+        if self.params.model is MPCPathTracker.Model.kinematic:
+            return np.arctan(wb * curvs)
+        return wb * curvs + understeer_gradient(car_params) * speeds ** 2 * curvs
+
+    def _terminal_weights(self, A: np.ndarray, B: np.ndarray, Q: np.ndarray) -> np.ndarray:
+        R = np.array([[self.params.R]])
+        X, info = solve_dare(A, B[:, None], Q, R, self._K_terminal)
+        if not info.converged:
+            self._K_terminal = None
+            return Q
+        self._K_terminal = np.linalg.solve(R + B[None, :] @ X @ B[:, None], B[None, :] @ X @ A)
+        return X
+
+    def _state_weights(self) -> np.ndarray:
+        if self.params.model is MPCPathTracker.Model.kinematic:
+            return self.params.Q[np.ix_([0, 2], [0, 2])]
+        return self.params.Q
+
+    def _solve(self, x0: np.ndarray, A: np.ndarray, B: np.ndarray, c: np.ndarray, delta_ff: np.ndarray,
+               car_params: Vehicle.Params) -> np.ndarray:
+        n_stages, n = B.shape
+        Q = np.repeat(self._state_weights()[None], n_stages, axis=0)
+        Q[-1] = self._terminal_weights(A[-1], B[-1], Q[-1])
+
+        # condensed prediction x[k+1] = G[k] delta + f[k]
+        G = np.zeros((n_stages, n, n_stages))
+        f = np.zeros((n_stages, n))
+        G_k = np.zeros((n, n_stages))
+        f_k = x0
+        for k in range(n_stages):
+            G_k = A[k] @ G_k
+            G_k[:, k] += B[k]
+            f_k = A[k] @ f_k + c[k]
+            G[k] = G_k
+            f[k] = f_k
+
+        # differences delta[k] - delta[k-1], delta[-1] being the last applied tire angle
+        D = np.eye(n_stages) - np.eye(n_stages, k=-1)
+        QG = np.einsum("kij,kjm->kim", Q, G)
+        P = np.einsum("kin,kim->nm", G, QG) + self.params.R * np.eye(n_stages) + self.params.R_rate * D.T @ D
+        q = np.einsum("kin,ki->n", QG, f) - self.params.R * delta_ff
+        q[0] -= self.params.R_rate * self.delta
+
+        rate_max = car_params.delta_rate_max * self.params.dt
+        C = np.vstack((np.eye(n_stages), D))
+        l = np.concatenate((np.full(n_stages, -car_params.delta_max), np.full(n_stages, -rate_max)))
+        u = np.concatenate((np.full(n_stages, car_params.delta_max), np.full(n_stages, rate_max)))
+        l[n_stages] += self.delta
+        u[n_stages] += self.delta
+
+        x_init, y_init = self._shifted_warm_start(n_stages)
+        delta_seq, y, self.qp_info = self._qp_solver.solve(P, q, C, l, u, x_init, y_init)
+        self._x_warm = delta_seq
+        self._y_warm = y
+        return delta_seq
+
+    def _shifted_warm_start(self, n_stages: int):
+        """
+        Previous solution shifted by one stage and resized to the current horizon.
+        """
+        if self._x_warm is None:
+            return None, None
+
+        def shift(arr):
+            arr = np.append(arr[1:], arr[-1])
+            if len(arr) >= n_stages:
+                return arr[:n_stages]
+            return np.append(arr, np.full(n_stages - len(arr), arr[-1]))
+
+        n_prev = len(self._x_warm)
+        return shift(self._x_warm), np.concatenate((shift(self._y_warm[:n_prev]), shift(self._y_warm[n_prev:])))
+
+    def _adapt_horizon(self, solvetime_ms: float):
+        if solvetime_ms > self.params.budget_ms:
+            self.horizon = max(self.params.horizon_min, self.horizon - 2)
+        elif solvetime_ms < 0.6 * self.params.budget_ms:
+            self.horizon = min(self.params.horizon_max, self.horizon + 1)
@@ -0,0 +1,84 @@
+import time
+import numpy as np
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class QPSolveInfo:
+    iterations: int
+    primal_residual: float
+    dual_residual: float
+    time_ms: float
+    converged: bool
+
+
+class AdmmQPSolver:
+    """
+    Dense ADMM solver (operator splitting as in OSQP) of
+        min 0.5 x^T P x + q^T x   s.t.   l <= C x <= u
+    for the small condensed QPs of the MPC tracker. The KKT matrix is inverted once per solve and rho is adapted to
+    balance the residuals, so an iteration is a couple of matrix-vector products.
+
+    ref Stellato et al., "OSQP: an operator splitting solver for quadratic programs", 2020
+    """
+
+    @dataclass
+    class Params:
+        eps_abs: float = 1e-5
+        eps_rel: float = 1e-5
+        max_iter: int = 400
+        sigma: float = 1e-6
+        alpha: float = 1.6  # over-relaxation
+        check_every: int = 5
+
+    def __init__(self, params: Params = None):
+        self.params = params or AdmmQPSolver.Params()
+
+    def solve(self, P: np.ndarray, q: np.ndarray, C: np.ndarray, l: np.ndarray, u: np.ndarray,
+              x_init: Optional[np.ndarray] = None, y_init: Optional[np.ndarray] = None):
+        """
+        Returns:
+            (x, y, QPSolveInfo): primal solution, multipliers of the constraints and telemetry.
+        """
+        start_time = time.perf_counter()
+        p = self.params
+        n = len(q)
+        x = np.zeros(n) if x_init is None else x_init.copy()
+        y = np.zeros(len(l)) if y_init is None else y_init.copy()
+        z = np.clip(C @ x, l, u)
+
+        CtC = C.T @ C
+        eye = np.eye(n)
+        rho = max(1e-6, np.mean(np.diag(P)) / max(1.0, np.mean(np.diag(CtC))))
+        kkt_inv = np.linalg.inv(P + p.sigma * eye + rho * CtC)
+
+        converged = False
+        iterations = 0
+        r_prim = r_dual = np.inf
+        for iterations in range(1, p.max_iter + 1):
+            x = kkt_inv @ (p.sigma * x - q + C.T @ (rho * z - y))
+            Cx = C @ x
+            z_relaxed = p.alpha * Cx + (1.0 - p.alpha) * z
+            z = np.clip(z_relaxed + y / rho, l, u)
+            y = y + rho * (z_relaxed - z)
+
+            if iterations % p.check_every:
+                continue
+            Px = P @ x
+            Cty = C.T @ y
+            r_prim = np.abs(Cx - z).max()
+            r_dual = np.abs(Px + q + Cty).max()
+            prim_scale = max(np.abs(Cx).max(), np.abs(z).max())
+            dual_scale = max(np.abs(Px).max(), np.abs(Cty).max(), np.abs(q).max())
+            if r_prim <= p.eps_abs + p.eps_rel * prim_scale and r_dual <= p.eps_abs + p.eps_rel * dual_scale:
+                converged = True
+                break
+
+            # rebalance the residuals, the KKT matrix is small enough to refactor
+            ratio = np.sqrt((r_prim / (prim_scale + 1e-12)) / (r_dual / (dual_scale + 1e-12) + 1e-12))
+            if ratio > 5.0 or ratio < 0.2:
+                rho = min(max(rho * ratio, 1e-6), 1e6)
+                kkt_inv = np.linalg.inv(P + p.sigma * eye + rho * CtC)
+
+        return x, y, QPSolveInfo(iterations, r_prim, r_dual, 1e3 * (time.perf_counter() - start_time), converged)
@@ -0,0 +1,234 @@
+import time
+import numpy as np
+import scipy.linalg as la
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+@dataclass
+class RiccatiSolveInfo:
+    method: str
+    iterations: int
+    residual: float  # relative residual of the Riccati equation
+    time_ms: float
+    converged: bool
+
+
+def dare_residual(A, B, Q, R, X) -> float:
+    """
+    Relative residual of the discrete time algebraic Riccati equation
+    X = A^T X A - A^T X B (R + B^T X B)^-1 B^T X A + Q
+    """
+    BtXA = B.T @ X @ A
+    res = A.T @ X @ A - X - BtXA.T @ np.linalg.solve(R + B.T @ X @ B, BtXA) + Q
+    return np.linalg.norm(res, 1) / max(1.0, np.linalg.norm(X, 1))
+
+
+def care_residual(A, B, Q, R, X) -> float:
+    """
+    Relative residual of the continuous time algebraic Riccati equation A^T X + X A - X B R^-1 B^T X + Q = 0
+    """
+    XB = X @ B
+    res = A.T @ X + X @ A - XB @ np.linalg.solve(R, XB.T) + Q
+    return np.linalg.norm(res, 1) / max(1.0, np.linalg.norm(X, 1))
+
+
+def _kron(X, Y) -> np.ndarray:
+    # np.kron without its generic nd bookkeeping, which dominates for the small matrices here
+    n, m = X.shape[0] * Y.shape[0], X.shape[1] * Y.shape[1]
+    return (X[:, None, :, None] * Y[None, :, None, :]).reshape(n, m)
+
+
+def _solve_discrete_lyapunov(A_cl, M) -> np.ndarray:
+    """
+    X = A_cl^T X A_cl + M as one dense [n^2, n^2] solve, cheaper than Bartels-Stewart for the few states of the
+    path trackers.
+    """
+    n = A_cl.shape[0]
+    lhs = np.eye(n * n) - _kron(A_cl.T, A_cl.T)
+    return np.linalg.solve(lhs, M.reshape(-1)).reshape(n, n)
+
+
+def _solve_continuous_lyapunov(A_cl, M) -> np.ndarray:
+    """
+    A_cl^T X + X A_cl + M = 0 as one dense [n^2, n^2] solve.
+    """
+    n = A_cl.shape[0]
+    eye = np.eye(n)
+    lhs = _kron(A_cl.T, eye) + _kron(eye, A_cl.T)
+    return np.linalg.solve(lhs, -M.reshape(-1)).reshape(n, n)
+
+
+def solve_dare_sda(A, B, Q, R, tol: float = 1e-10, max_iter: int = 50) -> Tuple[np.ndarray, RiccatiSolveInfo]:
+    """
+    Structure-preserving doubling algorithm, converges quadratically for stabilizable (A, B) and detectable (Q, A).
+    ref Chu, Fan, Lin, Wang, "Structure-preserving algorithms for periodic discrete-time algebraic Riccati
+    equations", 2004
+    """
+    start_time = time.perf_counter()
+    n = A.shape[0]
+    A_k = A
+    G_k = B @ np.linalg.solve(R, B.T)
+    H_k = Q
+    eye = np.eye(n)
+
+    converged = False
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        # one factorization of W for both W^-1 A_k and W^-1 G_k
+        W_inv_AG = np.linalg.solve(eye + G_k @ H_k, np.hstack((A_k, G_k)))
+        W_inv_A, W_inv_G = W_inv_AG[:, :n], W_inv_AG[:, n:]
+        H_next = H_k + A_k.T @ H_k @ W_inv_A
+        G_k = G_k + A_k @ W_inv_G @ A_k.T
+        A_k = A_k @ W_inv_A
+        delta = np.abs(H_next - H_k).max()
+        H_k = H_next
+        if delta <= tol * max(1.0, np.abs(H_k).max()):
+            converged = True
+            break
+
+    X = 0.5 * (H_k + H_k.T)
+    return X, RiccatiSolveInfo("sda", iterations, dare_residual(A, B, Q, R, X),
+                               1e3 * (time.perf_counter() - start_time), converged)
+
+
+def solve_dare_newton(A, B, Q, R, K_init, tol: float = 1e-10,
+                      max_iter: int = 20) -> Tuple[Optional[np.ndarray], RiccatiSolveInfo]:
+    """
+    Newton-Kleinman (Hewer) iteration from a stabilizing gain K_init, each step solves one Lyapunov equation.
+    Returns None for X if K_init does not stabilize A - B K_init or the iteration does not converge.
+    ref Hewer, "An iterative technique for the computation of the steady state gains for the discrete optimal
+    regulator", 1971
+    """
+    start_time = time.perf_counter()
+    if np.max(np.abs(np.linalg.eigvals(A - B @ K_init))) >= 1.0:
+        return None, RiccatiSolveInfo("newton", 0, np.inf, 1e3 * (time.perf_counter() - start_time), False)
+
+    K = K_init
+    X = None
+    converged = False
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        A_cl = A - B @ K
+        X = _solve_discrete_lyapunov(A_cl, Q + K.T @ R @ K)
+        K_next = np.linalg.solve(R + B.T @ X @ B, B.T @ X @ A)
+        delta = np.abs(K_next - K).max()
+        K = K_next
+        if delta <= tol * max(1.0, np.abs(K).max()):
+            converged = True
+            break
+
+    X = 0.5 * (X + X.T)
+    info = RiccatiSolveInfo("newton", iterations, dare_residual(A, B, Q, R, X),
+                            1e3 * (time.perf_counter() - start_time), converged)
+    return (X if converged else None), info
+
+
+def solve_dare(A, B, Q, R, K_init=None, tol: float = 1e-10) -> Tuple[np.ndarray, RiccatiSolveInfo]:
+    """
+    Solve a discrete time algebraic Riccati equation (DARE), by Newton-Kleinman warm started from K_init (e.g. the
+    gain of the closest previously solved problem) when it is stabilizing, else by doubling.
+    """
+    if K_init is not None:
+        X, info = solve_dare_newton(A, B, Q, R, K_init, tol)
+        if X is not None:
+            return X, info
+    return solve_dare_sda(A, B, Q, R, tol)
+
+
+def solve_care_newton(A, B, Q, R, K_init, tol: float = 1e-10,
+                      max_iter: int = 20) -> Tuple[Optional[np.ndarray], RiccatiSolveInfo]:
+    """
+    Newton-Kleinman iteration of the CARE from a stabilizing gain K_init, the continuous counterpart of
+    solve_dare_newton.
+    ref Kleinman, "On an iterative technique for Riccati equation computations", 1968
+    """
+    start_time = time.perf_counter()
+    if np.max(np.linalg.eigvals(A - B @ K_init).real) >= 0.0:
+        return None, RiccatiSolveInfo("newton", 0, np.inf, 1e3 * (time.perf_counter() - start_time), False)
+
+    K = K_init
+    X = None
+    converged = False
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        X = _solve_continuous_lyapunov(A - B @ K, Q + K.T @ R @ K)
+        K_next = np.linalg.solve(R, B.T @ X)
+        delta = np.abs(K_next - K).max()
+        K = K_next
+        if delta <= tol * max(1.0, np.abs(K).max()):
+            converged = True
+            break
+
+    X = 0.5 * (X + X.T)
+    info = RiccatiSolveInfo("newton", iterations, care_residual(A, B, Q, R, X),
+                            1e3 * (time.perf_counter() - start_time), converged)
+    return (X if converged else None), info
+
+
+def solve_care(A, B, Q, R, K_init=None, tol: float = 1e-10) -> Tuple[np.ndarray, RiccatiSolveInfo]:
+    """
+    Solve a continuous time algebraic Riccati equation (CARE), by Newton-Kleinman warm started from K_init when it is
+    stabilizing, else with scipy's Schur method.
+    """
+    if K_init is not None:
+        X, info = solve_care_newton(A, B, Q, R, K_init, tol)
+        if X is not None:
+            return X, info
+
+    start_time = time.perf_counter()
+    X = la.solve_continuous_are(A, B, Q, R)
+    residual = care_residual(A, B, Q, R, X)
+    return X, RiccatiSolveInfo("schur", 1, residual, 1e3 * (time.perf_counter() - start_time), bool(residual < 1e-6))
+
+
+def solve_dare_sda_batch(A, B, Q, R, tol: float = 1e-10, max_iter: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    solve_dare_sda of the stacked problems A [N, n, n] and B [N, n, m] with shared weights in one pass, problems
+    stop updating once converged. Returns X [N, n, n] and the converged flags [N].
+    """
+    N, n = A.shape[:2]
+    A_k = A
+    G_k = B @ np.linalg.solve(R, np.swapaxes(B, 1, 2))
+    H_k = np.broadcast_to(Q, A.shape)
+    eye = np.eye(n)
+
+    converged = np.zeros(N, dtype=bool)
+    for _ in range(max_iter):
+        W_inv_AG = np.linalg.solve(eye + G_k @ H_k, np.concatenate((A_k, G_k), axis=2))
+        W_inv_A, W_inv_G = W_inv_AG[:, :, :n], W_inv_AG[:, :, n:]
+        H_next = H_k + np.swapaxes(A_k, 1, 2) @ H_k @ W_inv_A
+        active = ~converged[:, None, None]
+        G_k = np.where(active, G_k + A_k @ W_inv_G @ np.swapaxes(A_k, 1, 2), G_k)
+        A_k = np.where(active, A_k @ W_inv_A, A_k)
+        delta = np.abs(H_next - H_k).max(axis=(1, 2))
+        H_k = np.where(active, H_next, H_k)
+        converged |= delta <= tol * np.maximum(1.0, np.abs(H_k).max(axis=(1, 2)))
+        if converged.all():
+            break
+
+    return 0.5 * (H_k + np.swapaxes(H_k, 1, 2)), converged
+
+
+def solve_care_batch(A, B, Q, R) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stabilizing solutions of the stacked CAREs A [N, n, n] and B [N, n, m] with shared weights, from the stable
+    invariant subspaces of their Hamiltonians. Returns X [N, n, n] and flags [N] of the problems whose Hamiltonian
+    has exactly n stable eigenvalues and a well conditioned subspace basis.
+    """
+    N, n = A.shape[:2]
+    H = np.empty((N, 2 * n, 2 * n))
+    H[:, :n, :n] = A
+    H[:, :n, n:] = -B @ np.linalg.solve(R, np.swapaxes(B, 1, 2))
+    H[:, n:, :n] = -Q
+    H[:, n:, n:] = -np.swapaxes(A, 1, 2)
+
+    eig_vals, eig_vecs = np.linalg.eig(H)
+    stable = np.argsort(eig_vals.real, axis=1)[:, :n]
+    U = np.take_along_axis(eig_vecs, stable[:, None, :], axis=2)
+    U1, U2 = U[:, :n, :], U[:, n:, :]
+    ok = (np.take_along_axis(eig_vals.real, stable, axis=1) < 0).all(axis=1) & (np.linalg.cond(U1) < 1e12)
+    # X = U2 U1^-1
+    X = np.swapaxes(np.linalg.solve(np.swapaxes(U1, 1, 2), np.swapaxes(U2, 1, 2)), 1, 2).real
+    return 0.5 * (X + np.swapaxes(X, 1, 2)), ok
+
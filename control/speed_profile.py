@@ -0,0 +1,61 @@
+import numpy as np
+from dataclasses import dataclass
+
+from paths.PathBase import PathBase
+
+
+class SpeedProfile:
+    """
+    Speed limit along a path from its curvature, at most sqrt(max_lat_accel / |curv|), reached and left within the
+    acceleration and deceleration limits.
+
+    The forward and backward passes are the running minima of v^2 -/+ 2 a s, so the profile is a few array operations
+    per path change. The profile is recomputed only when the samples of the path are replaced, i.e. when the path is
+    updated, and looked up by station otherwise.
+    """
+
+    @dataclass
+    class Params:
+        max_lat_accel: float = 8.0  # [m/s^2]
+        max_accel: float = 10.0  # [m/s^2]
+        max_decel: float = 10.0  # [m/s^2]
+        min_speed: float = 1.0  # [m/s]
+        max_speed: float = 30.0  # [m/s]
+
+    def __init__(self, params: Params):
+        self.params = params
+        self.stations = None
+        self.speeds = None
+        self._spline_samples = None
+
+    def update(self, path: PathBase):
+        if path.spline_samples is self._spline_samples:
+            return
+        self._spline_samples = path.spline_samples
+        if not path.n_samples:
+            self.stations = self.speeds = None
+            return
+        self.stations = path.spline_station
+        self.speeds = self.profile(self.stations, path.spline_curv, self.params)
+
+    @staticmethod
+    def profile(stations: np.ndarray, curvs: np.ndarray, params: Params) -> np.ndarray:
+        """
+        Speeds [m/s] at the stations [m] of a path with the curvatures [1/m].
+        """
+        abs_curv = np.abs(np.nan_to_num(curvs))
+        with np.errstate(divide="ignore"):
+            v_sq = np.minimum(params.max_lat_accel / abs_curv, params.max_speed ** 2)
+
+        # forward pass v_i^2 <= v_j^2 + 2 a (s_i - s_j) for j < i, backward pass v_i^2 <= v_j^2 + 2 d (s_j - s_i) for j > i
+        accel_s = 2 * params.max_accel * stations
+        v_sq = np.minimum.accumulate(v_sq - accel_s) + accel_s
+        decel_s = 2 * params.max_decel * stations
+        v_sq = np.minimum.accumulate((v_sq + decel_s)[::-1])[::-1] - decel_s
+
+        return np.clip(np.sqrt(np.maximum(v_sq, 0.0)), params.min_speed, params.max_speed)
+
+    def get_speed_at_station(self, station: float) -> float:
+        if self.speeds is None:
+            return self.params.max_speed
+        return float(np.interp(station, self.stations, self.speeds))
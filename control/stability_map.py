@@ -0,0 +1,124 @@
+import time
+import numpy as np
+from collections import OrderedDict
+from dataclasses import astuple, dataclass, field, replace
+
+from control.lqr_path_tracker import LQRPathTrackerBase
+from dynamics.Vehicle import Vehicle
+
+
+class StabilityMap:
+    """
+    Closed-loop poles of an LQR path tracker, i.e. the eigenvalues of A - B K, over a grid of speeds and scales of
+    one vehicle parameter around the current vehicle.
+
+    The first grid is solved in one stacked pass. After a change of the weights or the vehicle, e.g. by a slider, the
+    grid is refreshed rows_per_update scales per update, the row of the current vehicle first, so that dragging a slider
+    never solves the full grid in one frame. Rows not refreshed yet keep their old values and are flagged stale.
+    Complete grids are cached by weights and vehicle params.
+    """
+
+    @dataclass
+    class Params:
+        speeds: np.ndarray = field(default_factory=lambda: np.linspace(
+            LQRPathTrackerBase.SCHEDULE_V_MIN, LQRPathTrackerBase.SCHEDULE_V_MAX, 30))
+        vehicle_param: str = "m"  # field of Vehicle.Params scaled along the first axis of the grid
+        scales: np.ndarray = field(default_factory=lambda: np.array([0.5, 0.75, 1.0, 1.5, 2.0]))
+        rows_per_update: int = 1
+        max_cached: int = 32
+
+    def __init__(self, tracker: LQRPathTrackerBase, params: Params):
+        self.tracker = tracker
+        self.params = params
+        self.gains = None  # [n_scales, n_speeds, m, n]
+        self.poles = None  # [n_scales, n_speeds, n], continuous time [1/s]
+        self.converged = None  # [n_scales, n_speeds]
+        self.stale = None  # [n_scales]
+        self.solve_time_ms = 0.0
+        self._key = None
+        self._car_params = None
+        self._cache = OrderedDict()
+
+    @property
+    def complete(self) -> bool:
+        return self.stale is not None and not self.stale.any()
+
+    @property
+    def decay_rate(self) -> np.ndarray:
+        """
+        Slowest decay rate of the closed-loop [1/s] per grid point, negative where the closed-loop is unstable.
+        """
+        return -self.poles.real.max(axis=-1)
+
+    def update(self, car_params: Vehicle.Params) -> bool:
+        """
+        Refreshes the grid towards the current weights of the tracker, returns whether any of it changed.
+        """
+        tracker_params = self.tracker.params
+        key = (tracker_params.Q.tobytes(), tracker_params.R.tobytes(), tracker_params.dt, astuple(car_params))
+        if key != self._key:
+            self._key = key
+            self._car_params = car_params
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.gains, self.poles, self.converged = cached
+                self.stale = np.zeros(len(self.params.scales), dtype=bool)
+                return True
+            if self.gains is None:
+                self._solve_rows(np.arange(len(self.params.scales)))
+                return True
+            # copies, the cached grids must not be refreshed in place
+            self.gains, self.poles, self.converged = self.gains.copy(), self.poles.copy(), self.converged.copy()
+            self.stale = np.ones(len(self.params.scales), dtype=bool)
+
+        if self.complete:
+            return False
+        stale_rows = np.flatnonzero(self.stale)
+        current_first = np.argsort(np.abs(np.log(self.params.scales[stale_rows])), kind="stable")
+        self._solve_rows(stale_rows[current_first[:self.params.rows_per_update]])
+        return True
+
+    def _solve_rows(self, rows: np.ndarray):
+        start_time = time.perf_counter()
+        tracker_params = self.tracker.params
+        n_scales, n_speeds = len(self.params.scales), len(self.params.speeds)
+        A, B = self._systems(self._car_params, self.params.scales[rows])
+        K, converged = self.tracker.solve_gains(A, B, tracker_params.Q, tracker_params.R)
+
+        eig_vals = np.linalg.eigvals(A - B @ K)
+        if self.tracker.DISCRETE:
+            # s = log(z) / dt, poles at the origin of the z plane decay infinitely fast
+            with np.errstate(divide="ignore"):
+                eig_vals = np.log(eig_vals.astype(complex)) / tracker_params.dt
+
+        if self.gains is None:
+            self.gains = np.zeros((n_scales, n_speeds, *K.shape[1:]))
+            self.poles = np.zeros((n_scales, n_speeds, eig_vals.shape[-1]), dtype=complex)
+            self.converged = np.zeros((n_scales, n_speeds), dtype=bool)
+            self.stale = np.ones(n_scales, dtype=bool)
+        self.gains[rows] = K.reshape(len(rows), n_speeds, *K.shape[1:])
+        self.poles[rows] = eig_vals.reshape(len(rows), n_speeds, -1)
+        self.converged[rows] = converged.reshape(len(rows), n_speeds)
+        self.stale[rows] = False
+        self.solve_time_ms = 1e3 * (time.perf_counter() - start_time)
+
+        if self.complete:
+            self._cache[self._key] = (self.gains, self.poles, self.converged)
+            if len(self._cache) > self.params.max_cached:
+                self._cache.popitem(last=False)
+
+    def _systems(self, car_params: Vehicle.Params, scales: np.ndarray):
+        systems = [
+            self.tracker.state_space(v, replace(car_params, **{
+                self.params.vehicle_param: scale * getattr(car_params, self.params.vehicle_param)}))
+            for scale in scales
+            for v in self.params.speeds
+        ]
+        return np.stack([A for A, _ in systems]), np.stack([B for _, B in systems])
+
+    def index(self, vel: float) -> int:
+        """
+        Closest speed of the grid.
+        """
+        return int(np.argmin(np.abs(self.params.speeds - vel)))
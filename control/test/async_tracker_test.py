@@ -0,0 +1,125 @@
+import threading
+
+from control.ControllerBase import ControllerBase
+from control.async_tracker import AsyncPathTracker
+from dynamics.Vehicle import Vehicle
+from paths.path_query import PathQuery
+from paths.straight_path import StraightPath
+from utils import math
+import numpy as np
+
+
+class ScriptedTracker(ControllerBase):
+    """
+    Returns the x of the vehicle as steer command, blocking while the gate is closed.
+    """
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.cars = []
+        self.paths = []
+        self.previews = []
+
+    def update(self, car, path):
+        self.gate.wait()
+        self.cars.append(car)
+        self.paths.append(path)
+        return 0.01 * car.state_cog.x
+
+    def preview_speed(self, speed_cmd, max_accel):
+        self.previews.append((speed_cmd, max_accel))
+
+    def set_params(self, params):
+        pass
+
+
+def car_at(x: float) -> Vehicle:
+    return Vehicle(params=Vehicle.Params()).build_pose(math.Pose(x, 0, 0)).build_vel(10.0, 0)
+
+
+def test_in_time_updates_pass_through():
+    tracker = ScriptedTracker()
+    async_tracker = AsyncPathTracker(tracker, AsyncPathTracker.Params(deadline_ms=1e3))
+    for x in [0.0, 1.0, 2.0]:
+        assert async_tracker.update(car_at(x), StraightPath()) == 0.01 * x
+    assert async_tracker.n_deadline_misses == 0
+    assert not async_tracker.missed_deadline
+
+
+def test_missed_deadline_extrapolates_last_good_command():
+    tracker = ScriptedTracker()
+    async_tracker = AsyncPathTracker(tracker, AsyncPathTracker.Params(deadline_ms=1e3, max_extrapolation_m=1.5))
+    async_tracker.update(car_at(0.0), StraightPath())
+    async_tracker.update(car_at(1.0), StraightPath())
+
+    tracker.gate.clear()
+    async_tracker.params.deadline_ms = 1.0
+    # the steer command grew by 0.01 per meter, followed for at most max_extrapolation_m
+    np.testing.assert_allclose(async_tracker.update(car_at(1.5), StraightPath()), 0.015)
+    assert async_tracker.missed_deadline
+    np.testing.assert_allclose(async_tracker.update(car_at(5.0), StraightPath()), 0.025)
+    assert async_tracker.n_deadline_misses == 2
+    assert len(tracker.paths) == 2  # no new update while the tracker is busy
+
+    # the late result, computed at x=1.5, is picked up by the next update
+    tracker.gate.set()
+    async_tracker.wait()
+    np.testing.assert_allclose(async_tracker.update(car_at(2.0), StraightPath()), 0.02)
+    assert not async_tracker.missed_deadline
+    assert async_tracker.miss_ratio == 2 / 5
+
+
+def test_holds_vehicle_steer_without_command():
+    tracker = ScriptedTracker()
+    tracker.gate.clear()
+    async_tracker = AsyncPathTracker(tracker, AsyncPathTracker.Params(deadline_ms=1.0))
+    car = car_at(0.0)
+    assert async_tracker.update(car, StraightPath()) == car.state_cog.delta
+    tracker.gate.set()
+    async_tracker.wait()
+
+
+def test_tracker_gets_path_snapshot():
+    tracker = ScriptedTracker()
+    async_tracker = AsyncPathTracker(tracker, AsyncPathTracker.Params(deadline_ms=1e3))
+    car = car_at(0.0)
+    path = PathQuery(StraightPath(), car)
+    async_tracker.update(car, path)
+    assert isinstance(tracker.paths[0], PathQuery)
+    assert tracker.paths[0] is not path and tracker.paths[0].path is not path.path
+    assert tracker.paths[0].car is tracker.cars[0] and tracker.cars[0] is not car
+
+
+def test_tracker_gets_vehicle_snapshot():
+    tracker = ScriptedTracker()
+    tracker.gate.clear()
+    async_tracker = AsyncPathTracker(tracker, AsyncPathTracker.Params(deadline_ms=1.0))
+    car = car_at(1.0)
+    async_tracker.update(car, PathQuery(StraightPath(), car))
+    # the simulation steps the vehicle while the tracker is still running
+    car.build_pose(math.Pose(4.0, 0, 0))
+    tracker.gate.set()
+    async_tracker.wait()
+
+    assert tracker.cars[0].state_cog.x == 1.0
+    assert tracker.paths[0].car.pose.x == 1.0
+    delta, pose = async_tracker._commands[-1]
+    assert delta == 0.01 and pose.x == 1.0
+
+
+def test_speed_preview_waits_for_idle_tracker():
+    tracker = ScriptedTracker()
+    async_tracker = AsyncPathTracker(tracker, AsyncPathTracker.Params(deadline_ms=1.0))
+    async_tracker.preview_speed(5.0, 2.0)
+    assert tracker.previews == [(5.0, 2.0)]
+
+    tracker.gate.clear()
+    async_tracker.update(car_at(0.0), StraightPath())
+    async_tracker.preview_speed(6.0, 2.0)
+    async_tracker.preview_speed(7.0, 2.0)
+    assert tracker.previews == [(5.0, 2.0)]
+    tracker.gate.set()
+    async_tracker.wait()
+    # only the latest preview, once the tracker is done
+    assert tracker.previews == [(5.0, 2.0), (7.0, 2.0)]
@@ -0,0 +1,59 @@
+from control.autotune import AutoTuner, CostWeights, Dimension, RolloutConfig, apply_values, run_rollout
+from control.lqr_path_tracker import LQRPathTrackerBase
+from control.StanleyControl import StanleyControl
+import numpy as np
+
+
+def short_scenario() -> RolloutConfig:
+    return RolloutConfig(duration_s=4.0, settle_s=1.0)
+
+
+def test_rollout_scores_tracking():
+    good = run_rollout(StanleyControl, StanleyControl.Params(k=2.0), short_scenario(), CostWeights())
+    bad = run_rollout(StanleyControl, StanleyControl.Params(k=0.01), short_scenario(), CostWeights())
+    assert not good.diverged and good.n_steps == 240
+    assert good.cte_rms < bad.cte_rms
+    assert good.cost < bad.cost
+
+
+def test_apply_values_to_fields_and_array_elements():
+    params = LQRPathTrackerBase.Params(Q=np.zeros((4, 4)), R=np.ones((1, 1)), dt=0.1)
+    apply_values(params, [Dimension("Q[2, 2]", 0, 1), Dimension("R[0,0]", 0, 10), Dimension("dt", 0, 1)],
+                 [0.5, 3.0, 0.05])
+    assert params.Q[2, 2] == 0.5 and params.R[0, 0] == 3.0 and params.dt == 0.05
+
+    dim = Dimension("k", 0.1, 10.0, log=True)
+    assert np.isclose(dim.from_unit(0.5), 1.0)
+    assert np.isclose(dim.to_unit(dim.from_unit(0.3)), 0.3)
+
+
+def test_grid_search_in_process_pool():
+    dims = [Dimension("k", 0.01, 3.0, log=True)]
+    tuner = AutoTuner(AutoTuner.Params(method=AutoTuner.Method.grid, n_candidates=3, n_workers=2),
+                      [short_scenario()])
+    result = tuner.tune(StanleyControl, StanleyControl.Params(k=1.0), dims)
+
+    np.testing.assert_allclose([candidate.values[0] for candidate in result.candidates], [0.01, np.sqrt(0.03), 3.0])
+    assert result.best.values[0] > 0.01
+    assert result.best_params.k == result.best.values[0]
+    assert result.n_rollouts == 3 and result.rollouts_per_s_per_core > 0
+
+    # the pool gives the same scores as an inline rollout
+    inline = run_rollout(StanleyControl, StanleyControl.Params(k=result.candidates[-1].values[0]), short_scenario(),
+                         CostWeights())
+    assert result.candidates[-1].results[0] == inline
+
+    params = StanleyControl.Params(k=1.0)
+    result.write_back(params, dims)
+    assert params.k == result.best.values[0]
+
+
+def test_cma_search_improves_on_its_first_generation():
+    tuner = AutoTuner(AutoTuner.Params(method=AutoTuner.Method.cma, n_candidates=12, population=4),
+                      [RolloutConfig(duration_s=2.0, settle_s=0.5)])
+    result = tuner.tune(StanleyControl, StanleyControl.Params(k=1.0), [Dimension("k", 0.01, 10.0, log=True)])
+    assert len(result.candidates) == 12
+    costs = np.array([candidate.cost for candidate in result.candidates]).reshape(3, 4)
+    # the search distribution moves towards better gains, not just the best sample kept
+    assert costs[-1].mean() < costs[0].mean()
+    assert costs[-1].min() < costs[0].min()
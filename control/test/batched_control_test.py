@@ -0,0 +1,62 @@
+from control.StanleyControl import StanleyControl
+from control.PurePursuitControl import PurePursuitControl
+from dynamics.Vehicle import Vehicle
+from paths.BSpline import BSplinePath
+from paths.straight_path import StraightPath
+from utils import math
+import pygame
+import pytest
+import numpy as np
+
+
+def make_path(amplitude: float) -> BSplinePath:
+    points = [pygame.Vector2(8.0 * i, amplitude * np.sin(0.7 * i)) for i in range(10)]
+    return BSplinePath(points, 15, 3, 0, 1)
+
+
+@pytest.fixture
+def vehicles():
+    rng = np.random.default_rng(1)
+    return [
+        Vehicle(params=Vehicle.Params(lf=rng.uniform(1, 2), lr=rng.uniform(1, 2)))
+        .build_pose(math.Pose(rng.uniform(0, 60), rng.uniform(-4, 4), rng.uniform(-0.5, 0.5)))
+        .build_vel(rng.uniform(1, 20), 0)
+        for _ in range(12)
+    ]
+
+
+def controllers():
+    return [
+        (lambda: StanleyControl(StanleyControl.Params(k=2.0))),
+        (lambda: PurePursuitControl(PurePursuitControl.Params(lookahead_k=0.4))),
+    ]
+
+
+@pytest.mark.parametrize("make_controller", controllers())
+def test_batch_matches_scalar_on_shared_path(make_controller, vehicles):
+    path = make_path(3.0)
+    states = np.stack([vehicle.state_cog.data for vehicle in vehicles])
+    car_params = Vehicle.BatchParams.from_params([vehicle.params for vehicle in vehicles])
+
+    steer = make_controller().update_batch(states, car_params, path)
+    expected = [make_controller().update(vehicle, path) for vehicle in vehicles]
+    np.testing.assert_allclose(steer, expected, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("make_controller", controllers())
+def test_batch_matches_scalar_on_paths_per_vehicle(make_controller, vehicles):
+    shared = [make_path(3.0), make_path(-2.0), StraightPath()]
+    paths = [shared[idx % 3] for idx in range(len(vehicles))]
+    paths[0] = BSplinePath([], 15, 3, 0, 1)
+    params = Vehicle.Params()
+    for vehicle in vehicles:
+        vehicle.params = params
+    states = np.stack([vehicle.state_cog.data for vehicle in vehicles])
+
+    controller = make_controller()
+    controller.steer_cont_batch = np.full(len(vehicles), 0.3)
+    steer = controller.update_batch(states, params, paths)
+    expected = [make_controller().update(vehicle, path) for vehicle, path in zip(vehicles, paths)]
+    # a vehicle without a path holds its last command
+    assert steer[0] == 0.3
+    np.testing.assert_allclose(steer[1:], expected[1:], rtol=0, atol=1e-12)
@@ -0,0 +1,203 @@
+from control.gain_cache import GainCache
+from control.gain_schedule import GainSchedule, GainStore
+from control.lqr_path_tracker import (LQRPathTrackerBase, KinematicLQRPathTracker, DynamicLQRPathTracker, dlqr, lqr,
+                                     dynamic_error_model, understeer_gradient)
+from control.mpc_path_tracker import MPCPathTracker
+from dynamics.Vehicle import Vehicle
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import numpy as np
+
+
+@pytest.fixture
+def params():
+    Q = np.zeros((4, 4))
+    Q[0, 0] = 0.1
+    R = 5.0 * np.ones((1, 1))
+    return LQRPathTrackerBase.Params(Q=Q, R=R, dt=1 / 30)
+
+
+def test_gain_schedule_interpolation():
+    speeds = np.linspace(1.0, 5.0, 5)
+    schedule = GainSchedule(speeds, np.stack([np.array([[v, v ** 2]]) for v in speeds]))
+    assert schedule.gains.shape == (5, 1, 2)
+    assert schedule.size_bytes == schedule.speeds.nbytes + schedule.gains.nbytes
+
+    np.testing.assert_allclose(schedule.gain(3.0), [[3.0, 9.0]])
+    np.testing.assert_allclose(schedule.gain(2.5), [[2.5, 6.5]])
+    # clamped to the ends of the grid
+    np.testing.assert_allclose(schedule.gain(0.0), [[1.0, 1.0]])
+    np.testing.assert_allclose(schedule.gain(9.0), [[5.0, 25.0]])
+
+
+@pytest.mark.parametrize("tracker_type", [KinematicLQRPathTracker, DynamicLQRPathTracker])
+def test_scheduled_gain_matches_direct_solve(tracker_type, params):
+    tracker = tracker_type(params)
+    car_params = Vehicle.Params()
+    solve = dlqr if tracker_type is KinematicLQRPathTracker else lqr
+
+    tracker._gain(10.0, car_params)
+    for vel in tracker.gain_schedule.speeds[::7]:
+        K = solve(*tracker.state_space(vel, car_params), params.Q, params.R)
+        K = K[0] if isinstance(K, tuple) else K
+        np.testing.assert_allclose(tracker._gain(vel, car_params), K)
+
+    # between grid points the gain is continuous in the speed, close to the exact solve
+    vel = 10.25
+    K = solve(*tracker.state_space(vel, car_params), params.Q, params.R)
+    K = K[0] if isinstance(K, tuple) else K
+    np.testing.assert_allclose(tracker._gain(vel, car_params), K, rtol=5e-2, atol=1e-4)
+
+
+def test_schedule_rebuilt_on_param_change(params):
+    tracker = DynamicLQRPathTracker(params)
+    car_params = Vehicle.Params()
+    K_0 = tracker._gain(10.0, car_params)
+    schedule = tracker.gain_schedule
+
+    tracker._gain(12.0, car_params)
+    assert tracker.gain_schedule is schedule
+
+    # in place edits, as done by the menu sliders
+    params.Q[0, 0] = 1.0
+    K_1 = tracker._gain(10.0, car_params)
+    assert tracker.gain_schedule is not schedule
+    assert not np.allclose(K_0, K_1)
+
+    schedule = tracker.gain_schedule
+    car_params.cf = 5e4
+    tracker._gain(10.0, car_params)
+    assert tracker.gain_schedule is not schedule
+
+
+def test_gain_cache_across_trackers(params, tmp_path):
+    car_params = Vehicle.Params()
+    cache = GainCache(GainCache.Params(cache_dir=str(tmp_path)))
+    K = KinematicLQRPathTracker(params, cache)._gain(10.0, car_params)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert len(list(tmp_path.glob("*.npz"))) == 1
+
+    # a new tracker, as in a new session, loads the solved table
+    tracker = KinematicLQRPathTracker(params, GainCache(GainCache.Params(cache_dir=str(tmp_path))))
+    np.testing.assert_array_equal(tracker._gain(10.0, car_params), K)
+    assert tracker.gain_cache.hits == 1
+
+    # other model types and weights are other entries
+    DynamicLQRPathTracker(params, cache)._gain(10.0, car_params)
+    params.R[0, 0] = 1.0
+    KinematicLQRPathTracker(params, cache)._gain(10.0, car_params)
+    assert len(list(tmp_path.glob("*.npz"))) == 3
+
+
+def test_gain_cache_eviction_and_corrupt_entries(tmp_path):
+    cache = GainCache(GainCache.Params(cache_dir=str(tmp_path)))
+    gains = np.random.default_rng(0).random((60, 1, 4))
+    keys = [GainCache.key("model", np.eye(4) * i, np.ones((4, 1)), np.eye(4), np.eye(1), 0.1) for i in range(3)]
+    assert len(set(keys)) == 3
+
+    for i, key in enumerate(keys):
+        cache.store(key, gains)
+        os.utime(cache._path(key), (i, i))
+    # the oldest entry is refreshed on load, so the second one is least recently used
+    np.testing.assert_array_equal(cache.load(keys[0]), gains)
+    cache.params.max_bytes = cache.size_bytes() - 1
+    cache._evict()
+    assert cache.load(keys[1]) is None
+    assert cache.load(keys[0]) is not None and cache.load(keys[2]) is not None
+
+    with open(cache._path(keys[0]), "wb") as f:
+        f.write(b"not a zip")
+    assert cache.load(keys[0]) is None
+    assert not os.path.exists(cache._path(keys[0]))
+
+
+def test_gain_store_falls_back_to_nearest_solved():
+    store = GainStore(np.linspace(0.0, 4.0, 5), (1, 2))
+    assert store.gain(1.0) is None
+
+    store.publish(3, np.array([[3.0, 3.0]]))
+    np.testing.assert_allclose(store.gain(0.2), [[3.0, 3.0]])
+    store.publish(2, np.array([[2.0, 2.0]]))
+    np.testing.assert_allclose(store.gain(2.5), [[2.5, 2.5]])
+    assert not store.complete and store.n_solved == 2
+
+
+@pytest.mark.parametrize("tracker_type", [KinematicLQRPathTracker, DynamicLQRPathTracker])
+def test_background_schedule_matches_inline(tracker_type, params):
+    car_params = Vehicle.Params()
+    K_inline = tracker_type(params)._gain(10.0, car_params)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    tracker = tracker_type(params, executor=executor)
+    tracker.preview_speed(20.0, 10.0)
+    # the current speed is always solved inline
+    K = tracker._gain(10.0, car_params)
+    assert K is not None
+    executor.shutdown(wait=True)
+
+    assert tracker.gain_store.complete
+    assert tracker.gain_schedule is not None and tracker.gain_schedule.converged
+    np.testing.assert_allclose(tracker._gain(10.0, car_params), K_inline, rtol=1e-6)
+
+
+def test_background_solve_errors_are_raised(params):
+    class FailingTracker(KinematicLQRPathTracker):
+        def _fill_store(self, *args):
+            raise RuntimeError("solve failed")
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    tracker = FailingTracker(params, executor=executor)
+    car_params = Vehicle.Params()
+    tracker._gain(10.0, car_params)
+    executor.shutdown(wait=True)
+    with pytest.raises(RuntimeError, match="solve failed"):
+        tracker._gain(10.0, car_params)
+
+
+def test_preview_speeds_are_solved_first(params):
+    tracker = KinematicLQRPathTracker(params)
+    tracker._vel = 10.0
+    speeds = np.linspace(tracker.SCHEDULE_V_MIN, tracker.SCHEDULE_V_MAX, tracker.SCHEDULE_N_POINTS)
+
+    # accelerating from 10 m/s towards 12 m/s, the previewed speeds stop at the command
+    tracker.preview_speed(12.0, 5.0)
+    assert tracker._preview_speeds == (10.0, 12.0)
+    order = speeds[np.argsort(tracker._solve_priority(speeds), kind="stable")]
+    n_ahead = np.count_nonzero((speeds >= 10.0 - 0.5) & (speeds <= 12.0 + 0.5))
+    assert np.all((order[:n_ahead] >= 9.5) & (order[:n_ahead] <= 12.5))
+
+    # towards a far command, as far as max_accel reaches within the horizon
+    tracker.preview_speed(0.0, 2.0)
+    assert tracker._preview_speeds == (10.0, 10.0 - 2.0 * tracker.PREVIEW_HORIZON_S)
+
+
+def test_dynamic_trackers_share_the_error_model():
+    car_params = Vehicle.Params(lf=1.2, lr=1.8, cf=8e4, cr=1.2e5)
+    A, B = DynamicLQRPathTracker(LQRPathTrackerBase.Params(Q=np.eye(4), R=np.eye(1), dt=1 / 30)).state_space(
+        12.0, car_params)
+    mpc = MPCPathTracker(MPCPathTracker.Params(Q=np.eye(4), R=1.0, R_rate=1.0, dt=1 / 30,
+                                               model=MPCPathTracker.Model.dynamic))
+    A_mpc, B_mpc, _ = mpc._continuous_model(np.array([12.0]), car_params)
+    np.testing.assert_array_equal(A, A_mpc[0])
+    np.testing.assert_array_equal(B[:, 0], B_mpc[0])
+    # the heading error couples into the yaw rate error with the yaw moment of the lateral force
+    assert A[3, 1] == -A[3, 2] / 12.0
+
+
+@pytest.mark.parametrize("vel", [5.0, 15.0, 25.0])
+def test_dynamic_feedforward_has_no_steady_state_offset(params, vel):
+    # unequal axles, where the understeer gradient matters
+    car_params = Vehicle.Params(lf=1.2, lr=1.8, cf=8e4, cr=1.2e5)
+    params.Q = np.diag([1.0, 0.1, 1.0, 0.1])
+    tracker = DynamicLQRPathTracker(params)
+    K = tracker._gain(vel, car_params)
+    curv = 0.02
+    A, B, E = dynamic_error_model(np.array([vel]), car_params)
+    delta_ff = tracker._feedforward(vel, curv, K, car_params)
+
+    # steady state of x_dot = (A - B K) x + B delta_ff + E curv
+    x_ss = np.linalg.solve(A[0] - B[0][:, None] @ K, -(B[0] * delta_ff + E[0] * curv))
+    assert abs(x_ss[0]) < 1e-9
+    np.testing.assert_allclose(delta_ff - (K @ x_ss)[0], car_params.wheel_base * curv
+                               + understeer_gradient(car_params) * vel ** 2 * curv)
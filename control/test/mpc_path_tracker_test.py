@@ -0,0 +1,88 @@
+from control.mpc_path_tracker import MPCPathTracker
+from control.qp_solver import AdmmQPSolver
+from control.LowLevelControl import SteerControl
+from dynamics.CartesianDynamicBicycleModel import CartesianDynamicBicycleModel
+from dynamics.Vehicle import Vehicle
+from paths.straight_path import StraightPath
+from utils import math
+import pytest
+import numpy as np
+import scipy.optimize
+
+
+def params(model: MPCPathTracker.Model, **kwargs) -> MPCPathTracker.Params:
+    Q = np.zeros((4, 4))
+    Q[0, 0] = 0.1
+    Q[2, 2] = 0.1
+    return MPCPathTracker.Params(Q=Q, R=5.0, R_rate=5.0, dt=1 / 30, model=model, **kwargs)
+
+
+def test_qp_matches_reference_solver():
+    rng = np.random.default_rng(0)
+    n = 8
+    M = rng.standard_normal((n, n))
+    P = M @ M.T + 0.1 * np.eye(n)
+    q = 5.0 * rng.standard_normal(n)
+    C = np.vstack((np.eye(n), np.eye(n) - np.eye(n, k=-1)))
+    l = np.concatenate((np.full(n, -0.5), np.full(n, -0.2)))
+    u = -l
+
+    x, y, info = AdmmQPSolver().solve(P, q, C, l, u)
+    assert info.converged
+
+    ref = scipy.optimize.minimize(lambda z: 0.5 * z @ P @ z + q @ z, np.zeros(n), jac=lambda z: P @ z + q,
+                                  constraints=[scipy.optimize.LinearConstraint(C, l, u)], method="trust-constr",
+                                  options={"gtol": 1e-10, "xtol": 1e-12, "maxiter": 5000})
+    np.testing.assert_allclose(x, ref.x, atol=1e-3)
+
+    # a warm start at the solution converges at the first check
+    _, _, info_warm = AdmmQPSolver().solve(P, q, C, l, u, x, y)
+    assert info_warm.converged and info_warm.iterations < info.iterations
+
+
+@pytest.mark.parametrize("model", list(MPCPathTracker.Model))
+def test_offset_converges(model):
+    tracker = MPCPathTracker(params(model))
+    car = Vehicle(params=Vehicle.Params()).build_pose(math.Pose(0, 2.0, 0)).build_vel(15.0, 0)
+    dynamics = CartesianDynamicBicycleModel()
+    steer_control = SteerControl(SteerControl.Params())
+    path = StraightPath()
+    dt = 1 / 60
+
+    delta = 0.0
+    deltas = []
+    for i in range(240):
+        if i % 2 == 0:
+            delta = tracker.update(car, path)
+            deltas.append(delta)
+            assert tracker.qp_info.converged
+        car = dynamics.update(car, steer_control.update(car, delta, dt), delta, car.state_cog.vx, dt)
+
+    assert abs(car.state_cog.y) < 0.05
+    assert abs(car.state_cog.theta) < 0.01
+    deltas = np.array(deltas)
+    assert np.all(np.abs(deltas) <= car.params.delta_max + 1e-3)
+    assert np.all(np.abs(np.diff(deltas)) <= car.params.delta_rate_max * tracker.params.dt + 1e-3)
+
+
+def test_horizon_adapts_to_budget():
+    car = Vehicle(params=Vehicle.Params()).build_pose(math.Pose(0, 1.0, 0)).build_vel(10.0, 0)
+    tracker = MPCPathTracker(params(MPCPathTracker.Model.dynamic, budget_ms=1e-3))
+    for _ in range(20):
+        tracker.update(car, StraightPath())
+    assert tracker.horizon == tracker.params.horizon_min
+    assert len(tracker.predicted_delta) == tracker.params.horizon_min
+
+    tracker.params.budget_ms = 1e3
+    for _ in range(30):
+        tracker.update(car, StraightPath())
+    assert tracker.horizon == tracker.params.horizon_max
+
+
+def test_speed_preview():
+    tracker = MPCPathTracker(params(MPCPathTracker.Model.dynamic))
+    np.testing.assert_allclose(tracker._speed_preview(10.0, 3), [10.0, 10.0, 10.0])
+    tracker.preview_speed(11.0, 15.0)
+    np.testing.assert_allclose(tracker._speed_preview(10.0, 4), [10.0, 10.5, 11.0, 11.0])
+    tracker.preview_speed(0.0, 15.0)
+    np.testing.assert_allclose(tracker._speed_preview(2.0, 3), [2.0, 1.5, 1.0])
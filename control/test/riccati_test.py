@@ -0,0 +1,84 @@
+from control.riccati import solve_dare, solve_dare_sda, solve_dare_newton, solve_care, dare_residual
+from control.riccati import solve_dare_sda_batch, solve_care_batch
+from control.lqr_path_tracker import LQRPathTrackerBase, KinematicLQRPathTracker
+from dynamics.Vehicle import Vehicle
+import scipy.linalg as la
+import pytest
+import numpy as np
+
+
+def _kinematic_system(vel, dt=1 / 30):
+    tracker = KinematicLQRPathTracker(LQRPathTrackerBase.Params(Q=np.diag([0.1, 0, 0, 0]), R=5.0 * np.eye(1), dt=dt))
+    A, B = tracker.state_space(vel, Vehicle.Params())
+    return A, B, tracker.params.Q, tracker.params.R
+
+
+def _gain(A, B, R, X):
+    return la.solve(R + B.T @ X @ B, B.T @ X @ A)
+
+
+@pytest.mark.parametrize("vel", [0.5, 10.0, 30.0])
+def test_sda_matches_scipy(vel):
+    A, B, Q, R = _kinematic_system(vel)
+    X, info = solve_dare_sda(A, B, Q, R)
+    X_ref = la.solve_discrete_are(A, B, Q, R)
+    assert info.converged and info.method == "sda"
+    assert info.residual < 1e-9
+    np.testing.assert_allclose(X, X_ref, rtol=1e-7, atol=1e-9)
+
+
+def test_newton_warm_start_from_neighbour():
+    A, B, Q, R = _kinematic_system(10.0)
+    A_prev, B_prev, _, _ = _kinematic_system(9.5)
+    K_prev = _gain(A_prev, B_prev, R, la.solve_discrete_are(A_prev, B_prev, Q, R))
+
+    X, info = solve_dare(A, B, Q, R, K_prev)
+    assert info.method == "newton" and info.converged
+    assert info.iterations < solve_dare_sda(A, B, Q, R)[1].iterations
+    np.testing.assert_allclose(X, la.solve_discrete_are(A, B, Q, R), rtol=1e-7, atol=1e-9)
+
+
+def test_non_stabilizing_warm_start_falls_back_to_sda():
+    A, B, Q, R = _kinematic_system(10.0)
+    X, info = solve_dare_newton(A, B, Q, R, np.zeros((1, 4)))
+    assert X is None and not info.converged
+
+    X, info = solve_dare(A, B, Q, R, np.zeros((1, 4)))
+    assert info.method == "sda" and info.converged
+    assert dare_residual(A, B, Q, R, X) < 1e-9
+
+
+def test_care_telemetry():
+    A = np.array([[0.0, 1.0], [0.0, 0.0]])
+    B = np.array([[0.0], [1.0]])
+    X, info = solve_care(A, B, np.eye(2), np.eye(1))
+    assert info.converged and info.time_ms >= 0
+    np.testing.assert_allclose(X, la.solve_continuous_are(A, B, np.eye(2), np.eye(1)))
+
+
+def test_care_newton_warm_start():
+    A = np.array([[0.0, 1.0], [0.0, -0.1]])
+    B = np.array([[0.0], [1.0]])
+    Q, R = np.eye(2), np.eye(1)
+    K_init = B.T @ la.solve_continuous_are(A + 0.05, B, Q, R)
+    X, info = solve_care(A, B, Q, R, K_init)
+    assert info.method == "newton" and info.converged
+    np.testing.assert_allclose(X, la.solve_continuous_are(A, B, Q, R), rtol=1e-8)
+
+
+def test_batched_solvers_match_scipy():
+    systems = [_kinematic_system(vel) for vel in np.linspace(0.5, 30, 12)]
+    A = np.stack([s[0] for s in systems])
+    B = np.stack([s[1] for s in systems])
+    Q, R = systems[0][2], systems[0][3]
+    X, converged = solve_dare_sda_batch(A, B, Q, R)
+    assert converged.all()
+    for X_i, (A_i, B_i, _, _) in zip(X, systems):
+        np.testing.assert_allclose(X_i, la.solve_discrete_are(A_i, B_i, Q, R), rtol=1e-7, atol=1e-9)
+
+    A_c = np.stack([np.array([[0.0, 1.0], [0.0, -a]]) for a in [-0.5, 0.0, 0.5]])
+    B_c = np.stack([np.array([[0.0], [1.0]])] * 3)
+    X, ok = solve_care_batch(A_c, B_c, np.eye(2), np.eye(1))
+    assert ok.all()
+    for X_i, A_i, B_i in zip(X, A_c, B_c):
+        np.testing.assert_allclose(X_i, la.solve_continuous_are(A_i, B_i, np.eye(2), np.eye(1)), rtol=1e-9)
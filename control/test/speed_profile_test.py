@@ -0,0 +1,51 @@
+from control.LowLevelControl import SpeedControl
+from control.speed_profile import SpeedProfile
+from dynamics.Vehicle import Vehicle
+from paths.BSpline import BSplinePath
+from utils import math
+import numpy as np
+import pygame
+
+
+def sequential_profile(stations, curvs, params: SpeedProfile.Params) -> np.ndarray:
+    v = [min(params.max_speed, np.sqrt(params.max_lat_accel / abs(c)) if c else np.inf) for c in curvs]
+    for i in range(1, len(v)):
+        v[i] = min(v[i], np.sqrt(v[i - 1] ** 2 + 2 * params.max_accel * (stations[i] - stations[i - 1])))
+    for i in range(len(v) - 2, -1, -1):
+        v[i] = min(v[i], np.sqrt(v[i + 1] ** 2 + 2 * params.max_decel * (stations[i + 1] - stations[i])))
+    return np.clip(v, params.min_speed, params.max_speed)
+
+
+def test_matches_sequential_passes():
+    rng = np.random.default_rng(0)
+    stations = np.cumsum(rng.uniform(0.05, 1.0, 500))
+    curvs = rng.uniform(-0.5, 0.5, 500) * (rng.uniform(size=500) < 0.1)
+    params = SpeedProfile.Params(max_accel=3.0, max_decel=6.0)
+    np.testing.assert_allclose(SpeedProfile.profile(stations, curvs, params),
+                               sequential_profile(stations, curvs, params), rtol=1e-12)
+
+
+def test_recomputed_on_path_update_only():
+    path = BSplinePath([pygame.Vector2(x, 0) for x in range(10)], 15)
+    profile = SpeedProfile(SpeedProfile.Params())
+    profile.update(path)
+    speeds = profile.speeds
+    np.testing.assert_allclose(speeds, profile.params.max_speed)
+    profile.update(path)
+    assert profile.speeds is speeds
+
+    path.update([pygame.Vector2(x, 0.2 * x ** 2) for x in range(10)])
+    profile.update(path)
+    assert profile.speeds is not speeds
+    assert profile.get_speed_at_station(0.0) < profile.params.max_speed
+
+
+def test_speed_control_slows_down_on_curves():
+    # half turn of 10 m radius
+    points = [pygame.Vector2(10 * np.sin(a), 10 - 10 * np.cos(a)) for a in np.linspace(0, np.pi, 20)]
+    path = BSplinePath(points, 15)
+    speed_control = SpeedControl(SpeedControl.Params())
+    speed_control.speed_cmd = 25.0
+    car = Vehicle(params=Vehicle.Params()).build_pose(math.Pose(10, 10, np.pi / 2)).build_vel(25.0, 0)
+    speed = speed_control.update(car, path, 1 / 60)
+    assert speed <= np.sqrt(SpeedControl.Params.max_lat_accel * 10) * 1.05
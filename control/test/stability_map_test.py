@@ -0,0 +1,54 @@
+from control.stability_map import StabilityMap
+from control.lqr_path_tracker import LQRPathTrackerBase, KinematicLQRPathTracker, DynamicLQRPathTracker
+from dynamics.Vehicle import Vehicle
+import pytest
+import numpy as np
+
+
+def tracker(tracker_type) -> LQRPathTrackerBase:
+    return tracker_type(LQRPathTrackerBase.Params(Q=np.diag([0.1, 0.0, 0.0, 0.0]), R=5.0 * np.eye(1), dt=1 / 30))
+
+
+@pytest.mark.parametrize("tracker_type", [KinematicLQRPathTracker, DynamicLQRPathTracker])
+def test_grid_matches_pointwise_gains(tracker_type):
+    lqr = tracker(tracker_type)
+    stability_map = StabilityMap(lqr, StabilityMap.Params(scales=np.array([0.5, 1.0, 2.0])))
+    car_params = Vehicle.Params()
+    assert stability_map.update(car_params)
+    assert stability_map.converged.all()
+    assert stability_map.gains.shape == (3, 30, 1, 4)
+    assert np.all(stability_map.decay_rate > 0)
+
+    for row, scale in enumerate(stability_map.params.scales):
+        for col in [0, 15, 29]:
+            params = Vehicle.Params(m=scale * car_params.m)
+            A, B = lqr.state_space(stability_map.params.speeds[col], params)
+            K, _ = lqr._solve_gain(A, B, lqr.params.Q, lqr.params.R, None)
+            np.testing.assert_allclose(stability_map.gains[row, col], K, rtol=1e-6, atol=1e-9)
+
+
+def test_slider_change_refreshes_rows_and_caches():
+    lqr = tracker(DynamicLQRPathTracker)
+    stability_map = StabilityMap(lqr, StabilityMap.Params(rows_per_update=2))
+    car_params = Vehicle.Params()
+    assert stability_map.update(car_params) and stability_map.complete
+    assert not stability_map.update(car_params)
+    gains = stability_map.gains
+
+    # as moved by a slider, the row of the current vehicle is refreshed first
+    lqr.params.Q[2, 2] = 0.3
+    stability_map.update(car_params)
+    np.testing.assert_array_equal(stability_map.stale, [True, False, False, True, True])
+    stability_map.update(car_params)
+    np.testing.assert_array_equal(stability_map.stale, [False, False, False, False, True])
+    stability_map.update(car_params)
+    assert stability_map.complete and not stability_map.update(car_params)
+
+    cold = StabilityMap(lqr, StabilityMap.Params())
+    cold.update(car_params)
+    np.testing.assert_allclose(stability_map.gains, cold.gains)
+
+    # the previous grid was not refreshed in place and moving the slider back is served from the cache
+    lqr.params.Q[2, 2] = 0.0
+    assert stability_map.update(car_params) and stability_map.complete
+    assert stability_map.gains is gains
@@ -1,9 +1,77 @@
 import numpy as np
 import enum
-from typing import List
+from scipy import linalg
+from typing import Tuple, Union
 
 from dynamics.Vehicle import Vehicle
 from dynamics.motion_model_base import MotionModel
+from dynamics.tire_model import GRAVITY, LinearTire, TireModel
+
+
+class _LinearizedLateral:
+    """
+    Zero-order-hold discretization (Ad, Bd) of the small angle lateral dynamics [vy, thetadot, delta] with input
+    delta_rate, tabulated over a speed grid for one set of vehicle params (or one table per vehicle of a batch) and one
+    time step.
+    """
+    __slots__ = ("key", "vx_grid", "ad", "bd")
+
+    _PARAM_NAMES = ("m", "Iz", "lf", "lr", "cf", "cr")
+
+    def __init__(self, key: tuple, vx_grid: np.ndarray, ad: np.ndarray, bd: np.ndarray):
+        self.key = key
+        self.vx_grid = vx_grid
+        self.ad = ad  # [(N,) n_grid, 3, 3]
+        self.bd = bd  # [(N,) n_grid, 3]
+
+    @staticmethod
+    def build(p: Union[Vehicle.Params, Vehicle.BatchParams], dt: float, vx_grid: np.ndarray,
+              vx_min: float) -> "_LinearizedLateral":
+        # (N, 1) columns for batched params so that they broadcast against the (n_grid,) speeds
+        m, iz, lf, lr, cf, cr = (np.expand_dims(np.asarray(getattr(p, name), dtype=float), -1)
+                                 for name in _LinearizedLateral._PARAM_NAMES)
+        vx = vx_grid
+        vx_tire, direction = np.maximum(np.abs(vx), vx_min), np.where(vx < 0, -1.0, 1.0)
+
+        # continuous time [A B; 0 0] of the linear tire, small angle model, expm of it times dt holds [Ad Bd; 0 I]
+        a_b = np.zeros(np.broadcast_shapes(m.shape, vx.shape) + (4, 4))
+        a_b[..., 0, 0] = -(cf + cr) / (m * vx_tire)
+        a_b[..., 0, 1] = (cr * lr - cf * lf) / (m * vx_tire) - vx
+        a_b[..., 0, 2] = direction * cf / m
+        a_b[..., 1, 0] = (cr * lr - cf * lf) / (iz * vx_tire)
+        a_b[..., 1, 1] = -(cf * lf ** 2 + cr * lr ** 2) / (iz * vx_tire)
+        a_b[..., 1, 2] = direction * cf * lf / iz
+        a_b[..., 2, 3] = 1.0
+
+        phi = linalg.expm(a_b * dt)
+        return _LinearizedLateral(_LinearizedLateral.make_key(p, dt), vx_grid, phi[..., :3, :3].copy(),
+                                  phi[..., :3, 3].copy())
+
+    @staticmethod
+    def make_key(p: Union[Vehicle.Params, Vehicle.BatchParams], dt: float) -> tuple:
+        if isinstance(p, Vehicle.BatchParams):
+            return tuple(getattr(p, name).tobytes() for name in _LinearizedLateral._PARAM_NAMES) + (dt,)
+        return p.m, p.Iz, p.lf, p.lr, p.cf, p.cr, dt
+
+    def lookup(self, vx) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Linearly interpolate Ad and Bd between the grid speeds, speeds outside the grid use the closest end.
+        """
+        pos = np.interp(vx, self.vx_grid, np.arange(len(self.vx_grid)))
+        idx = np.minimum(pos.astype(int), len(self.vx_grid) - 2)
+        w = (pos - idx)[..., None]
+        if self.ad.ndim == 4:
+            # one table per vehicle
+            rows = np.arange(self.ad.shape[0])
+            ad_0, ad_1 = self.ad[rows, idx], self.ad[rows, idx + 1]
+            bd_0, bd_1 = self.bd[rows, idx], self.bd[rows, idx + 1]
+        else:
+            ad_0, ad_1 = self.ad[idx], self.ad[idx + 1]
+            bd_0, bd_1 = self.bd[idx], self.bd[idx + 1]
+        bd = bd_0 * (1.0 - w) + bd_1 * w
+        w = w[..., None]
+        ad = ad_0 * (1.0 - w) + ad_1 * w
+        return ad, bd
 
 
 class CartesianDynamicBicycleModel(MotionModel):
@@ -19,19 +87,83 @@ class CartesianDynamicBicycleModel(MotionModel):
         VX = 0
         DELTA_RATE = 1
 
+    _RATE_STATES = (StateIdx.VY, StateIdx.THETADOT, StateIdx.DELTA)
+
+    # floor on the speed in the slip angle denominators, arctan(v_lat/|vx|) is singular as vx -> 0. The denominator is
+    # the magnitude so that the tire forces oppose the lateral speed in both directions of travel, the direction of
+    # travel only flips the slip angle of the steered wheel
+
+    VX_MIN = 0.5  # [m/s]
+
+    # speeds tabulated by the LINEARIZED scheme, spaced so that +/- VX_MIN are grid points. The scheme linearizes the
+    # tires about zero slip, where the slope of every tire model is the cornering stiffness
+    LINEARIZATION_VX_GRID = np.linspace(-40.0, 40.0, 161)  # [m/s]
+
+    _LAT_STATES = [StateIdx.VY, StateIdx.THETADOT, StateIdx.DELTA]
+
+    def __init__(self, int_scheme=MotionModel.IntScheme.RK4, tire_model: TireModel = None):
+        super().__init__(int_scheme)
+        self.tire_model = tire_model if tire_model else LinearTire()
+        self._int_scheme_map[self.IntScheme.LINEARIZED] = self._integrate_linearized
+        self._linearization = None
+
+    def invalidate_linearization(self):
+        """
+        Drop the tabulated (Ad, Bd), e.g. after the vehicle params were edited. The table is also rebuilt whenever the
+        params or dt it was built for change.
+        """
+        self._linearization = None
+
+    def _linearized_lateral(self, p: Union[Vehicle.Params, Vehicle.BatchParams], dt: float) -> _LinearizedLateral:
+        if self._linearization is None or self._linearization.key != _LinearizedLateral.make_key(p, dt):
+            self._linearization = _LinearizedLateral.build(p, dt, self.LINEARIZATION_VX_GRID, self.VX_MIN)
+        return self._linearization
+
+    def _integrate_linearized(self, z: np.ndarray, u: np.ndarray, p: Vehicle.Params, dt: float, ws):
+        """
+        One table lookup and a 3x3 matrix-vector product for the lateral states, then the nonlinear pose kinematics
+        with the trapezoidal yaw rate and lateral speed.
+        """
+        state_idx = self.StateIdx
+        ctrl_idx = self.CtrlIdx
+        vx = u[..., ctrl_idx.VX]
+        ad, bd = self._linearized_lateral(p, dt).lookup(vx)
+
+        lat = z[..., self._LAT_STATES]
+        lat_new = (ad @ lat[..., None])[..., 0] + bd * u[..., ctrl_idx.DELTA_RATE, None]
+        ws.z_new[..., self._LAT_STATES] = lat_new
+
+        vy = z[..., state_idx.VY]
+        vy_mid = 0.5 * (vy + ws.z_new[..., state_idx.VY])
+        theta = z[..., state_idx.THETA]
+        theta_new = theta + 0.5 * dt * (z[..., state_idx.THETADOT] + ws.z_new[..., state_idx.THETADOT])
+        theta_mid = 0.5 * (theta + theta_new)
+        cos_theta = np.cos(theta_mid)
+        sin_theta = np.sin(theta_mid)
+        ws.z_new[..., state_idx.X] = z[..., state_idx.X] + dt * (vx * cos_theta - vy_mid * sin_theta)
+        ws.z_new[..., state_idx.Y] = z[..., state_idx.Y] + dt * (vy_mid * cos_theta + vx * sin_theta)
+        ws.z_new[..., state_idx.THETA] = theta_new
+        return ws.z_new
+
     @staticmethod
-    def _state_to_vehicle(z, u, _) -> Vehicle.State:
+    def _state_to_vehicle(z, u, _, state: Vehicle.State) -> Vehicle.State:
         state_idx = CartesianDynamicBicycleModel.StateIdx
         ctrl_idx = CartesianDynamicBicycleModel.CtrlIdx
-        return Vehicle.State(x=z[state_idx.X], y=z[state_idx.Y], theta=z[state_idx.THETA],
-                             vx=u[ctrl_idx.VX],
-                             vy=z[state_idx.VY], delta=z[state_idx.DELTA], delta_rate=u[ctrl_idx.DELTA_RATE],
-                             thetadot=z[state_idx.THETADOT])
+        data = state.data
+        data[Vehicle.State.Idx.X] = z[state_idx.X]
+        data[Vehicle.State.Idx.Y] = z[state_idx.Y]
+        data[Vehicle.State.Idx.THETA] = z[state_idx.THETA]
+        data[Vehicle.State.Idx.VX] = u[ctrl_idx.VX]
+        data[Vehicle.State.Idx.VY] = z[state_idx.VY]
+        data[Vehicle.State.Idx.DELTA] = z[state_idx.DELTA]
+        data[Vehicle.State.Idx.DELTA_RATE] = u[ctrl_idx.DELTA_RATE]
+        data[Vehicle.State.Idx.THETADOT] = z[state_idx.THETADOT]
+        state.touch()
+        return state
 
     @staticmethod
-    def _vehicle_to_state(vehicle_state_cog: Vehicle.State) -> List:
+    def _vehicle_to_state(vehicle_state_cog: Vehicle.State, z: np.ndarray) -> np.ndarray:
         state_idx = CartesianDynamicBicycleModel.StateIdx
-        z = [0.0] * len(state_idx)
         z[state_idx.X] = vehicle_state_cog.x
         z[state_idx.Y] = vehicle_state_cog.y
         z[state_idx.VY] = vehicle_state_cog.vy
@@ -41,39 +173,50 @@ class CartesianDynamicBicycleModel(MotionModel):
         return z
 
     @staticmethod
-    def _to_ctrl(steer_rate, vel) -> List:
+    def _to_ctrl(steer_rate, vel, u: np.ndarray) -> np.ndarray:
         ctrl_idx = CartesianDynamicBicycleModel.CtrlIdx
-        u = [0.0] * len(ctrl_idx)
-        u[ctrl_idx.DELTA_RATE] = steer_rate
-        u[ctrl_idx.VX] = vel
+        u[..., ctrl_idx.DELTA_RATE] = steer_rate
+        u[..., ctrl_idx.VX] = vel
         return u
 
     @staticmethod
-    def lat_force_front_tire(cf, vy, vx, thetadot, lf, delta):
-        return cf * (delta - np.arctan((vy + thetadot * lf) / vx))
+    def tire_speed(vx) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Speed floored at VX_MIN for the slip angle denominators and the direction of travel, forward at standstill.
+        """
+        return np.maximum(np.abs(vx), CartesianDynamicBicycleModel.VX_MIN), np.where(vx < 0, -1.0, 1.0)
 
     @staticmethod
-    def lat_force_rear_tire(cr, vy, vx, thetadot, lr):
-        return -cr * np.arctan((vy - thetadot * lr) / vx)
+    def slip_angles(vy, vx_tire, direction, thetadot, delta, p) -> Tuple[np.ndarray, np.ndarray]:
+        alpha_f = np.arctan((vy + thetadot * p.lf) / vx_tire) - direction * delta
+        alpha_r = np.arctan((vy - thetadot * p.lr) / vx_tire)
+        return alpha_f, alpha_r
 
     @staticmethod
-    def _eqn_of_motn(z: List, u: List, p: Vehicle.Params):
+    def axle_loads(p) -> Tuple[np.ndarray, np.ndarray]:
+        # static front and rear normal loads [N]
+        return p.m * GRAVITY * p.lr / p.wheel_base, p.m * GRAVITY * p.lf / p.wheel_base
+
+    def _eqn_of_motn(self, z: np.ndarray, u: np.ndarray, p: Vehicle.Params, z_dot: np.ndarray) -> np.ndarray:
         state_idx = CartesianDynamicBicycleModel.StateIdx
         ctrl_idx = CartesianDynamicBicycleModel.CtrlIdx
 
         # unpack state
-        vy = z[state_idx.VY]
-        theta = z[state_idx.THETA]
-        thetadot = z[state_idx.THETADOT]
-        delta = z[state_idx.DELTA]
+        vy = z[..., state_idx.VY]
+        theta = z[..., state_idx.THETA]
+        thetadot = z[..., state_idx.THETADOT]
+        delta = z[..., state_idx.DELTA]
 
         # unpack control
-        vx = u[ctrl_idx.VX]
-        delta_dot = u[ctrl_idx.DELTA_RATE]
+        vx = u[..., ctrl_idx.VX]
+        delta_dot = u[..., ctrl_idx.DELTA_RATE]
 
-        # lateral tire forces assuming linear tire model
-        force_yf = CartesianDynamicBicycleModel.lat_force_front_tire(p.cf, vy, vx, thetadot, p.lf, delta)
-        force_yr = CartesianDynamicBicycleModel.lat_force_rear_tire(p.cr, vy, vx, thetadot, p.lr)
+        # lateral tire forces
+        vx_tire, direction = self.tire_speed(vx)
+        alpha_f, alpha_r = self.slip_angles(vy, vx_tire, direction, thetadot, delta, p)
+        fz_f, fz_r = self.axle_loads(p)
+        force_yf = self.tire_model.lat_force(alpha_f, p.cf, fz_f, p.mu)
+        force_yr = self.tire_model.lat_force(alpha_r, p.cr, fz_r, p.mu)
 
         vydot = (force_yr + force_yf*np.cos(delta)) / p.m - vx * thetadot
         thetadotdot = (p.lf * force_yf * np.cos(delta) - p.lr * force_yr) / p.Iz
@@ -81,14 +224,56 @@ class CartesianDynamicBicycleModel(MotionModel):
         xdot = vx * np.cos(theta) - vy * np.sin(theta)
         ydot = vy * np.cos(theta) + vx * np.sin(theta)
 
+        z_dot[..., state_idx.X] = xdot
+        z_dot[..., state_idx.Y] = ydot
+        z_dot[..., state_idx.VY] = vydot
+        z_dot[..., state_idx.THETA] = thetadot
+        z_dot[..., state_idx.THETADOT] = thetadotdot
+        z_dot[..., state_idx.DELTA] = delta_dot
+
+        return z_dot
 
+    def _jacobian(self, z: np.ndarray, u: np.ndarray, p: Vehicle.Params, jac: np.ndarray) -> np.ndarray:
+        state_idx = CartesianDynamicBicycleModel.StateIdx
+        ctrl_idx = CartesianDynamicBicycleModel.CtrlIdx
 
-        z_dot = [None] * len(state_idx)
-        z_dot[state_idx.X] = xdot
-        z_dot[state_idx.Y] = ydot
-        z_dot[state_idx.VY] = vydot
-        z_dot[state_idx.THETA] = thetadot
-        z_dot[state_idx.THETADOT] = thetadotdot
-        z_dot[state_idx.DELTA] = delta_dot
+        vy = z[..., state_idx.VY]
+        theta = z[..., state_idx.THETA]
+        thetadot = z[..., state_idx.THETADOT]
+        delta = z[..., state_idx.DELTA]
+        vx = u[..., ctrl_idx.VX]
 
-        return z_dot
+        vx_tire, direction = self.tire_speed(vx)
+        alpha_f, alpha_r = self.slip_angles(vy, vx_tire, direction, thetadot, delta, p)
+        fz_f, fz_r = self.axle_loads(p)
+        force_yf, slope_f = self.tire_model.lat_force_and_slope(alpha_f, p.cf, fz_f, p.mu)
+        _, slope_r = self.tire_model.lat_force_and_slope(alpha_r, p.cr, fz_r, p.mu)
+
+        # d/dv of arctan(v/vx) = vx / (vx^2 + v^2)
+        dslip_f = vx_tire / (vx_tire ** 2 + (vy + thetadot * p.lf) ** 2)
+        dslip_r = vx_tire / (vx_tire ** 2 + (vy - thetadot * p.lr) ** 2)
+        dfyf_dvy = slope_f * dslip_f
+        dfyf_dthetadot = slope_f * p.lf * dslip_f
+        dfyr_dvy = slope_r * dslip_r
+        dfyr_dthetadot = -slope_r * p.lr * dslip_r
+
+        cos_delta = np.cos(delta)
+        dfyf_cos_ddelta = -direction * slope_f * cos_delta - force_yf * np.sin(delta)
+        cos_theta = np.cos(theta)
+        sin_theta = np.sin(theta)
+
+        jac[...] = 0.0
+        jac[..., state_idx.X, state_idx.VY] = -sin_theta
+        jac[..., state_idx.X, state_idx.THETA] = -vx * sin_theta - vy * cos_theta
+        jac[..., state_idx.Y, state_idx.VY] = cos_theta
+        jac[..., state_idx.Y, state_idx.THETA] = vx * cos_theta - vy * sin_theta
+        jac[..., state_idx.VY, state_idx.VY] = (dfyr_dvy + dfyf_dvy * cos_delta) / p.m
+        jac[..., state_idx.VY, state_idx.THETADOT] = (dfyr_dthetadot + dfyf_dthetadot * cos_delta) / p.m - vx
+        jac[..., state_idx.VY, state_idx.DELTA] = dfyf_cos_ddelta / p.m
+        jac[..., state_idx.THETA, state_idx.THETADOT] = 1.0
+        jac[..., state_idx.THETADOT, state_idx.VY] = (p.lf * dfyf_dvy * cos_delta - p.lr * dfyr_dvy) / p.Iz
+        jac[..., state_idx.THETADOT, state_idx.THETADOT] = (p.lf * dfyf_dthetadot * cos_delta
+                                                           - p.lr * dfyr_dthetadot) / p.Iz
+        jac[..., state_idx.THETADOT, state_idx.DELTA] = p.lf * dfyf_cos_ddelta / p.Iz
+
+        return jac
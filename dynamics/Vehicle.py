@@ -1,20 +1,65 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+import enum
+from typing import List
 import numpy as np
 
 from utils import math
 
 
+def _state_field(idx: int, doc: str) -> property:
+    def getter(self):
+        return self.data[idx]
+
+    def setter(self, val):
+        self.data[idx] = val
+        self.version += 1
+
+    return property(getter, setter, doc=doc)
+
+
 class Vehicle:
-    @dataclass
     class State:
-        x: float = 0
-        y: float = 0
-        theta: float = 0
-        delta: float = 0
-        delta_rate: float = 0
-        vx: float = 0  # body frame
-        vy: float = 0  # body frame
-        thetadot: float = 0
+        """
+        Vehicle state at the CoG backed by one contiguous float array, so that motion models can update it in place.
+
+        Every write through a field bumps version, which Vehicle uses to invalidate its cached derived quantities.
+        Code that writes into data directly must call touch().
+        """
+        class Idx(enum.IntEnum):
+            X = 0
+            Y = 1
+            THETA = 2
+            DELTA = 3
+            DELTA_RATE = 4
+            VX = 5
+            VY = 6
+            THETADOT = 7
+
+        __slots__ = ("data", "version")
+
+        def __init__(self, x: float = 0, y: float = 0, theta: float = 0, delta: float = 0, delta_rate: float = 0,
+                     vx: float = 0, vy: float = 0, thetadot: float = 0):
+            self.data = np.array([x, y, theta, delta, delta_rate, vx, vy, thetadot], dtype=float)
+            self.version = 0
+
+        x = _state_field(Idx.X, "[m]")
+        y = _state_field(Idx.Y, "[m]")
+        theta = _state_field(Idx.THETA, "[rad]")
+        delta = _state_field(Idx.DELTA, "tire angle [rad]")
+        delta_rate = _state_field(Idx.DELTA_RATE, "[rad/s]")
+        vx = _state_field(Idx.VX, "body frame [m/s]")
+        vy = _state_field(Idx.VY, "body frame [m/s]")
+        thetadot = _state_field(Idx.THETADOT, "[rad/s]")
+
+        def touch(self):
+            self.version += 1
+
+        def copy(self) -> "Vehicle.State":
+            return Vehicle.State(*self.data)
+
+        def __repr__(self):
+            return "Vehicle.State({})".format(
+                ", ".join("{}={}".format(idx.name.lower(), self.data[idx]) for idx in self.Idx))
 
     @dataclass
     class Params:
@@ -24,6 +69,7 @@ class Vehicle:
         lr: float = 1.5  # Distance from CG to rear axle[m]
         cf: float = 1e5  # Front cornering stiffness[N / rad]
         cr: float = 1e5  # Rear cornering stiffness[N / rad]
+        mu: float = 1.0  # Tire-road friction coefficient, saturating tire models only [-]
         delta_max: float = np.deg2rad(60)  # +/- tire angle limit [rad]
         delta_rate_max: float = np.deg2rad(500)  # +/- tire angle rate limit [rad/s]
 
@@ -31,9 +77,48 @@ class Vehicle:
         def wheel_base(self):
             return self.lf + self.lr
 
+    @dataclass
+    class BatchParams:
+        """
+        Params of N vehicles stored as (N,) column arrays so that they broadcast against a batched (N, n_states)
+        state array in the equations of motion.
+        """
+        m: np.ndarray
+        Iz: np.ndarray
+        lf: np.ndarray
+        lr: np.ndarray
+        cf: np.ndarray
+        cr: np.ndarray
+        mu: np.ndarray
+        delta_max: np.ndarray
+        delta_rate_max: np.ndarray
+
+        @staticmethod
+        def from_params(params_list: List["Vehicle.Params"]) -> "Vehicle.BatchParams":
+            return Vehicle.BatchParams(
+                **{f.name: np.array([getattr(p, f.name) for p in params_list], dtype=float)
+                   for f in fields(Vehicle.BatchParams)})
+
+        def __len__(self):
+            return len(self.m)
+
+        def params(self, idx: int) -> "Vehicle.Params":
+            return Vehicle.Params(**{f.name: float(getattr(self, f.name)[idx]) for f in fields(self)})
+
+        @property
+        def wheel_base(self):
+            return self.lf + self.lr
+
+    __slots__ = ("state_cog", "params", "_cache_version", "_cos_theta", "_sin_theta", "_pose", "_pose_rear_axle",
+                 "_pose_front_axle", "_point", "_vel_cog", "_vel_cog_mag")
+
     def __init__(self, state_cog: State = None, params: Params = None):
         self.state_cog = state_cog if state_cog else self.State()
         self.params = params if params else self.Params()
+        self._cache_version = None
+
+    def copy(self) -> "Vehicle":
+        return Vehicle(state_cog=self.state_cog.copy(), params=self.params)
 
     def build_pose(self, pose: math.Pose):
         self.state_cog.x = pose.x
@@ -46,30 +131,76 @@ class Vehicle:
         self.state_cog.vy = vel * np.sin(beta)
         return self
 
+    def _update_cache(self):
+        """
+        Compute the derived quantities once per state update, they are reused until the state or the axle lengths
+        change again.
+        """
+        lf = self.params.lf
+        lr = self.params.lr
+        cache_version = (self.state_cog.version, lf, lr)
+        if self._cache_version == cache_version:
+            return
+        x, y, theta, _, _, vx, vy, _ = self.state_cog.data.tolist()
+        cos_theta = np.cos(theta)
+        sin_theta = np.sin(theta)
+
+        self._cos_theta = cos_theta
+        self._sin_theta = sin_theta
+        self._pose = math.Pose(x, y, theta)
+        self._pose_rear_axle = math.Pose(x - lr * cos_theta, y - lr * sin_theta, theta)
+        self._pose_front_axle = math.Pose(x + lf * cos_theta, y + lf * sin_theta, theta)
+        self._point = math.Point(x, y)
+        self._vel_cog = math.Point(vx * cos_theta - vy * sin_theta, vx * sin_theta + vy * cos_theta)
+        self._vel_cog_mag = np.sqrt(vx ** 2 + vy ** 2)
+        self._cache_version = cache_version
+
+    def invalidate_cache(self):
+        """
+        Force the derived quantities to be recomputed on next access. Changes to the state or to lf/lr are picked up
+        automatically, this is only needed after writing into state_cog.data directly without State.touch().
+        """
+        self._cache_version = None
+
+    @property
+    def cos_theta(self) -> float:
+        self._update_cache()
+        return self._cos_theta
+
+    @property
+    def sin_theta(self) -> float:
+        self._update_cache()
+        return self._sin_theta
+
     @property
     def pose(self) -> math.Pose:
-        return math.Pose(self.state_cog.x, self.state_cog.y, self.state_cog.theta)
+        self._update_cache()
+        return self._pose
 
     @property
     def pose_rear_axle(self) -> math.Pose:
-        return math.add_body_frame(self.pose, math.Pose(-self.params.lr, 0, 0))
+        self._update_cache()
+        return self._pose_rear_axle
 
     @property
     def pose_front_axle(self) -> math.Pose:
-        return math.add_body_frame(self.pose, math.Pose(self.params.lf, 0, 0))
+        self._update_cache()
+        return self._pose_front_axle
 
     @property
     def point(self) -> math.Point:
-        return math.Point(self.state_cog.x, self.state_cog.y)
+        self._update_cache()
+        return self._point
 
     @property
     def vel_cog(self):
-        return math.rot(math.Point(self.state_cog.vx, self.state_cog.vy), self.state_cog.theta)
+        self._update_cache()
+        return self._vel_cog
 
     @property
     def vel_cog_mag(self):
-        return np.sqrt(self.state_cog.vx ** 2 + self.state_cog.vy ** 2)
+        self._update_cache()
+        return self._vel_cog_mag
 
     def vel_at_pnt(self, pt_rel_cog: math.Point):
         return self.vel_cog + math.cross3(self.state_cog.thetadot, math.rot(pt_rel_cog, self.state_cog.theta))
-
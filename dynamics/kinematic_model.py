@@ -1,6 +1,5 @@
 import numpy as np
 import enum
-from typing import List
 
 from dynamics.motion_model_base import MotionModel
 from dynamics.Vehicle import Vehicle
@@ -17,24 +16,32 @@ class CartesianKinematicBicycleModel(MotionModel):
         V = 0
         DELTA_RATE = 1
 
+    _RATE_STATES = (StateIdx.DELTA,)
+
     @staticmethod
     def beta(lr, delta, wheel_base):
         return np.arctan(lr * np.tan(delta) / wheel_base)
 
     @staticmethod
-    def _state_to_vehicle(z, u, p: Vehicle.Params) -> Vehicle.State:
+    def _state_to_vehicle(z, u, p: Vehicle.Params, state: Vehicle.State) -> Vehicle.State:
         state_idx = CartesianKinematicBicycleModel.StateIdx
         ctrl_idx = CartesianKinematicBicycleModel.CtrlIdx
         beta = CartesianKinematicBicycleModel.beta(p.lr, z[state_idx.DELTA], p.wheel_base)
-        return Vehicle.State(x=z[state_idx.X], y=z[state_idx.Y], theta=z[state_idx.THETA],
-                                                     vx=u[ctrl_idx.V] * np.cos(beta),
-                                                     vy=u[ctrl_idx.V] * np.sin(beta), delta=z[state_idx.DELTA],
-                                                     thetadot=0.0, delta_rate=u[ctrl_idx.DELTA_RATE])
+        data = state.data
+        data[Vehicle.State.Idx.X] = z[state_idx.X]
+        data[Vehicle.State.Idx.Y] = z[state_idx.Y]
+        data[Vehicle.State.Idx.THETA] = z[state_idx.THETA]
+        data[Vehicle.State.Idx.VX] = u[ctrl_idx.V] * np.cos(beta)
+        data[Vehicle.State.Idx.VY] = u[ctrl_idx.V] * np.sin(beta)
+        data[Vehicle.State.Idx.DELTA] = z[state_idx.DELTA]
+        data[Vehicle.State.Idx.THETADOT] = 0.0
+        data[Vehicle.State.Idx.DELTA_RATE] = u[ctrl_idx.DELTA_RATE]
+        state.touch()
+        return state
 
     @staticmethod
-    def _vehicle_to_state(vehicle_state_cog: Vehicle.State) -> List:
+    def _vehicle_to_state(vehicle_state_cog: Vehicle.State, z: np.ndarray) -> np.ndarray:
         state_idx = CartesianKinematicBicycleModel.StateIdx
-        z = [0.0] * len(state_idx)
         z[state_idx.X] = vehicle_state_cog.x
         z[state_idx.Y] = vehicle_state_cog.y
         z[state_idx.THETA] = vehicle_state_cog.theta
@@ -42,29 +49,51 @@ class CartesianKinematicBicycleModel(MotionModel):
         return z
 
     @staticmethod
-    def _to_ctrl(steer_rate, vel) -> List:
+    def _to_ctrl(steer_rate, vel, u: np.ndarray) -> np.ndarray:
         ctrl_idx = CartesianKinematicBicycleModel.CtrlIdx
-        u = [0.0] * len(ctrl_idx)
-        u[ctrl_idx.DELTA_RATE] = steer_rate
-        u[ctrl_idx.V] = vel
+        u[..., ctrl_idx.DELTA_RATE] = steer_rate
+        u[..., ctrl_idx.V] = vel
         return u
 
     @staticmethod
-    def _eqn_of_motn(z: List, u: List, p: Vehicle.Params):
+    def _eqn_of_motn(z: np.ndarray, u: np.ndarray, p: Vehicle.Params, z_dot: np.ndarray) -> np.ndarray:
         state_idx = CartesianKinematicBicycleModel.StateIdx
         ctrl_idx = CartesianKinematicBicycleModel.CtrlIdx
-        theta = z[state_idx.THETA]
-        delta = z[state_idx.DELTA]
-        vel = u[ctrl_idx.V]
+        theta = z[..., state_idx.THETA]
+        delta = z[..., state_idx.DELTA]
+        vel = u[..., ctrl_idx.V]
 
         beta = CartesianKinematicBicycleModel.beta(p.lr, delta, p.wheel_base)
         x_dot = vel * np.cos(beta + theta)
         y_dot = vel * np.sin(beta + theta)
         thetadot = vel * np.tan(delta) * np.cos(beta) / p.wheel_base
-        z_dot = [None] * len(state_idx)
-        z_dot[state_idx.X] = x_dot
-        z_dot[state_idx.Y] = y_dot
-        z_dot[state_idx.THETA] = thetadot
-        z_dot[state_idx.DELTA] = u[ctrl_idx.DELTA_RATE]
+        z_dot[..., state_idx.X] = x_dot
+        z_dot[..., state_idx.Y] = y_dot
+        z_dot[..., state_idx.THETA] = thetadot
+        z_dot[..., state_idx.DELTA] = u[..., ctrl_idx.DELTA_RATE]
 
         return z_dot
+
+    @staticmethod
+    def _jacobian(z: np.ndarray, u: np.ndarray, p: Vehicle.Params, jac: np.ndarray) -> np.ndarray:
+        state_idx = CartesianKinematicBicycleModel.StateIdx
+        ctrl_idx = CartesianKinematicBicycleModel.CtrlIdx
+        theta = z[..., state_idx.THETA]
+        delta = z[..., state_idx.DELTA]
+        vel = u[..., ctrl_idx.V]
+
+        beta = CartesianKinematicBicycleModel.beta(p.lr, delta, p.wheel_base)
+        tan_delta = np.tan(delta)
+        sec2_delta = 1.0 + tan_delta ** 2
+        lr_ratio = p.lr / p.wheel_base
+        dbeta_ddelta = lr_ratio * sec2_delta / (1.0 + (lr_ratio * tan_delta) ** 2)
+
+        jac[...] = 0.0
+        jac[..., state_idx.X, state_idx.THETA] = -vel * np.sin(beta + theta)
+        jac[..., state_idx.X, state_idx.DELTA] = -vel * np.sin(beta + theta) * dbeta_ddelta
+        jac[..., state_idx.Y, state_idx.THETA] = vel * np.cos(beta + theta)
+        jac[..., state_idx.Y, state_idx.DELTA] = vel * np.cos(beta + theta) * dbeta_ddelta
+        jac[..., state_idx.THETA, state_idx.DELTA] = vel / p.wheel_base * (
+                sec2_delta * np.cos(beta) - tan_delta * np.sin(beta) * dbeta_ddelta)
+
+        return jac
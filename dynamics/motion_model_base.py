@@ -2,56 +2,320 @@ import numpy as np
 from scipy import integrate
 import enum
 from abc import ABC, abstractmethod
-from typing import List, Callable
+from typing import Dict, List, Tuple, Union
 
 from dynamics.Vehicle import Vehicle
 
 
+class _IntegratorWorkspace:
+    """
+    Preallocated stage buffers for the fixed-step integrators so that a step does not allocate new state arrays.
+    """
+    __slots__ = ("k1", "k2", "k3", "k4", "z_stage", "z_new", "jac", "w")
+
+    def __init__(self, shape: Tuple[int, ...]):
+        jac_shape = shape + shape[-1:]
+        self.jac = np.zeros(jac_shape)
+        self.w = np.zeros(jac_shape)
+        self.k1 = np.zeros(shape)
+        self.k2 = np.zeros(shape)
+        self.k3 = np.zeros(shape)
+        self.k4 = np.zeros(shape)
+        self.z_stage = np.zeros(shape)
+        self.z_new = np.zeros(shape)
+
+
 class MotionModel(ABC):
     class IntScheme(enum.Enum):
         EULER = 0
-        RK4 = 1
+        SEMI_IMPLICIT_EULER = 1
+        RK2 = 2
+        RK4 = 3
+        RK45 = 4  # adaptive scipy solve_ivp, kept as a reference solution
+        ROSENBROCK = 5  # linearly implicit ROS2, L-stable for the stiff low speed lateral dynamics
+        LINEARIZED = 6  # precomputed discrete lateral dynamics over a speed grid, dynamic model only
+
+    # states integrated first by the semi-implicit euler scheme (velocity-like states), all others are position-like
+    _RATE_STATES: Tuple[int, ...] = ()
 
     def __init__(self, int_scheme=IntScheme.RK4):
         self._int_scheme = int_scheme
-        self._int_scheme_map = {self.IntScheme.EULER: self._integrate_euler, self.IntScheme.RK4: self._integrate_rk4}
+        self._int_scheme_map = {self.IntScheme.EULER: self._integrate_euler,
+                                self.IntScheme.SEMI_IMPLICIT_EULER: self._integrate_semi_implicit_euler,
+                                self.IntScheme.RK2: self._integrate_rk2,
+                                self.IntScheme.RK4: self._integrate_rk4,
+                                self.IntScheme.RK45: self._integrate_rk45,
+                                self.IntScheme.ROSENBROCK: self._integrate_rosenbrock,
+                                # models without a tabulated linearization fall back to RK4
+                                self.IntScheme.LINEARIZED: self._integrate_rk4}
+
+        n_states = len(self.StateIdx)
+        self._z = np.zeros(n_states)
+        self._u = np.zeros(len(self.CtrlIdx))
+        self._rate_mask = np.zeros(n_states)
+        self._rate_mask[list(self._RATE_STATES)] = 1.0
+        self._pos_mask = 1.0 - self._rate_mask
+        self._eye = np.eye(n_states)
+        self._workspaces: Dict[Tuple[int, ...], _IntegratorWorkspace] = {}
 
     def update(self, vehicle_state: Vehicle, steer_rate, steer_desired, vel, dt) -> Vehicle:
-        u = self._to_ctrl(steer_rate, vel)
-        z = self._vehicle_to_state(vehicle_state.state_cog)
-        z_new = self._int_scheme_map[self._int_scheme](self._eqn_of_motn, z, u, vehicle_state.params, dt)
+        """
+        Propagate the vehicle by dt. The vehicle state is updated in place and the same vehicle is returned.
+        """
+        u = self._to_ctrl(steer_rate, vel, self._u)
+        z = self._vehicle_to_state(vehicle_state.state_cog, self._z)
+        z_new = self.step(z, u, vehicle_state.params, dt)
 
-        vehicle_state_new = Vehicle(state_cog=self._state_to_vehicle(z_new, u, vehicle_state.params),
-                                    params=vehicle_state.params)
-        delta = vehicle_state_new.state_cog.delta
-        vehicle_state_new.state_cog.delta = np.clip(delta, -vehicle_state.params.delta_max, vehicle_state.params.delta_max)
-        return vehicle_state_new
+        delta_max = vehicle_state.params.delta_max
+        z_new[self.StateIdx.DELTA] = min(delta_max, max(-delta_max, z_new[self.StateIdx.DELTA]))
+        self._state_to_vehicle(z_new, u, vehicle_state.params, vehicle_state.state_cog)
+        return vehicle_state
 
-    @staticmethod
-    def _integrate_euler(eqn_of_mtn: Callable, z: List, u: List, p: Vehicle.Params, dt: float):
-        return [z[idx] + dt * elem for idx, elem in enumerate(eqn_of_mtn(z, u, p))]
+    def update_batch(self, z: np.ndarray, u: np.ndarray, p: Union[Vehicle.Params, Vehicle.BatchParams],
+                     dt: float) -> np.ndarray:
+        """
+        Propagate N vehicles at once.
+
+        Args:
+            z (np.ndarray): [N, n_states] state of every vehicle, updated in place.
+            u (np.ndarray): [N, n_ctrl] controls of every vehicle, see to_ctrl_batch.
+            p (Vehicle.BatchParams): per-vehicle params as (N,) columns, or one Vehicle.Params shared by all vehicles.
+            dt (float): time step [s].
+
+        Returns:
+            np.ndarray: [N, n_states] z, after the update.
+        """
+        z[:] = self.step(z, u, p, dt)
+        delta = z[:, self.StateIdx.DELTA]
+        np.clip(delta, -np.asarray(p.delta_max), p.delta_max, out=delta)
+        return z
+
+    def rollout(self, initial_state: Union[Vehicle, np.ndarray], controls: np.ndarray, dt: float,
+                p: Vehicle.Params = None, out: np.ndarray = None) -> np.ndarray:
+        """
+        Simulate K steps from one initial state on plain state arrays, without going through a Vehicle each step.
+
+        Args:
+            initial_state (Union[Vehicle, np.ndarray]): vehicle, or [n_states] state array, to start from. Not modified.
+            controls (np.ndarray): [K, n_ctrl] control of every step, see to_ctrl_batch.
+            dt (float): time step [s].
+            p (Vehicle.Params): vehicle params, defaults to the params of initial_state if it is a Vehicle, required for
+                a state array.
+            out (np.ndarray): optional preallocated [K + 1, n_states] trajectory to write into.
+
+        Returns:
+            np.ndarray: [K + 1, n_states] trajectory, row 0 is the initial state.
+        """
+        if isinstance(initial_state, Vehicle):
+            p = initial_state.params if p is None else p
+            initial_state = self._vehicle_to_state(initial_state.state_cog, np.zeros(len(self.StateIdx)))
+        elif p is None:
+            raise ValueError("p is required for an array initial_state")
+        if out is None:
+            out = np.empty((len(controls) + 1, len(self.StateIdx)))
+        out[0] = initial_state
+        return self._rollout(out, controls, p, dt)
+
+    def rollout_batch(self, initial_states: np.ndarray, controls: np.ndarray, dt: float,
+                      p: Union[Vehicle.Params, Vehicle.BatchParams], out: np.ndarray = None) -> np.ndarray:
+        """
+        Simulate K steps for N rollouts at once, e.g. many initial states under one control sequence or one initial
+        state under many candidate control sequences.
+
+        Args:
+            initial_states (np.ndarray): [N, n_states] initial states, or one [n_states] state shared by all rollouts.
+            controls (np.ndarray): [N, K, n_ctrl] control sequences, or one [K, n_ctrl] sequence shared by all rollouts.
+            dt (float): time step [s].
+            p (Vehicle.BatchParams): per-rollout params as (N,) columns, or one Vehicle.Params shared by all rollouts.
+            out (np.ndarray): optional preallocated [N, K + 1, n_states] trajectories to write into.
+
+        Returns:
+            np.ndarray: [N, K + 1, n_states] trajectories, [:, 0] are the initial states.
+        """
+        initial_states = np.asarray(initial_states, dtype=float)
+        controls = np.asarray(controls, dtype=float)
+        n_rollouts = max(initial_states.shape[0] if initial_states.ndim == 2 else 1,
+                         controls.shape[0] if controls.ndim == 3 else 1)
+        n_steps = controls.shape[-2]
+        controls = np.broadcast_to(controls, (n_rollouts, n_steps, controls.shape[-1]))
+        if out is None:
+            out = np.empty((n_rollouts, n_steps + 1, len(self.StateIdx)))
+        out[:, 0] = initial_states
+        return self._rollout(out, controls, p, dt)
+
+    def _rollout(self, traj: np.ndarray, controls: np.ndarray, p, dt: float) -> np.ndarray:
+        # traj [..., K + 1, n_states] holding the initial state in [..., 0, :], controls [..., K, n_ctrl]
+        delta_max = np.asarray(p.delta_max)
+        for k in range(controls.shape[-2]):
+            z_new = self.step(traj[..., k, :], controls[..., k, :], p, dt)
+            delta = z_new[..., self.StateIdx.DELTA]
+            np.clip(delta, -delta_max, delta_max, out=delta)
+            traj[..., k + 1, :] = z_new
+        return traj
+
+    def to_ctrl_batch(self, steer_rate: Union[float, np.ndarray], vel: Union[float, np.ndarray],
+                      n_vehicles: int) -> np.ndarray:
+        """
+        Build the [N, n_ctrl] control array from scalar or (N,) steer rates and speeds.
+        """
+        return self._to_ctrl(steer_rate, vel, np.zeros((n_vehicles, len(self.CtrlIdx))))
+
+    def stack_vehicles(self, vehicles: List[Vehicle]) -> Tuple[np.ndarray, Vehicle.BatchParams]:
+        """
+        Gather the states and params of several vehicles into the batched [N, n_states] layout used by update_batch.
+        """
+        z = np.zeros((len(vehicles), len(self.StateIdx)))
+        for idx, vehicle in enumerate(vehicles):
+            self._vehicle_to_state(vehicle.state_cog, z[idx])
+        return z, Vehicle.BatchParams.from_params([vehicle.params for vehicle in vehicles])
+
+    def vehicle_from_batch(self, z: np.ndarray, u: np.ndarray, p: Vehicle.BatchParams, idx: int) -> Vehicle:
+        """
+        Build a Vehicle for one row of a batched state, e.g. for drawing it.
+        """
+        params = p.params(idx)
+        return Vehicle(state_cog=self._state_to_vehicle(z[idx], u[idx], params, Vehicle.State()), params=params)
+
+    def step(self, z: np.ndarray, u: np.ndarray, p: Vehicle.Params, dt: float) -> np.ndarray:
+        """
+        Advance the state array z by dt with the selected integration scheme.
+
+        The returned array is a workspace buffer owned by the model and is overwritten by the next step of the same
+        shape, copy it if it needs to outlive the next call.
+        """
+        return self._int_scheme_map[self._int_scheme](z, u, p, dt, self._workspace(z.shape))
+
+    def _workspace(self, shape: Tuple[int, ...]) -> _IntegratorWorkspace:
+        workspace = self._workspaces.get(shape)
+        if workspace is None:
+            workspace = self._workspaces[shape] = _IntegratorWorkspace(shape)
+        return workspace
+
+    def _integrate_euler(self, z: np.ndarray, u: np.ndarray, p: Vehicle.Params, dt: float, ws: _IntegratorWorkspace):
+        self._eqn_of_motn(z, u, p, ws.k1)
+        np.multiply(ws.k1, dt, out=ws.z_new)
+        ws.z_new += z
+        return ws.z_new
+
+    def _integrate_semi_implicit_euler(self, z: np.ndarray, u: np.ndarray, p: Vehicle.Params, dt: float,
+                                       ws: _IntegratorWorkspace):
+        # advance the velocity-like states first...
+        self._eqn_of_motn(z, u, p, ws.k1)
+        np.multiply(ws.k1, self._rate_mask, out=ws.z_stage)
+        ws.z_stage *= dt
+        ws.z_stage += z
+
+        # ...then the position-like states with the updated velocities
+        self._eqn_of_motn(ws.z_stage, u, p, ws.k2)
+        np.multiply(ws.k2, self._pos_mask, out=ws.z_new)
+        ws.z_new *= dt
+        ws.z_new += ws.z_stage
+        return ws.z_new
+
+    def _integrate_rk2(self, z: np.ndarray, u: np.ndarray, p: Vehicle.Params, dt: float, ws: _IntegratorWorkspace):
+        # explicit midpoint
+        self._eqn_of_motn(z, u, p, ws.k1)
+        np.multiply(ws.k1, dt / 2, out=ws.z_stage)
+        ws.z_stage += z
+
+        self._eqn_of_motn(ws.z_stage, u, p, ws.k2)
+        np.multiply(ws.k2, dt, out=ws.z_new)
+        ws.z_new += z
+        return ws.z_new
+
+    def _integrate_rk4(self, z: np.ndarray, u: np.ndarray, p: Vehicle.Params, dt: float, ws: _IntegratorWorkspace):
+        self._eqn_of_motn(z, u, p, ws.k1)
+
+        np.multiply(ws.k1, dt / 2, out=ws.z_stage)
+        ws.z_stage += z
+        self._eqn_of_motn(ws.z_stage, u, p, ws.k2)
+
+        np.multiply(ws.k2, dt / 2, out=ws.z_stage)
+        ws.z_stage += z
+        self._eqn_of_motn(ws.z_stage, u, p, ws.k3)
+
+        np.multiply(ws.k3, dt, out=ws.z_stage)
+        ws.z_stage += z
+        self._eqn_of_motn(ws.z_stage, u, p, ws.k4)
+
+        # z_new = z + dt/6 * (k1 + 2*k2 + 2*k3 + k4)
+        ws.k2 += ws.k3
+        ws.k2 *= 2.0
+        ws.k2 += ws.k1
+        ws.k2 += ws.k4
+        np.multiply(ws.k2, dt / 6, out=ws.z_new)
+        ws.z_new += z
+        return ws.z_new
+
+    def _integrate_rk45(self, z: np.ndarray, u: np.ndarray, p: Vehicle.Params, dt: float, ws: _IntegratorWorkspace):
+        # solve_ivp works on flat state vectors, so batched states are raveled and reshaped around each evaluation
+        def fun(_, _z):
+            _z = _z.reshape(z.shape)
+            return self._eqn_of_motn(_z, u, p, np.empty_like(_z)).ravel()
+
+        soln = integrate.solve_ivp(fun, [0, dt], z.ravel(), method='RK45')
+        ws.z_new[:] = soln.y[:, -1].reshape(z.shape)
+        return ws.z_new
+
+    # ROS2 of Verwer et al. (1999), gamma = 1 + 1/sqrt(2) makes it L-stable
+    _ROS2_GAMMA = 1.0 + 1.0 / np.sqrt(2.0)
+
+    def _integrate_rosenbrock(self, z: np.ndarray, u: np.ndarray, p: Vehicle.Params, dt: float,
+                              ws: _IntegratorWorkspace):
+        """
+        (I - gamma*dt*J) k1 = f(z)
+        (I - gamma*dt*J) k2 = f(z + dt*k1) - 2*k1
+        z_new = z + dt*(3/2*k1 + 1/2*k2)
+        """
+        self._jacobian(z, u, p, ws.jac)
+        np.multiply(ws.jac, -self._ROS2_GAMMA * dt, out=ws.w)
+        ws.w += self._eye
+
+        self._eqn_of_motn(z, u, p, ws.k1)
+        ws.k1[:] = np.linalg.solve(ws.w, ws.k1[..., None])[..., 0]
+
+        np.multiply(ws.k1, dt, out=ws.z_stage)
+        ws.z_stage += z
+        self._eqn_of_motn(ws.z_stage, u, p, ws.k2)
+        ws.k2 -= 2.0 * ws.k1
+        ws.k2[:] = np.linalg.solve(ws.w, ws.k2[..., None])[..., 0]
+
+        ws.k1 *= 3.0
+        ws.k1 += ws.k2
+        np.multiply(ws.k1, dt / 2, out=ws.z_new)
+        ws.z_new += z
+        return ws.z_new
 
     @staticmethod
-    def _integrate_rk4(eqn_of_mtn: Callable, z: List, u, p: Vehicle.Params, dt: float):
-        soln = integrate.solve_ivp(lambda _, _z: eqn_of_mtn(_z, u, p), [0, dt], z, method='RK45')
-        return soln.y[:, -1]
+    @abstractmethod
+    def _eqn_of_motn(z: np.ndarray, u: np.ndarray, p, z_dot: np.ndarray) -> np.ndarray:
+        """
+        Evaluate the state derivative of z under control u, writing it into z_dot and returning it.
+        """
+        pass
 
     @staticmethod
     @abstractmethod
-    def _eqn_of_motn(z, u, p):
+    def _jacobian(z: np.ndarray, u: np.ndarray, p, jac: np.ndarray) -> np.ndarray:
+        """
+        Evaluate the analytic state Jacobian d(z_dot)/dz, writing it into jac ([..., n_states, n_states]).
+        """
         pass
 
     @staticmethod
     @abstractmethod
-    def _vehicle_to_state(vehicle_state: Vehicle.State) -> List:
+    def _vehicle_to_state(vehicle_state: Vehicle.State, z: np.ndarray) -> np.ndarray:
         pass
 
     @staticmethod
     @abstractmethod
-    def _state_to_vehicle(z, u, p) -> Vehicle.State:
+    def _state_to_vehicle(z, u, p, state: Vehicle.State) -> Vehicle.State:
+        """
+        Write the model state z and control u into the vehicle state, in place.
+        """
         pass
 
     @staticmethod
     @abstractmethod
-    def _to_ctrl(steer, vel) -> List:
+    def _to_ctrl(steer_rate, vel, u: np.ndarray) -> np.ndarray:
         pass
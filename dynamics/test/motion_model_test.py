@@ -0,0 +1,294 @@
+from dynamics.CartesianDynamicBicycleModel import CartesianDynamicBicycleModel
+from dynamics.kinematic_model import CartesianKinematicBicycleModel
+from dynamics.motion_model_base import MotionModel
+from dynamics.tire_model import FialaTire, LinearTire, PacejkaTire, TableTire
+from dynamics.Vehicle import Vehicle
+from utils import math
+import pytest
+import numpy as np
+
+
+@pytest.fixture
+def vehicle():
+    return Vehicle(params=Vehicle.Params()).build_pose(math.Pose(1, 2, 0.3)).build_vel(10, 0)
+
+
+def propagate(model: MotionModel, vehicle: Vehicle, n_steps: int, dt: float, steer_rate: float = 0.5) -> Vehicle:
+    vehicle = vehicle.copy()
+    for _ in range(n_steps):
+        vehicle = model.update(vehicle, steer_rate, 0, 10, dt)
+    return vehicle
+
+
+@pytest.mark.parametrize("model_cls", [CartesianDynamicBicycleModel, CartesianKinematicBicycleModel])
+@pytest.mark.parametrize(
+    "int_scheme, tol",
+    [
+        (MotionModel.IntScheme.EULER, 0.5),
+        (MotionModel.IntScheme.SEMI_IMPLICIT_EULER, 0.5),
+        (MotionModel.IntScheme.RK2, 0.05),
+        (MotionModel.IntScheme.RK4, 0.01),
+    ],
+)
+def test_fixed_step_schemes_match_adaptive_reference(vehicle, model_cls, int_scheme, tol):
+    dt = 1 / 60
+    reference = propagate(model_cls(MotionModel.IntScheme.RK45), vehicle, 60, dt)
+    result = propagate(model_cls(int_scheme), vehicle, 60, dt)
+    assert math.distance(result.pose, reference.pose) < tol
+    assert abs(result.state_cog.theta - reference.state_cog.theta) < tol
+
+
+def test_rk4_is_fourth_order(vehicle):
+    model = CartesianDynamicBicycleModel(MotionModel.IntScheme.RK4)
+    reference = propagate(model, vehicle, 640, 1 / 640)
+    err_coarse = math.distance(propagate(model, vehicle, 40, 1 / 40).pose, reference.pose)
+    err_fine = math.distance(propagate(model, vehicle, 80, 1 / 80).pose, reference.pose)
+    assert err_coarse / err_fine > 10
+
+
+def test_step_reuses_workspace_buffers():
+    model = CartesianDynamicBicycleModel(MotionModel.IntScheme.RK4)
+    z = np.array([0.0, 0.0, 0.1, 0.0, 0.2, 0.05])
+    u = np.array([10.0, 0.1])
+    z_new = model.step(z, u, Vehicle.Params(), 1 / 60)
+    assert model.step(z, u, Vehicle.Params(), 1 / 60) is z_new
+
+
+@pytest.mark.parametrize("model_cls", [CartesianDynamicBicycleModel, CartesianKinematicBicycleModel])
+@pytest.mark.parametrize("int_scheme", list(MotionModel.IntScheme))
+def test_batch_update_matches_single_vehicle_updates(model_cls, int_scheme):
+    rng = np.random.default_rng(0)
+    vehicles = [
+        Vehicle(params=Vehicle.Params(m=rng.uniform(300, 2000), lf=rng.uniform(1, 2), cf=rng.uniform(5e4, 2e5)))
+        .build_pose(math.Pose(*rng.uniform(-10, 10, 3)))
+        .build_vel(10, 0)
+        for _ in range(5)
+    ]
+    steer_rate = rng.uniform(-1, 1, len(vehicles))
+    vel = rng.uniform(5, 20, len(vehicles))
+    dt = 1 / 60
+
+    model = model_cls(int_scheme)
+    z, p = model.stack_vehicles(vehicles)
+    u = model.to_ctrl_batch(steer_rate, vel, len(vehicles))
+    for _ in range(20):
+        model.update_batch(z, u, p, dt)
+
+    for idx, vehicle in enumerate(vehicles):
+        for _ in range(20):
+            vehicle = model.update(vehicle, steer_rate[idx], 0, vel[idx], dt)
+        batch_vehicle = model.vehicle_from_batch(z, u, p, idx)
+        batch_state, state = batch_vehicle.state_cog, vehicle.state_cog
+        assert np.allclose(
+            [batch_state.x, batch_state.y, batch_state.theta, batch_state.delta],
+            [state.x, state.y, state.theta, state.delta],
+            atol=1e-6 if int_scheme is not MotionModel.IntScheme.RK45 else 1e-2,
+        )
+
+
+@pytest.mark.parametrize(
+    "model_cls, vel",
+    [
+        (CartesianDynamicBicycleModel, 3.0),
+        (CartesianDynamicBicycleModel, -3.0),
+        (CartesianDynamicBicycleModel, 0.5 * CartesianDynamicBicycleModel.VX_MIN),
+        (CartesianDynamicBicycleModel, -0.5 * CartesianDynamicBicycleModel.VX_MIN),
+        (CartesianKinematicBicycleModel, 3.0),
+    ],
+)
+def test_jacobian_matches_finite_difference(model_cls, vel):
+    rng = np.random.default_rng(1)
+    n_states = len(model_cls.StateIdx)
+    z = rng.uniform(-0.5, 0.5, n_states)
+    u = np.array([0.0, 0.0])
+    u[model_cls.CtrlIdx.DELTA_RATE] = 0.3
+    u[1 - model_cls.CtrlIdx.DELTA_RATE] = vel
+    p = Vehicle.Params()
+    model = model_cls()
+
+    jac = model._jacobian(z, u, p, np.zeros((n_states, n_states)))
+
+    eps = 1e-6
+    jac_fd = np.zeros((n_states, n_states))
+    for idx in range(n_states):
+        dz = np.zeros(n_states)
+        dz[idx] = eps
+        z_dot_plus = model._eqn_of_motn(z + dz, u, p, np.zeros(n_states))
+        z_dot_minus = model._eqn_of_motn(z - dz, u, p, np.zeros(n_states))
+        jac_fd[:, idx] = (z_dot_plus - z_dot_minus) / (2 * eps)
+
+    assert np.allclose(jac, jac_fd, rtol=1e-5, atol=1e-3)
+
+
+def test_rosenbrock_is_stable_at_low_speed():
+    dt = 1 / 30
+    vehicle = Vehicle(params=Vehicle.Params()).build_vel(0.3, 0)
+    vehicle.state_cog.delta = 0.3
+
+    def propagate_slow(model, vehicle, n_steps, dt):
+        vehicle = vehicle.copy()
+        for _ in range(n_steps):
+            vehicle = model.update(vehicle, 0, 0, 0.3, dt)
+        return vehicle
+
+    reference = propagate_slow(CartesianDynamicBicycleModel(MotionModel.IntScheme.RK45), vehicle, 30, dt)
+    result = propagate_slow(CartesianDynamicBicycleModel(MotionModel.IntScheme.ROSENBROCK), vehicle, 30, dt)
+    explicit = propagate_slow(CartesianDynamicBicycleModel(MotionModel.IntScheme.RK4), vehicle, 30, dt)
+
+    # the explicit scheme is well outside its stability region at this step size
+    assert abs(explicit.state_cog.thetadot - reference.state_cog.thetadot) > 1
+    assert abs(result.state_cog.thetadot - reference.state_cog.thetadot) < 1e-2
+    assert abs(result.state_cog.vy - reference.state_cog.vy) < 1e-2
+    assert math.distance(result.pose, reference.pose) < 1e-2
+
+
+def test_update_is_in_place_and_refreshes_cached_poses(vehicle):
+    model = CartesianDynamicBicycleModel()
+    pose = vehicle.pose
+    assert vehicle.pose is pose
+    assert model.update(vehicle, 0.5, 0, 10, 1 / 60) is vehicle
+
+    assert vehicle.pose is not pose
+    assert vehicle.pose.x == vehicle.state_cog.x
+    rear_axle = math.add_body_frame(vehicle.pose, math.Pose(-vehicle.params.lr, 0, 0))
+    assert np.allclose(vehicle.pose_rear_axle.to_vect3(), rear_axle.to_vect3())
+    vel_cog = math.rot(math.Point(vehicle.state_cog.vx, vehicle.state_cog.vy), vehicle.state_cog.theta)
+    assert np.allclose([vehicle.vel_cog.x, vehicle.vel_cog.y], [vel_cog.x, vel_cog.y])
+
+
+def test_cached_axle_poses_follow_param_changes(vehicle):
+    rear_axle_x = vehicle.pose_rear_axle.x
+    vehicle.params.lr += 1.0
+    assert np.isclose(vehicle.pose_rear_axle.x, rear_axle_x - np.cos(vehicle.state_cog.theta))
+
+
+def test_lateral_slip_is_damped_in_both_directions():
+    model_cls = CartesianDynamicBicycleModel
+    model = model_cls()
+    z = np.zeros(len(model_cls.StateIdx))
+    z[model_cls.StateIdx.VY] = 0.2
+    u = np.zeros(len(model_cls.CtrlIdx))
+    p = Vehicle.Params()
+
+    u[model_cls.CtrlIdx.VX] = 0.1
+    z_dot_fwd = model._eqn_of_motn(z, u, p, np.zeros_like(z)).copy()
+    u[model_cls.CtrlIdx.VX] = -0.1
+    z_dot_rev = model._eqn_of_motn(z, u, p, np.zeros_like(z))
+
+    # the lateral slip damps vy in both directions of travel
+    assert z_dot_fwd[model_cls.StateIdx.VY] < 0
+    assert z_dot_rev[model_cls.StateIdx.VY] < 0
+    assert np.isclose(z_dot_rev[model_cls.StateIdx.VY], z_dot_fwd[model_cls.StateIdx.VY])
+
+    # steering turns the car the other way in reverse
+    z[model_cls.StateIdx.VY] = 0.0
+    z[model_cls.StateIdx.DELTA] = 0.1
+    u[model_cls.CtrlIdx.VX] = 5.0
+    z_dot_fwd = model._eqn_of_motn(z, u, p, np.zeros_like(z)).copy()
+    u[model_cls.CtrlIdx.VX] = -5.0
+    z_dot_rev = model._eqn_of_motn(z, u, p, np.zeros_like(z))
+    assert z_dot_fwd[model_cls.StateIdx.THETADOT] > 0 > z_dot_rev[model_cls.StateIdx.THETADOT]
+
+
+def test_linearized_scheme_matches_rk4_for_small_steering(vehicle):
+    reference = propagate(CartesianDynamicBicycleModel(MotionModel.IntScheme.RK4), vehicle, 60, 1 / 60, 0.05)
+    result = propagate(CartesianDynamicBicycleModel(MotionModel.IntScheme.LINEARIZED), vehicle, 60, 1 / 60, 0.05)
+    assert math.distance(result.pose, reference.pose) < 0.01
+    assert abs(result.state_cog.thetadot - reference.state_cog.thetadot) < 0.01
+
+
+def test_linearization_is_rebuilt_on_param_change(vehicle):
+    model = CartesianDynamicBicycleModel(MotionModel.IntScheme.LINEARIZED)
+    vehicle = model.update(vehicle.copy(), 0.5, 0, 10, 1 / 60)
+    table = model._linearization
+    model.update(vehicle, 0.5, 0, 10, 1 / 60)
+    assert model._linearization is table
+
+    vehicle.params = Vehicle.Params(cf=2e5)
+    model.update(vehicle, 0.5, 0, 10, 1 / 60)
+    assert model._linearization is not table
+
+    model.invalidate_linearization()
+    assert model._linearization is None
+
+
+@pytest.mark.parametrize("model_cls", [CartesianDynamicBicycleModel, CartesianKinematicBicycleModel])
+def test_rollout_matches_repeated_updates(vehicle, model_cls):
+    model = model_cls(MotionModel.IntScheme.RK4)
+    n_steps = 30
+    steer_rate = np.linspace(-1, 2, n_steps)
+    controls = model.to_ctrl_batch(steer_rate, 10, n_steps)
+    traj = model.rollout(vehicle, controls, 1 / 60)
+    assert traj.shape == (n_steps + 1, len(model.StateIdx))
+
+    vehicle = vehicle.copy()
+    for k in range(n_steps):
+        vehicle = model.update(vehicle, steer_rate[k], 0, 10, 1 / 60)
+    z_end = model._vehicle_to_state(vehicle.state_cog, np.zeros(len(model.StateIdx)))
+    assert np.allclose(traj[-1], z_end)
+    # the steer angle limit is applied on every step
+    assert np.all(np.abs(traj[:, model.StateIdx.DELTA]) <= vehicle.params.delta_max)
+
+
+def test_rollout_batch_matches_single_rollouts(vehicle):
+    model = CartesianDynamicBicycleModel(MotionModel.IntScheme.RK4)
+    rng = np.random.default_rng(2)
+    n_rollouts, n_steps = 4, 20
+    z0 = model._vehicle_to_state(vehicle.state_cog, np.zeros(len(model.StateIdx)))
+    controls = model.to_ctrl_batch(rng.uniform(-1, 1, n_rollouts * n_steps), 10, n_rollouts * n_steps)
+    controls = controls.reshape(n_rollouts, n_steps, -1)
+
+    out = np.empty((n_rollouts, n_steps + 1, len(model.StateIdx)))
+    trajs = model.rollout_batch(z0, controls, 1 / 60, vehicle.params, out=out)
+    assert trajs is out
+    for idx in range(n_rollouts):
+        assert np.allclose(trajs[idx], model.rollout(z0, controls[idx], 1 / 60, vehicle.params))
+
+
+def test_rollout_of_state_array_requires_params():
+    model = CartesianDynamicBicycleModel()
+    controls = model.to_ctrl_batch(np.zeros(5), 10, 5)
+    with pytest.raises(ValueError, match="p is required"):
+        model.rollout(np.zeros(len(model.StateIdx)), controls, 1 / 60)
+
+
+@pytest.mark.parametrize("tire", [LinearTire(), FialaTire(), PacejkaTire()])
+@pytest.mark.parametrize("interp, tol", [(TableTire.Interp.LINEAR, 5e-3), (TableTire.Interp.CUBIC, 5e-5)])
+def test_tire_table_matches_analytic_tire(tire, interp, tol):
+    table_tire = TableTire(tire, interp)
+    alpha = np.linspace(-1.5, 1.5, 1001)
+    c_alpha, f_z = 1e5, 2500.0
+    force = tire.lat_force(alpha, c_alpha, f_z, 1.0)
+    assert np.allclose(table_tire.lat_force(alpha, c_alpha, f_z, 1.0), force, atol=tol * np.max(np.abs(force)))
+
+    # batched axles share one stacked table
+    c_alpha = np.array([5e4, 1e5, 2e5])
+    alpha = np.array([0.05, -0.1, 0.3])
+    assert np.allclose(table_tire.lat_force(alpha, c_alpha, f_z, 1.0), tire.lat_force(alpha, c_alpha, f_z, 1.0),
+                       atol=tol * c_alpha.max())
+
+
+def test_tire_tables_are_shared_between_equal_params():
+    model_a = CartesianDynamicBicycleModel(tire_model=TableTire(FialaTire()))
+    model_b = CartesianDynamicBicycleModel(tire_model=TableTire(FialaTire()))
+    p = Vehicle.Params()
+    fz_f, _ = model_a.axle_loads(p)
+    assert model_a.tire_model.table(p.cf, fz_f, p.mu) is model_b.tire_model.table(p.cf, fz_f, p.mu)
+    assert model_a.tire_model.table(p.cf, fz_f, 0.5) is not model_b.tire_model.table(p.cf, fz_f, p.mu)
+
+
+@pytest.mark.parametrize("tire_model", [FialaTire(), TableTire(PacejkaTire())])
+def test_saturating_tire_jacobian_matches_finite_difference(tire_model):
+    model = CartesianDynamicBicycleModel(tire_model=tire_model)
+    rng = np.random.default_rng(3)
+    n_states = len(model.StateIdx)
+    p = Vehicle.Params(mu=0.5)
+    for _ in range(5):
+        z = rng.uniform(-0.5, 0.5, n_states)
+        u = np.array([rng.uniform(1, 20), 0.3])
+        jac = model._jacobian(z, u, p, np.zeros((n_states, n_states)))
+        eps = 1e-6
+        jac_fd = np.stack([(model._eqn_of_motn(z + dz, u, p, np.zeros(n_states))
+                            - model._eqn_of_motn(z - dz, u, p, np.zeros(n_states))) / (2 * eps)
+                           for dz in eps * np.eye(n_states)], axis=1)
+        assert np.allclose(jac, jac_fd, rtol=1e-4, atol=1e-2)
@@ -0,0 +1,213 @@
+import numpy as np
+import enum
+from abc import ABC, abstractmethod
+from typing import Dict, Tuple
+
+GRAVITY = 9.81  # [m/s^2]
+
+
+class TireModel(ABC):
+    """
+    Lateral force of one axle as a function of its slip angle alpha, positive slip gives a negative force.
+
+    The axle is described by its cornering stiffness c_alpha [N/rad], normal load f_z [N] and friction coefficient mu,
+    as scalars or as (N,) arrays for a batch of vehicles.
+    """
+
+    @abstractmethod
+    def lat_force(self, alpha, c_alpha, f_z, mu) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def lat_force_slope(self, alpha, c_alpha, f_z, mu) -> np.ndarray:
+        """
+        d(lat_force)/d(alpha), used by the analytic Jacobian.
+        """
+        pass
+
+    def lat_force_and_slope(self, alpha, c_alpha, f_z, mu) -> Tuple[np.ndarray, np.ndarray]:
+        return self.lat_force(alpha, c_alpha, f_z, mu), self.lat_force_slope(alpha, c_alpha, f_z, mu)
+
+    def key(self) -> tuple:
+        """
+        Hashable description of the shape parameters of the model, tables are shared between equal keys.
+        """
+        return (type(self).__name__,)
+
+
+class LinearTire(TireModel):
+    def lat_force(self, alpha, c_alpha, f_z, mu) -> np.ndarray:
+        return -c_alpha * alpha
+
+    def lat_force_slope(self, alpha, c_alpha, f_z, mu) -> np.ndarray:
+        return -c_alpha * np.ones_like(alpha)
+
+
+class FialaTire(TireModel):
+    """
+    Brush tire with a parabolic pressure distribution, saturates at mu * f_z past the slip angle
+    atan(3 * mu * f_z / c_alpha).
+    """
+
+    def lat_force(self, alpha, c_alpha, f_z, mu) -> np.ndarray:
+        tan_sl = 3 * mu * f_z / c_alpha
+        alpha_sl = np.arctan(tan_sl)
+        tan_alpha = np.tan(np.clip(alpha, -alpha_sl, alpha_sl))
+        ratio = np.abs(tan_alpha) / tan_sl
+        force = -c_alpha * tan_alpha * (1 - ratio + ratio ** 2 / 3)
+        return np.where(np.abs(alpha) < alpha_sl, force, -mu * f_z * np.sign(alpha))
+
+    def lat_force_slope(self, alpha, c_alpha, f_z, mu) -> np.ndarray:
+        tan_sl = 3 * mu * f_z / c_alpha
+        alpha_sl = np.arctan(tan_sl)
+        tan_alpha = np.tan(np.clip(alpha, -alpha_sl, alpha_sl))
+        slope = -c_alpha * (1 - np.abs(tan_alpha) / tan_sl) ** 2 * (1 + tan_alpha ** 2)
+        return np.where(np.abs(alpha) < alpha_sl, slope, 0.0)
+
+
+class PacejkaTire(TireModel):
+    """
+    Magic Formula D * sin(C * atan(B * alpha - E * (B * alpha - atan(B * alpha)))) with D = mu * f_z and B chosen so
+    that the slope at zero slip is the cornering stiffness.
+    """
+
+    def __init__(self, shape_c: float = 1.3, shape_e: float = -0.5):
+        self.shape_c = shape_c
+        self.shape_e = shape_e
+
+    def _bd(self, c_alpha, f_z, mu) -> Tuple[np.ndarray, np.ndarray]:
+        d = mu * f_z
+        return c_alpha / (self.shape_c * d), d
+
+    def lat_force(self, alpha, c_alpha, f_z, mu) -> np.ndarray:
+        b, d = self._bd(c_alpha, f_z, mu)
+        b_alpha = b * alpha
+        phi = b_alpha - self.shape_e * (b_alpha - np.arctan(b_alpha))
+        return -d * np.sin(self.shape_c * np.arctan(phi))
+
+    def lat_force_slope(self, alpha, c_alpha, f_z, mu) -> np.ndarray:
+        b, d = self._bd(c_alpha, f_z, mu)
+        b_alpha = b * alpha
+        phi = b_alpha - self.shape_e * (b_alpha - np.arctan(b_alpha))
+        dphi = b - self.shape_e * (b - b / (1 + b_alpha ** 2))
+        return -d * np.cos(self.shape_c * np.arctan(phi)) * self.shape_c / (1 + phi ** 2) * dphi
+
+    def key(self) -> tuple:
+        return type(self).__name__, self.shape_c, self.shape_e
+
+
+class _TireTable:
+    """
+    Tire force sampled on a uniform slip angle grid, stored as per-interval polynomial coefficients in the local
+    coordinate s in [0, 1): linear [f_0, f_1 - f_0] or cubic hermite [a, b, c, d]. Each coefficient is one contiguous
+    [n_points - 1] row (or [N, n_points - 1] for a batch of axles) so that the lookup is a few flat np.take calls.
+    """
+    __slots__ = ("alpha_max", "h", "coef")
+
+    def __init__(self, alpha_max: float, h: float, coef: np.ndarray):
+        self.alpha_max = alpha_max
+        self.h = h
+        self.coef = coef  # [k, (N,) n_points - 1]
+
+    @staticmethod
+    def linear(alpha_max: float, force: np.ndarray) -> "_TireTable":
+        h = 2 * alpha_max / (force.shape[-1] - 1)
+        return _TireTable(alpha_max, h, np.stack([force[..., :-1], np.diff(force, axis=-1)]))
+
+    @staticmethod
+    def cubic(alpha_max: float, force: np.ndarray, slope: np.ndarray) -> "_TireTable":
+        # cubic hermite through the sampled forces and slopes, C1 so that the Jacobian stays continuous
+        h = 2 * alpha_max / (force.shape[-1] - 1)
+        f_0, f_1 = force[..., :-1], force[..., 1:]
+        m_0, m_1 = h * slope[..., :-1], h * slope[..., 1:]
+        return _TireTable(alpha_max, h, np.stack([f_0, m_0, 3 * (f_1 - f_0) - 2 * m_0 - m_1,
+                                                  2 * (f_0 - f_1) + m_0 + m_1]))
+
+    def __call__(self, alpha) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Interpolated force and its slope at the slip angles alpha, clamped to the table range.
+        """
+        n_intervals = self.coef.shape[-1]
+        t = (np.clip(alpha, -self.alpha_max, self.alpha_max) + self.alpha_max) / self.h
+        idx = np.minimum(t.astype(np.intp), n_intervals - 1)
+        s = t - idx
+        coef = self.coef
+        if coef.ndim == 3:
+            # one table row per axle of the batch
+            idx = idx + np.arange(coef.shape[1]) * n_intervals
+            coef = coef.reshape(len(coef), -1)
+
+        if len(coef) == 2:
+            c_1 = np.take(coef[1], idx)
+            return np.take(coef[0], idx) + s * c_1, c_1 / self.h
+        c_0, c_1, c_2, c_3 = (np.take(c, idx) for c in coef)
+        # horner
+        force = c_0 + s * (c_1 + s * (c_2 + s * c_3))
+        slope = (c_1 + s * (2 * c_2 + 3 * s * c_3)) / self.h
+        return force, slope
+
+
+class TableTire(TireModel):
+    """
+    Precomputed lookup tables of an analytic tire model with vectorized linear or cubic interpolation, so that the
+    trig chains of e.g. the Magic Formula are not evaluated inside the integrator.
+
+    Tables are built once per (tire model, axle params) and shared by all vehicles and motion models with equal params.
+    """
+
+    class Interp(enum.Enum):
+        LINEAR = 0
+        CUBIC = 1
+
+    # shared by all TableTire instances, oldest tables are dropped past _MAX_TABLES
+    _tables: Dict[tuple, _TireTable] = {}
+    _MAX_TABLES = 64
+
+    def __init__(self, tire: TireModel, interp: Interp = Interp.CUBIC, n_points: int = 4097,
+                 alpha_max: float = np.pi):
+        self.tire = tire
+        self.interp = interp
+        self.n_points = n_points
+        self.alpha_max = alpha_max
+
+    def lat_force(self, alpha, c_alpha, f_z, mu) -> np.ndarray:
+        return self._interpolate(alpha, c_alpha, f_z, mu)[0]
+
+    def lat_force_slope(self, alpha, c_alpha, f_z, mu) -> np.ndarray:
+        return self._interpolate(alpha, c_alpha, f_z, mu)[1]
+
+    def lat_force_and_slope(self, alpha, c_alpha, f_z, mu) -> Tuple[np.ndarray, np.ndarray]:
+        return self._interpolate(alpha, c_alpha, f_z, mu)
+
+    def key(self) -> tuple:
+        return (type(self).__name__, self.interp, self.n_points, self.alpha_max) + self.tire.key()
+
+    def _interpolate(self, alpha, c_alpha, f_z, mu) -> Tuple[np.ndarray, np.ndarray]:
+        return self.table(c_alpha, f_z, mu)(alpha)
+
+    def table(self, c_alpha, f_z, mu) -> _TireTable:
+        if np.ndim(c_alpha) or np.ndim(f_z) or np.ndim(mu):
+            axle_key = tuple(np.asarray(val, dtype=float).tobytes() for val in (c_alpha, f_z, mu))
+        else:
+            axle_key = (float(c_alpha), float(f_z), float(mu))
+        key = self.key() + axle_key
+
+        table = self._tables.get(key)
+        if table is None:
+            table = self._build(c_alpha, f_z, mu)
+            if len(self._tables) >= self._MAX_TABLES:
+                self._tables.pop(next(iter(self._tables)))
+            self._tables[key] = table
+        return table
+
+    def _build(self, c_alpha, f_z, mu) -> _TireTable:
+        alpha = np.linspace(-self.alpha_max, self.alpha_max, self.n_points)
+        # (N, 1) columns for batched axle params so that they broadcast against the slip angle grid
+        c_alpha, f_z, mu = (np.expand_dims(np.asarray(val, dtype=float), -1) for val in (c_alpha, f_z, mu))
+        force = self.tire.lat_force(alpha, c_alpha, f_z, mu)
+        slope = self.tire.lat_force_slope(alpha, c_alpha, f_z, mu)
+        if force.ndim == 2 and force.shape[0] == 1:
+            force, slope = force[0], slope[0]
+        if self.interp is self.Interp.LINEAR:
+            return _TireTable.linear(self.alpha_max, force)
+        return _TireTable.cubic(self.alpha_max, force, slope)
@@ -5,13 +5,17 @@ import pygame_menu
 from abc import ABC, abstractmethod
 import numpy as np
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 from control.ControllerBase import ControllerBase
+from control.async_tracker import AsyncPathTracker
+from control.gain_cache import GainCache
 from control.lqr_path_tracker import (
     LQRPathTrackerBase,
     KinematicLQRPathTracker,
     DynamicLQRPathTracker,
 )
+from control.mpc_path_tracker import MPCPathTracker
 from sprites.StanleyControlSprite import StanleyControlSprite, StanleyControl
 from sprites.PurePursuitSprite import PurePursuitSprite, PurePursuitControl
 from sprites.lqr_sprite import LQRSprite
@@ -19,11 +23,16 @@ from utils.pgutils.text import menu_config, v_frame
 import utils.pgutils.pgutils as utils
 
 
+# shared by the LQR trackers of all scenes, fills their gain tables off the render thread
+_gain_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="lqr-gains")
+
+
 class ControlType(enum.Enum):
     pure_pursuit = 0
     stanley = 1
     kinematic_lqr = 2
     dynamic_lqr = 3
+    mpc = 4
 
 
 class ControlBuilderInterface(ABC):
@@ -108,9 +117,13 @@ class LQRBuilder(ControlBuilderInterface):
         default_R[0, 0] = 5.0
 
         self._params = LQRPathTrackerBase.Params(
-            Q=default_Q, R=default_R, dt=sim_to_real.sim_dt
+            Q=default_Q, R=default_R, dt=sim_to_real.scheduler.tracker_dt
+        )
+        self._control = LQRSprite(
+            lqr_enum.value(self._params, GainCache(GainCache.Params()), _gain_executor),
+            sim_to_real,
+            screen,
         )
-        self._control = LQRSprite(lqr_enum.value(self._params), sim_to_real, screen)
 
         self._menu = menu_config(screen, "LQR", fontsize=12)
         f_menu = v_frame(screen, self._menu)
@@ -204,6 +217,15 @@ class LQRBuilder(ControlBuilderInterface):
         fh.pack(table_R)
 
         f_menu.pack(fh)
+        f_menu.pack(
+            self._menu.add.toggle_switch(
+                "STABILITY MAP",
+                default=self._control.show_stability_map,
+                state_text=("N", "Y"),
+                onchange=self._stability_map_callback,
+                font_size=8,
+            )
+        )
         f_menu.pack(self._menu.add.button("BACK", pygame_menu.events.BACK))
 
     def array_to_label(self, array: np.ndarray):
@@ -218,6 +240,120 @@ class LQRBuilder(ControlBuilderInterface):
         labels[row, col].set_title("{:.1f}".format(val))
         self._control.tracker.set_params(self._params)
 
+    def _stability_map_callback(self, val: bool):
+        self._control.show_stability_map = val
+
+    @property
+    def menu(self) -> pygame_menu.Menu:
+        return self._menu
+
+    @property
+    def control(self) -> ControllerBase:
+        return self._control
+
+
+class MPCBuilder(ControlBuilderInterface):
+    def __init__(self, sim_to_real: utils.SimToReal, screen: pygame.Surface):
+        default_Q = np.zeros((4, 4))
+        default_Q[0, 0] = 0.1
+        default_Q[2, 2] = 0.1
+
+        self._params = MPCPathTracker.Params(
+            Q=default_Q, R=5.0, R_rate=5.0, dt=sim_to_real.scheduler.tracker_dt
+        )
+        self._control = LQRSprite(MPCPathTracker(self._params), sim_to_real, screen)
+
+        self._menu = menu_config(screen, "MPC", fontsize=12)
+        f_menu = v_frame(screen, self._menu)
+
+        f_menu.pack(
+            self._menu.add.dropselect(
+                "MODEL",
+                [
+                    ("DYNAMIC", MPCPathTracker.Model.dynamic),
+                    ("KINEMATIC", MPCPathTracker.Model.kinematic),
+                ],
+                default=0,
+                onchange=self._model_callback,
+                font_size=8,
+            )
+        )
+        f_menu.pack(self._menu.add.label("WEIGHTS:"))
+        f_menu.pack(
+            self._menu.add.range_slider(
+                "CTE",
+                self._params.Q[0, 0],
+                (0, 1),
+                0.01,
+                onchange=lambda val: self._q_callback(val, 0),
+                font_size=8,
+            )
+        )
+        f_menu.pack(
+            self._menu.add.range_slider(
+                "YAW_ERR",
+                self._params.Q[2, 2],
+                (0, 1),
+                0.01,
+                onchange=lambda val: self._q_callback(val, 2),
+                font_size=8,
+            )
+        )
+        f_menu.pack(
+            self._menu.add.range_slider(
+                "DELTA",
+                self._params.R,
+                (0.1, 20),
+                0.5,
+                onchange=lambda val: self._update_param("R", val),
+                font_size=8,
+            )
+        )
+        f_menu.pack(
+            self._menu.add.range_slider(
+                "DELTA_RATE",
+                self._params.R_rate,
+                (0, 20),
+                0.5,
+                onchange=lambda val: self._update_param("R_rate", val),
+                font_size=8,
+            )
+        )
+        f_menu.pack(self._menu.add.label("COMPUTE:", padding=(20, 0, 0, 0)))
+        f_menu.pack(
+            self._menu.add.range_slider(
+                "MAX HORIZON",
+                self._params.horizon_max,
+                (self._params.horizon_min, 50),
+                1,
+                value_format=lambda val: str(int(val)),
+                onchange=lambda val: self._update_param("horizon_max", int(val)),
+                font_size=8,
+            )
+        )
+        f_menu.pack(
+            self._menu.add.range_slider(
+                "BUDGET [MS]",
+                self._params.budget_ms,
+                (0.5, 15),
+                0.5,
+                onchange=lambda val: self._update_param("budget_ms", val),
+                font_size=8,
+            )
+        )
+        f_menu.pack(self._menu.add.button("BACK", pygame_menu.events.BACK))
+
+    def _q_callback(self, val, idx):
+        self._params.Q[idx, idx] = val
+        self._control.tracker.set_params(self._params)
+
+    def _update_param(self, name, val):
+        setattr(self._params, name, val)
+        self._control.tracker.set_params(self._params)
+
+    def _model_callback(self, _, model):
+        self._update_param("model", model)
+
     @property
     def menu(self) -> pygame_menu.Menu:
         return self._menu
@@ -228,7 +364,14 @@ class LQRBuilder(ControlBuilderInterface):
 
 
 class ControlFactory:
-    def __init__(self, sim_to_real, screen, cont_type: ControlType, draw_plots=True):
+    def __init__(
+        self,
+        sim_to_real,
+        screen,
+        cont_type: ControlType,
+        draw_plots=True,
+        run_async=False,
+    ):
         self._control_builder_map = {
             ControlType.pure_pursuit: PurePursuitBuilder(sim_to_real, screen),
             ControlType.stanley: StanleyControlBuilder(sim_to_real, screen),
@@ -238,12 +381,18 @@ class ControlFactory:
             ControlType.dynamic_lqr: LQRBuilder(
                 LQRBuilder.LqrEnum.dynamic, sim_to_real, screen
             ),
+            ControlType.mpc: MPCBuilder(sim_to_real, screen),
         }
 
         self._current_control_type = cont_type
         self._draw_plots = draw_plots
         self._subprocess_list = []
 
+        # trackers run with a deadline on a worker thread, created on first use per control type
+        self._run_async = run_async
+        self._async_params = AsyncPathTracker.Params()
+        self._async_trackers = {}
+
         self.controller_menu = menu_config(title="PATH TRACKER", screen=screen)
         f_controller_menu = v_frame(screen, self.controller_menu)
         f_controller_menu.pack(
@@ -254,6 +403,7 @@ class ControlFactory:
                     ("STANLEY", ControlType.stanley),
                     ("KINE. LQR", ControlType.kinematic_lqr),
                     ("DYN. LQR", ControlType.dynamic_lqr),
+                    ("MPC", ControlType.mpc),
                 ],
                 default=cont_type.value,
                 onchange=self._change_control_callback,
@@ -290,13 +440,46 @@ class ControlFactory:
                 width=80,
             )
         )
+        f_controller_menu.pack(
+            self.controller_menu.add.toggle_switch(
+                "ASYNC",
+                default=self._run_async,
+                state_text=("N", "Y"),
+                onchange=self._run_async_callback,
+                width=80,
+            )
+        )
+        f_controller_menu.pack(
+            self.controller_menu.add.range_slider(
+                "DEADLINE [MS]",
+                self._async_params.deadline_ms,
+                (0.5, 15),
+                0.5,
+                onchange=self._deadline_callback,
+            )
+        )
         f_controller_menu.pack(
             self.controller_menu.add.button("BACK", pygame_menu.events.BACK)
         )
 
     @property
     def control(self) -> ControllerBase:
-        return self._control_builder_map[self._current_control_type].control
+        control = self._control_builder_map[self._current_control_type].control
+        if not self._run_async:
+            return control
+        async_tracker = self._async_trackers.get(self._current_control_type)
+        if async_tracker is None:
+            async_tracker = self._async_trackers[self._current_control_type] = (
+                AsyncPathTracker(control, self._async_params)
+            )
+        return async_tracker
+
+    @property
+    def latency_name(self) -> str:
+        """
+        Name of the current controller in the latency stats.
+        """
+        return "tracker." + self._current_control_type.name
 
     def draw(self, screen: pygame.Surface):
         self.control.draw(screen)
@@ -314,6 +497,15 @@ class ControlFactory:
     def _draw_plots_callback(self, val: bool):
         self._draw_plots = val
 
+    def _run_async_callback(self, val: bool):
+        self._run_async = val
+        if not val:
+            for async_tracker in self._async_trackers.values():
+                async_tracker.wait()
+
+    def _deadline_callback(self, val: float):
+        self._async_params.deadline_ms = val
+
     def __del__(self):
         for process in self._subprocess_list:
             process.kill()
@@ -159,9 +159,17 @@ class LowLevelControlFactory:
                 "INTEGRATION",
                 [
                     ("EULER", CartesianDynamicBicycleModel.IntScheme.EULER),
+                    (
+                        "SEMI-IMPL. EULER",
+                        CartesianDynamicBicycleModel.IntScheme.SEMI_IMPLICIT_EULER,
+                    ),
+                    ("RK2", CartesianDynamicBicycleModel.IntScheme.RK2),
                     ("RK4", CartesianDynamicBicycleModel.IntScheme.RK4),
+                    ("RK45 (ADAPTIVE)", CartesianDynamicBicycleModel.IntScheme.RK45),
+                    ("ROSENBROCK", CartesianDynamicBicycleModel.IntScheme.ROSENBROCK),
+                    ("LINEARIZED", CartesianDynamicBicycleModel.IntScheme.LINEARIZED),
                 ],
-                default=1,
+                default=3,
                 onchange=self._int_scheme_callback,
             )
         )
@@ -186,18 +194,28 @@ class LowLevelControlFactory:
 
     def _lf_callback(self, val):
         self.vehicle_state.params.lf = val
+        self.vehicle_state.invalidate_cache()
+        self._invalidate_linearization()
 
     def _lr_callback(self, val):
         self.vehicle_state.params.lr = val
+        self.vehicle_state.invalidate_cache()
+        self._invalidate_linearization()
 
     def _m_callback(self, val):
         self.vehicle_state.params.m = val
+        self._invalidate_linearization()
 
     def _cf_callback(self, val):
         self.vehicle_state.params.cf = val
+        self._invalidate_linearization()
 
     def _cr_callback(self, val):
         self.vehicle_state.params.cr = val
+        self._invalidate_linearization()
+
+    def _invalidate_linearization(self):
+        self._motion_model_map[MotionModelType.dynamic_model].invalidate_linearization()
 
     def _max_steer_callback(self, val):
         self.vehicle_state.params.delta_max = np.deg2rad(val)
@@ -7,6 +7,7 @@ import numpy as np
 from dynamics.Vehicle import Vehicle
 from dynamics.CartesianDynamicBicycleModel import CartesianDynamicBicycleModel
 from dynamics.kinematic_model import CartesianKinematicBicycleModel
+from dynamics.tire_model import LinearTire, FialaTire, PacejkaTire, TableTire
 from utils import math
 from sprites.CarSprite import CarSprite
 from sprites.plot import PgPlot, PlotManager
@@ -33,6 +34,8 @@ class VehicleFactory:
         self.screen = screen
         self.vehicle_state = self.reset_init_pose()
         self.car_sprite = CarSprite(sim_to_real, self.vehicle_state.params)
+        # frames with no dynamics substep due draw the sprite as it is, so it needs an initial pose
+        self.car_sprite.update(self.vehicle_state.state_cog)
 
         self._motion_model_map = {
             MotionModelType.dynamic_model: CartesianDynamicBicycleModel(),
@@ -199,6 +202,15 @@ class VehicleFactory:
                 onchange=self._max_steer_callback,
             )
         )
+        f_vehicle_param_menu.pack(
+            self._vehicle_param_menu.add.range_slider(
+                "MU",
+                self.vehicle_state.params.mu,
+                (0.1, 1.5),
+                0.05,
+                onchange=self._mu_callback,
+            )
+        )
         f_vehicle_param_menu.pack(
             self._vehicle_param_menu.add.button("BACK", pygame_menu.events.BACK)
         )
@@ -208,12 +220,32 @@ class VehicleFactory:
                 "INTEGRATION",
                 [
                     ("EULER", CartesianDynamicBicycleModel.IntScheme.EULER),
+                    (
+                        "SEMI-IMPL. EULER",
+                        CartesianDynamicBicycleModel.IntScheme.SEMI_IMPLICIT_EULER,
+                    ),
+                    ("RK2", CartesianDynamicBicycleModel.IntScheme.RK2),
                     ("RK4", CartesianDynamicBicycleModel.IntScheme.RK4),
+                    ("RK45 (ADAPTIVE)", CartesianDynamicBicycleModel.IntScheme.RK45),
+                    ("ROSENBROCK", CartesianDynamicBicycleModel.IntScheme.ROSENBROCK),
+                    ("LINEARIZED", CartesianDynamicBicycleModel.IntScheme.LINEARIZED),
                 ],
-                default=1,
+                default=3,
                 onchange=self._int_scheme_callback,
             )
         )
+        f_motion_model_menu.pack(
+            self._motion_model_menu.add.dropselect(
+                "TIRE",
+                [
+                    ("LINEAR", LinearTire()),
+                    ("FIALA", TableTire(FialaTire())),
+                    ("PACEJKA", TableTire(PacejkaTire())),
+                ],
+                default=0,
+                onchange=self._tire_model_callback,
+            )
+        )
         f_motion_model_menu.pack(
             self._motion_model_menu.add.dropselect(
                 "MODEL",
@@ -235,22 +267,38 @@ class VehicleFactory:
 
     def _lf_callback(self, val):
         self.vehicle_state.params.lf = val
+        self.vehicle_state.invalidate_cache()
+        self._invalidate_linearization()
 
     def _lr_callback(self, val):
         self.vehicle_state.params.lr = val
+        self.vehicle_state.invalidate_cache()
+        self._invalidate_linearization()
 
     def _m_callback(self, val):
         self.vehicle_state.params.m = val
+        self._invalidate_linearization()
 
     def _cf_callback(self, val):
         self.vehicle_state.params.cf = val
+        self._invalidate_linearization()
 
     def _cr_callback(self, val):
         self.vehicle_state.params.cr = val
+        self._invalidate_linearization()
+
+    def _invalidate_linearization(self):
+        self._motion_model_map[MotionModelType.dynamic_model].invalidate_linearization()
 
     def _max_steer_callback(self, val):
         self.vehicle_state.params.delta_max = np.deg2rad(val)
 
+    def _mu_callback(self, val):
+        self.vehicle_state.params.mu = val
+
+    def _tire_model_callback(self, _, tire_model):
+        self._motion_model_map[MotionModelType.dynamic_model].tire_model = tire_model
+
     def _int_scheme_callback(self, _, int_scheme):
         for _, val in self._motion_model_map.items():
             val._int_scheme = int_scheme
@@ -1,5 +1,6 @@
 import numpy as np
 import scipy.interpolate as scipy_interpolate
+from scipy.spatial import cKDTree
 import pygame
 from typing import List, Tuple
 from paths.PathBase import PathBase
@@ -7,54 +8,264 @@ from utils import math
 
 
 class BSplinePath(PathBase):
+    """
+    Spline through the points, sampled n_path_points times per segment. The samples are stored as one [5, n] float64
+    array with contiguous rows x, y, theta, curvature and station, exposed as views (spline_x, ..., spline_station and
+    the [3, n] spline_poses). Poses are only built as objects for the samples a query returns. The samples array is
+    only replaced when an update changes the geometry, caches over the samples compare it by identity.
+
+    With coeff, the points are the coefficients of the spline, so the knots and the basis functions at the samples only
+    depend on the number of points and each point only moves the samples of the degree + 1 segments of its support.
+    The basis is kept per number of points, a fit is a product with the points and an update of the last points, e.g.
+    the one following the mouse, only evaluates the samples in their support.
+
+    With spatial_index, nearest pose queries go to a KD-tree over the samples, built on the first query after the
+    geometry changed, else to the windowed search or a scan of all samples.
+    """
+
+    X, Y, THETA, CURV, STATION = range(5)
+    # nearest pose searches scan SEARCH_WINDOW samples to each side of the last nearest sample of the closest of the
+    # last SEARCH_MAX_TRACKS query points, if it is closer than SEARCH_MAX_JUMP_M [m], else all samples
+    SEARCH_WINDOW = 16
+    SEARCH_MAX_JUMP_M = 2.0
+    SEARCH_MAX_TRACKS = 8
+    # below, one vectorized scan of all samples is cheaper than the windowed searches in Python
+    SEARCH_MIN_SAMPLES = 2048
+    # bases of the fits with coeff kept, one per number of points
+    MAX_BASES = 16
+
     # todo params class with menu
     def __init__(self, points: List[pygame.Vector2], n_path_points: int,
-                 degree: int = 3, smoothness: float = 0, coeff: int = 0):
+                 degree: int = 3, smoothness: float = 0, coeff: int = 0, spatial_index: bool = False):
         self.n_path_points = n_path_points
         self.degree = degree
         self.smoothness = smoothness
         self.coeff = coeff
+        self.spatial_index = spatial_index
+        self._kdtree = None
+        self._kdtree_samples = None
+        self._bases = {}  # by number of points, for the fits with coeff
+        self._fit = None  # coefficients, [3, 2, n] values and derivatives and the samples of the last fit with coeff
+        self.n_evaluated_samples = 0
 
-        self.spline_list = None
         self.points = None
-        self.spline_station = None
-        self.spline_curv = None
+        self.spline_samples = np.empty((5, 0))
         self.update(points)
         self.nearest_idx = 0
 
-    def get_pose_at_station(self, station: float) -> math.Pose:
-        for idx, spline_station in enumerate(self.spline_station):
-            if station <= spline_station:
-                break
+        # [x, y, nearest sample index] of the last query points, valid for _track_samples only
+        self._track_samples = None
+        self._tracks = []
+        self.n_windowed_searches = 0
+        self.n_global_searches = 0
+        self.n_index_builds = 0
+
+    def __copy__(self) -> "BSplinePath":
+        # snapshot for searches on another thread, updates replace the sample and fit arrays instead of writing into
+        # them, so only the search tracks and the basis cache are copied
+        path = object.__new__(type(self))
+        path.__dict__.update(self.__dict__)
+        path._tracks = [list(track) for track in self._tracks]
+        path._bases = dict(self._bases)
+        return path
 
-        return self.spline_list[idx]
+    @property
+    def n_samples(self) -> int:
+        return self.spline_samples.shape[1]
 
-    def get_curv_at_station(self, station: float) -> float:
-        for idx, spline_station in enumerate(self.spline_station):
-            if station <= spline_station:
-                return self.spline_curv[idx]
+    @property
+    def spline_x(self) -> np.ndarray:
+        return self.spline_samples[self.X]
+
+    @property
+    def spline_y(self) -> np.ndarray:
+        return self.spline_samples[self.Y]
+
+    @property
+    def spline_theta(self) -> np.ndarray:
+        return self.spline_samples[self.THETA]
+
+    @property
+    def spline_curv(self) -> np.ndarray:
+        return self.spline_samples[self.CURV]
 
-        return self.spline_curv[-1]
+    @property
+    def spline_station(self) -> np.ndarray:
+        return self.spline_samples[self.STATION]
+
+    @property
+    def spline_poses(self) -> np.ndarray:
+        """
+        [3, n] x, y and theta rows, e.g. for SimToReal.get_sim_from_real.
+        """
+        return self.spline_samples[self.X:self.CURV]
+
+    @property
+    def spline_list(self) -> List[math.Pose]:
+        """
+        Samples as pose objects, prefer the arrays.
+        """
+        return [math.Pose(x, y, theta) for x, y, theta in self.spline_poses.T.tolist()]
+
+    def _pose(self, idx: int) -> math.Pose:
+        x, y, theta = self.spline_samples[self.X:self.CURV, idx].tolist()
+        return math.Pose(x, y, theta)
+
+    def _station_ratio(self, station: float) -> Tuple[int, float]:
+        # scalar counterpart of _station_interp, without the array overhead
+        spline_station = self.spline_station
+        idx = min(max(int(np.searchsorted(spline_station, station, side="right")) - 1, 0), max(self.n_samples - 2, 0))
+        if idx + 1 >= self.n_samples:
+            return idx, 0.0
+        station_0, station_1 = spline_station[idx:idx + 2].tolist()
+        ds = station_1 - station_0
+        return idx, min(max((station - station_0) / ds, 0.0), 1.0) if ds > 0 else 0.0
+
+    def get_pose_at_station(self, station: float) -> math.Pose:
+        if not self.n_samples:
+            return None
+        idx, ratio = self._station_ratio(station)
+        x, y, theta = self.spline_samples[self.X:self.CURV, idx].tolist()
+        if ratio:
+            x_1, y_1, theta_1 = self.spline_samples[self.X:self.CURV, idx + 1].tolist()
+            x += ratio * (x_1 - x)
+            y += ratio * (y_1 - y)
+            theta = math.pi_2_pi(theta + ratio * math.pi_2_pi(theta_1 - theta))
+        return math.Pose(x, y, theta)
+
+    def get_curv_at_station(self, station: float) -> float:
+        if not self.n_samples:
+            return np.nan
+        idx, ratio = self._station_ratio(station)
+        curv = self.spline_curv[idx:idx + 2].tolist()
+        return curv[0] + ratio * (curv[1] - curv[0]) if ratio else curv[0]
 
     def get_nearest_pose(self, point: math.Point) -> Tuple[math.Pose, float]:
-        if not self.spline_list:
-            return None, None
-        dist = [np.sqrt((point.x - p.x) ** 2 + (point.y - p.y) ** 2) for p in self.spline_list]
-        nearest_idx = np.argmin(dist)
-        self.nearest_idx = nearest_idx
-        return self.spline_list[self.nearest_idx], self.spline_station[self.nearest_idx]
-
-    def __update_spline_list(self, points: List[pygame.Vector2]):
+        return self.get_nearest_poses([point])[0]
+
+    def get_nearest_poses(self, points: List[math.Point]) -> List[Tuple[math.Pose, float]]:
+        if not self.n_samples:
+            return [(None, None)] * len(points)
+        nearest_idxs = self._nearest_idxs(np.array([(point.x, point.y) for point in points]))
+        self.nearest_idx = nearest_idxs[-1]
+        return [(self._pose(idx), float(self.spline_station[idx])) for idx in nearest_idxs]
+
+    def _nearest_idxs(self, points: np.ndarray) -> np.ndarray:
+        if self.spatial_index:
+            if self._kdtree_samples is not self.spline_samples:
+                self._kdtree_samples = self.spline_samples
+                self._kdtree = cKDTree(self.spline_samples[self.X:self.THETA].T)
+                self.n_index_builds += 1
+            return self._kdtree.query(points)[1]
+        return self._windowed_nearest_idxs(points)
+
+    def _windowed_nearest_idxs(self, points: np.ndarray) -> np.ndarray:
+        """
+        Nearest sample of each point, searched in a window around the last nearest sample of the closest previous
+        query point. The window minimum is only taken if it is inside the window or at an end of the path, i.e. the
+        distance rises on both sides of it, else the point is searched globally. Refitting the path resets the tracks.
+        Like a tracker, a point keeps to the part of the path it follows where the path comes back close to itself.
+        """
+        if self.spline_samples is not self._track_samples:
+            self._track_samples = self.spline_samples
+            self._tracks = []
+
+        n_samples = self.n_samples
+        window = 2 * self.SEARCH_WINDOW + 1
+        nearest_idxs = np.full(len(points), -1)
+        windowed = n_samples >= max(self.SEARCH_MIN_SAMPLES, window)
+        if windowed:
+            spline_x, spline_y = self.spline_x, self.spline_y
+            max_jump_sq = self.SEARCH_MAX_JUMP_M ** 2
+            for point_idx, (x, y) in enumerate(points.tolist()):
+                track = min(self._tracks, key=lambda t: (t[0] - x) ** 2 + (t[1] - y) ** 2, default=None)
+                if track is None or (track[0] - x) ** 2 + (track[1] - y) ** 2 > max_jump_sq:
+                    self._tracks = self._tracks[1 - self.SEARCH_MAX_TRACKS:] + [[x, y, -1]]
+                    continue
+                lo = min(max(track[2] - self.SEARCH_WINDOW, 0), n_samples - window)
+                dx = spline_x[lo:lo + window] - x
+                dy = spline_y[lo:lo + window] - y
+                col = int(np.argmin(dx * dx + dy * dy))
+                if (col > 0 or lo == 0) and (col < window - 1 or lo == n_samples - window):
+                    nearest_idxs[point_idx] = track[2] = lo + col
+                    track[0], track[1] = x, y
+                    self.n_windowed_searches += 1
+
+        search = nearest_idxs < 0
+        if search.any():
+            dx = self.spline_x[None, :] - points[search, :1]
+            dy = self.spline_y[None, :] - points[search, 1:2]
+            nearest_idxs[search] = np.argmin(dx * dx + dy * dy, axis=1)
+            self.n_global_searches += int(search.sum())
+            if windowed:
+                self._update_tracks(points[search], nearest_idxs[search])
+        return nearest_idxs
+
+    def _update_tracks(self, points: np.ndarray, nearest_idxs: np.ndarray):
+        # the points searched globally restart the track closest to them
+        for (x, y), idx in zip(points.tolist(), nearest_idxs.tolist()):
+            track = min(self._tracks, key=lambda t: (t[0] - x) ** 2 + (t[1] - y) ** 2)
+            track[:] = x, y, idx
+
+    def get_nearest_pose_array(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.n_samples:
+            return np.full((len(points), 3), np.nan), np.full(len(points), np.nan)
+        nearest_idxs = self._nearest_idxs(np.asarray(points, dtype=float))
+        return self.spline_poses[:, nearest_idxs].T, self.spline_station[nearest_idxs]
+
+    def _station_interp(self, stations: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Samples idx and next_idx around each station and the fraction of the way between them, stations off the path
+        are clamped to its ends. NaN stations give NaN fractions.
+        """
+        spline_station = self.spline_station
+        stations = np.clip(stations, spline_station[0], spline_station[-1])
+        idxs = np.clip(np.searchsorted(spline_station, stations, side="right") - 1, 0, max(self.n_samples - 2, 0))
+        next_idxs = np.minimum(idxs + 1, self.n_samples - 1)
+        ds = spline_station[next_idxs] - spline_station[idxs]
+        ratios = np.divide(stations - spline_station[idxs], ds, out=np.zeros_like(stations), where=ds > 0)
+        ratios[np.isnan(stations)] = np.nan
+        return idxs, next_idxs, ratios
+
+    def get_pose_array_at_station(self, stations: np.ndarray) -> np.ndarray:
+        stations = np.asarray(stations, dtype=float)
+        if not self.n_samples:
+            return np.full((len(stations), 3), np.nan)
+        idxs, next_idxs, ratios = self._station_interp(stations)
+        poses = self.spline_poses[:, idxs].T
+        next_poses = self.spline_poses[:, next_idxs].T
+        delta = next_poses - poses
+        delta[:, 2] = math.pi_2_pi(delta[:, 2])
+        poses += ratios[:, None] * delta
+        poses[:, 2] = math.pi_2_pi(poses[:, 2])
+        return poses
+
+    def get_curv_array_at_station(self, stations: np.ndarray) -> np.ndarray:
+        stations = np.asarray(stations, dtype=float)
+        if not self.n_samples:
+            return np.full(len(stations), np.nan)
+        idxs, next_idxs, ratios = self._station_interp(stations)
+        curvs = self.spline_curv
+        return curvs[idxs] + ratios * (curvs[next_idxs] - curvs[idxs])
+
+    def __update_spline_samples(self, points: List[pygame.Vector2]):
         self.points = points
-        self.spline_list = None
+        prev_fit, self._fit = self._fit, None
         if len(points) <= 1:
+            self.spline_samples = np.empty((5, 0))
             return
-        elif len(points) <= self.degree:
-            self.spline_list = [math.Pose(p.x, p.y, 0) for p in points]
-            self.spline_curv = [0.0] * len(self.spline_list)
+
+        samples = self.spline_samples = np.zeros((5, len(points)))
+        if len(points) <= self.degree:
+            samples[self.X] = [p.x for p in points]
+            samples[self.Y] = [p.y for p in points]
             return
 
         self.nearest_idx = 0
+        if self.coeff and not self.smoothness:
+            self.__update_local_spline_samples(points, prev_fit)
+            return
+
         x = [p.x for p in points]
         y = [p.y for p in points]
         t = range(len(x))
@@ -71,37 +282,95 @@ class BSplinePath(PathBase):
             y_list[1] = y + [0.0] * self.coeff
 
         ipl_t = np.linspace(0.0, len(x) - 1, self.n_path_points * (len(x) - 1))
-        rx = scipy_interpolate.splev(ipl_t, x_list)
-        ry = scipy_interpolate.splev(ipl_t, y_list)
+        samples = self.spline_samples = np.empty((5, len(ipl_t)))
+        samples[self.X] = scipy_interpolate.splev(ipl_t, x_list)
+        samples[self.Y] = scipy_interpolate.splev(ipl_t, y_list)
 
         dx_dt = scipy_interpolate.splev(ipl_t, x_list, der=1)
         dy_dt = scipy_interpolate.splev(ipl_t, y_list, der=1)
         d2x_dt2 = scipy_interpolate.splev(ipl_t, x_list, der=2)
         d2y_dt2 = scipy_interpolate.splev(ipl_t, y_list, der=2)
 
-        rtheta = np.arctan2(dy_dt, dx_dt)
-
-        # TODO add comment with derivation
-        # TODO make spline state dataclass
-        self.spline_curv = (dx_dt*d2y_dt2 + d2x_dt2*dy_dt) * (dx_dt**2 + dy_dt**2)**(-3/2)
-        self.spline_list = [math.Pose(rx[idx], ry[idx], rtheta[idx]) for idx in range(len(rx))]
+        samples[self.THETA] = np.arctan2(dy_dt, dx_dt)
+
+        # signed curvature of the parametric curve, d(theta)/ds = (x' y'' - x'' y') / (x'^2 + y'^2)^(3/2), positive for
+        # left turns
+        samples[self.CURV] = (dx_dt*d2y_dt2 - d2x_dt2*dy_dt) * (dx_dt**2 + dy_dt**2)**(-3/2)
+
+    def __basis(self, n_points: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Basis of the spline with the n_points points as coefficients at the samples: the [n_samples] span of each
+        sample, the [n_samples, degree + 1] coefficients that are nonzero at the samples and the [3, n_samples,
+        degree + 1] values and first two derivatives of their basis functions.
+        """
+        basis = self._bases.get(n_points)
+        if basis is not None:
+            return basis
+
+        k = self.degree
+        ipl_t = np.linspace(0.0, n_points - 1, self.n_path_points * (n_points - 1))
+        # with s=0 the knots only depend on the parameters of the points
+        knots = scipy_interpolate.splrep(np.arange(n_points), np.zeros(n_points), k=k, s=0)[0]
+        spans = np.clip(np.searchsorted(knots, ipl_t, side="right") - 1, k, n_points - 1)
+        # the k + 1 coefficients nonzero at a sample are consecutive, so one spline per coefficient index modulo k + 1
+        # evaluates each of them at all samples
+        spline = scipy_interpolate.BSpline(knots, np.eye(k + 1)[np.arange(n_points) % (k + 1)], k)
+        coeff_idxs = (spans - k)[:, None] + np.arange(k + 1)
+        values = np.stack([spline(ipl_t, nu) for nu in range(3)])
+        values = np.take_along_axis(values, (coeff_idxs % (k + 1))[None], axis=2)
+
+        if len(self._bases) >= self.MAX_BASES:
+            self._bases.clear()
+        basis = self._bases[n_points] = spans, coeff_idxs, values
+        return basis
+
+    def __update_local_spline_samples(self, points: List[pygame.Vector2], prev_fit: Tuple[np.ndarray, ...]):
+        coeffs = np.array([(p.x, p.y) for p in points])
+        spans, coeff_idxs, values = self.__basis(len(coeffs))
+
+        samples = self.spline_samples = np.empty((5, len(spans)))
+        if prev_fit is not None and len(prev_fit[0]) == len(coeffs):
+            # only the samples in the support of the moved points
+            prev_coeffs, derivs, prev_samples = prev_fit
+            moved = np.flatnonzero((prev_coeffs != coeffs).any(axis=1))
+            lo = hi = 0
+            if len(moved):
+                lo = np.searchsorted(spans, moved[0])
+                hi = np.searchsorted(spans, moved[-1] + self.degree, side="right")
+                derivs = derivs.copy()
+            samples[:self.STATION] = prev_samples[:self.STATION]
+        else:
+            lo, hi = 0, len(spans)
+            derivs = np.empty((3, 2, len(spans)))
+        self._fit = coeffs, derivs, samples
+        self.n_evaluated_samples += hi - lo
+
+        derivs[:, :, lo:hi] = np.einsum("dik,ikc->dci", values[:, lo:hi], coeffs[coeff_idxs[lo:hi]])
+        (x, y), (dx_dt, dy_dt), (d2x_dt2, d2y_dt2) = derivs[:, :, lo:hi]
+        samples[self.X, lo:hi] = x
+        samples[self.Y, lo:hi] = y
+        samples[self.THETA, lo:hi] = np.arctan2(dy_dt, dx_dt)
+        samples[self.CURV, lo:hi] = (dx_dt*d2y_dt2 - d2x_dt2*dy_dt) * (dx_dt**2 + dy_dt**2)**(-3/2)
 
     def update(self, points: List[pygame.Vector2]):
-        self.__update_spline_list(points)
+        prev_samples = self.spline_samples
+        self.__update_spline_samples(points)
 
         # update spline station
-        if self.spline_list:
-            self.spline_station = [0]*len(self.spline_list)
-            for idx in range(1, len(self.spline_list)):
-                dist = np.sqrt((self.spline_list[idx].x - self.spline_list[idx-1].x)**2 + (self.spline_list[idx].y - self.spline_list[idx-1].y)**2)
-                self.spline_station[idx] = self.spline_station[idx - 1] + dist
+        samples = self.spline_samples
+        if self.n_samples:
+            samples[self.STATION, 0] = 0.0
+            np.cumsum(np.hypot(np.diff(samples[self.X]), np.diff(samples[self.Y])), out=samples[self.STATION, 1:])
 
+        if samples.shape == prev_samples.shape and np.array_equal(samples, prev_samples):
+            # same geometry, keep the caches over the samples
+            self.spline_samples = prev_samples
 
     @property
     def path_points(self) -> List[pygame.Vector2]:
-        if self.spline_list is None:
+        if not self.n_samples:
             return None
-        return [pygame.Vector2(p.x, p.y) for p in self.spline_list]
+        return [pygame.Vector2(x, y) for x, y in zip(self.spline_x.tolist(), self.spline_y.tolist())]
 
 
 def approximate_b_spline_path(x: list, y: list, n_path_points: int,
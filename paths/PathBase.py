@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
 from typing import List, Tuple
+import numpy as np
 import pygame
-from utils.math import Pose
+from utils.math import Point, Pose
 
 
 class PathBase(ABC):
@@ -18,6 +19,52 @@ class PathBase(ABC):
     def get_nearest_pose(self, point: pygame.Vector2) -> Tuple[Pose, float]:
         ...
 
+    def get_nearest_poses(self, points: List[pygame.Vector2]) -> List[Tuple[Pose, float]]:
+        """
+        Nearest pose and station of several points, paths override it to search for all points in one pass.
+        """
+        return [self.get_nearest_pose(point) for point in points]
+
+    def get_nearest_pose_array(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Array counterpart of get_nearest_poses for the batched controllers.
+
+        Args:
+            points (np.ndarray): [N, 2] query points.
+
+        Returns:
+            (np.ndarray, np.ndarray): [N, 3] nearest poses as (x, y, theta) rows and [N] stations, NaN where the path
+                has no pose.
+        """
+        poses = np.full((len(points), 3), np.nan)
+        stations = np.full(len(points), np.nan)
+        for idx, (pose, station) in enumerate(self.get_nearest_poses([Point(x, y) for x, y in points])):
+            if pose is not None:
+                poses[idx] = pose.x, pose.y, pose.theta
+                stations[idx] = station
+        return poses, stations
+
+    def get_pose_array_at_station(self, stations: np.ndarray) -> np.ndarray:
+        """
+        [N, 3] poses as (x, y, theta) rows at the [N] stations, NaN rows for NaN stations.
+        """
+        poses = np.full((len(stations), 3), np.nan)
+        for idx, station in enumerate(stations):
+            if not np.isnan(station):
+                pose = self.get_pose_at_station(station)
+                poses[idx] = pose.x, pose.y, pose.theta
+        return poses
+
+    def get_curv_array_at_station(self, stations: np.ndarray) -> np.ndarray:
+        """
+        [N] curvatures at the [N] stations, NaN for NaN stations, e.g. for the preview of a horizon.
+        """
+        curvs = np.full(len(stations), np.nan)
+        for idx, station in enumerate(stations):
+            if not np.isnan(station):
+                curvs[idx] = self.get_curv_at_station(station)
+        return curvs
+
     @abstractmethod
     def update(self, points: List[pygame.Vector2]):
         ...
@@ -0,0 +1,63 @@
+import time
+import numpy as np
+import pygame
+
+from paths.BSpline import BSplinePath
+
+
+def scan_nearest_idxs(path: BSplinePath, points: np.ndarray) -> np.ndarray:
+    dx = path.spline_x[None, :] - points[:, :1]
+    dy = path.spline_y[None, :] - points[:, 1:2]
+    return np.argmin(dx * dx + dy * dy, axis=1)
+
+
+def windowed_nearest_idxs(path: BSplinePath, points: np.ndarray) -> np.ndarray:
+    # windowed at every path size, else the small paths fall back to the scan
+    path.SEARCH_MIN_SAMPLES = 0
+    try:
+        return path._windowed_nearest_idxs(points)
+    finally:
+        del path.SEARCH_MIN_SAMPLES
+
+
+def kdtree_nearest_idxs(path: BSplinePath, points: np.ndarray) -> np.ndarray:
+    path.spatial_index = True
+    try:
+        return path._nearest_idxs(points)
+    finally:
+        path.spatial_index = False
+
+
+def benchmark(n_points: int, n_path_points: int = 15, n_queries: int = 200, batch: int = 2) -> dict:
+    """
+    Mean time [us] per query of batch reference points 3 m apart driving along a wavy path of n_points control
+    points, for each nearest search. The KD-tree is built before timing, as it is only rebuilt when the path changes.
+    """
+    points = [pygame.Vector2(5.0 * i, 4.0 * np.sin(0.3 * i)) for i in range(n_points)]
+    path = BSplinePath(points, n_path_points, 3, 0, 1)
+    # 0.5 m per query along the middle of the path, as driven by the car
+    xs = 2.5 * (n_points - 1) + 0.5 * np.arange(n_queries) - 0.25 * n_queries
+    queries = [np.column_stack((xs[i] + 3.0 * np.arange(batch), np.ones(batch))) for i in range(n_queries)]
+
+    build_start = time.perf_counter()
+    kdtree_nearest_idxs(path, queries[0])
+    times = {"samples": path.n_samples, "kdtree build": 1e6 * (time.perf_counter() - build_start)}
+    for name, search in [("scan", scan_nearest_idxs), ("windowed", windowed_nearest_idxs),
+                         ("kdtree", kdtree_nearest_idxs)]:
+        start_time = time.perf_counter()
+        for query in queries:
+            search(path, query)
+        times[name] = 1e6 * (time.perf_counter() - start_time) / n_queries
+    return times
+
+
+def main():
+    print("{:>8} {:>12} {:>10} {:>10} {:>10}".format("samples", "build [us]", "scan", "windowed", "kdtree"))
+    for n_points in [10, 100, 1000, 10000]:
+        times = benchmark(n_points)
+        print("{:>8} {:>12.0f} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+            times["samples"], times["kdtree build"], times["scan"], times["windowed"], times["kdtree"]))
+
+
+if __name__ == "__main__":
+    main()
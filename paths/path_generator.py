@@ -34,13 +34,11 @@ class PathManualGenerator(PathGeneratorBase):
         # todo clean up logic
 
         self.mouse_position = Point(*pygame.mouse.get_pos())
-        if self.spline_timer > self._params.update_rate_s:
+        if (time_s - self.spline_timer) > self._params.update_rate_s:
             self.path_point_list.append(
                 self.sim_to_real.get_real_from_sim(self.mouse_position).to_vect2()
             )
-            self.spline_timer = 0
-        else:
-            self.spline_timer += self.sim_to_real.sim_dt
+            self.spline_timer = time_s
         try:
             path.update(
                 self.path_point_list
@@ -59,7 +57,8 @@ class PathManualGenerator(PathGeneratorBase):
 class PathAutoGenerator(PathGeneratorBase):
     @dataclass
     class Params:
-        max_path_length: int = 13
+        # points kept, the tail behind the vehicle is its margin to catch up with the scroll after slowing for curves
+        max_path_length: int = 18
         sin_period: float = 4.0
         sin_height: float = 0.4
         update_rate_s: float = 0.2
@@ -0,0 +1,75 @@
+import copy
+import numpy as np
+import pygame
+from typing import Dict, List, Optional, Tuple
+
+from dynamics.Vehicle import Vehicle
+from paths.PathBase import PathBase
+from utils.math import Pose
+
+
+class PathQuery(PathBase):
+    """
+    Frame scoped view of a path for one vehicle state, handed to every consumer of the path in a fixed update.
+
+    The nearest poses of the rear axle, front axle and cog are searched together in one pass on the first nearest pose
+    query, station lookups are memoized. Other points fall through to the path, as do attributes of the concrete path
+    type (e.g. spline_station). Build a new query whenever the path or the vehicle state changes.
+    """
+
+    def __init__(self, path: PathBase, car: Vehicle):
+        self.path = path
+        self.car = car
+        self._nearest: Optional[Dict[Tuple[float, float], Tuple[Pose, float]]] = None
+        self._poses: Dict[float, Pose] = {}
+        self._curvs: Dict[float, float] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.path)
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the query itself
+        return getattr(self.path, name)
+
+    def __copy__(self) -> "PathQuery":
+        # snapshot of the path and the vehicle state for use off the frame, with its own searches
+        return PathQuery(copy.copy(self.path), self.car.copy())
+
+    @property
+    def reference_points(self) -> List[Pose]:
+        return [self.car.pose_rear_axle, self.car.pose_front_axle, self.car.pose]
+
+    def get_nearest_pose(self, point: pygame.Vector2) -> Tuple[Pose, float]:
+        if self._nearest is None:
+            points = self.reference_points
+            self._nearest = {(p.x, p.y): nearest for p, nearest in zip(points, self.path.get_nearest_poses(points))}
+        nearest = self._nearest.get((point.x, point.y))
+        return nearest if nearest is not None else self.path.get_nearest_pose(point)
+
+    def get_nearest_pose_array(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.path.get_nearest_pose_array(points)
+
+    def get_pose_array_at_station(self, stations: np.ndarray) -> np.ndarray:
+        return self.path.get_pose_array_at_station(stations)
+
+    def get_curv_array_at_station(self, stations: np.ndarray) -> np.ndarray:
+        return self.path.get_curv_array_at_station(stations)
+
+    def get_pose_at_station(self, station: float) -> Pose:
+        pose = self._poses.get(station)
+        if pose is None:
+            pose = self._poses[station] = self.path.get_pose_at_station(station)
+        return pose
+
+    def get_curv_at_station(self, station: float) -> float:
+        curv = self._curvs.get(station)
+        if curv is None:
+            curv = self._curvs[station] = self.path.get_curv_at_station(station)
+        return curv
+
+    def update(self, points: List[pygame.Vector2]):
+        raise TypeError("PathQuery is a read only view, update the path it was built from")
+
+    @property
+    def path_points(self) -> List[pygame.Vector2]:
+        return self.path.path_points
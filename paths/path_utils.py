@@ -1,4 +1,5 @@
 import numpy as np
+from typing import Sequence, Tuple, Union
 
 from paths.PathBase import PathBase
 from utils import math
@@ -10,3 +11,54 @@ def get_path_unit_norm(path_pnt: math.Pose):
 
 def get_cross_err(path_pose: math.Pose, ref_pnt: math.Point):
     return math.dot(math.diff(ref_pnt, path_pose), get_path_unit_norm(path_pose))
+
+
+def get_cross_err_array(path_poses: np.ndarray, ref_pnts: np.ndarray) -> np.ndarray:
+    """
+    get_cross_err of [N, 3] path poses and [N, 2] points.
+    """
+    normal_theta = path_poses[:, 2] + np.pi / 2
+    return ((ref_pnts[:, 0] - path_poses[:, 0]) * np.cos(normal_theta)
+            + (ref_pnts[:, 1] - path_poses[:, 1]) * np.sin(normal_theta))
+
+
+def _group_by_path(paths: Sequence[PathBase]):
+    groups = {}
+    for idx, path in enumerate(paths):
+        groups.setdefault(id(path), (path, []))[1].append(idx)
+    return groups.values()
+
+
+def get_nearest_pose_array(paths: Union[PathBase, Sequence[PathBase]],
+                           points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Nearest [N, 3] poses and [N] stations of N points on one shared path, or on one path per point. Points sharing a
+    path are searched in one batch, NaN rows where there is no path.
+    """
+    if paths is None or isinstance(paths, PathBase):
+        if not paths:
+            return np.full((len(points), 3), np.nan), np.full(len(points), np.nan)
+        return paths.get_nearest_pose_array(points)
+
+    poses = np.full((len(points), 3), np.nan)
+    stations = np.full(len(points), np.nan)
+    for path, idxs in _group_by_path(paths):
+        if path:
+            poses[idxs], stations[idxs] = path.get_nearest_pose_array(points[idxs])
+    return poses, stations
+
+
+def get_pose_array_at_station(paths: Union[PathBase, Sequence[PathBase]], stations: np.ndarray) -> np.ndarray:
+    """
+    [N, 3] poses at N stations on one shared path, or on one path per station.
+    """
+    if paths is None or isinstance(paths, PathBase):
+        if not paths:
+            return np.full((len(stations), 3), np.nan)
+        return paths.get_pose_array_at_station(stations)
+
+    poses = np.full((len(stations), 3), np.nan)
+    for path, idxs in _group_by_path(paths):
+        if path:
+            poses[idxs] = path.get_pose_array_at_station(stations[idxs])
+    return poses
@@ -0,0 +1,207 @@
+from paths.BSpline import BSplinePath
+from utils import math
+import copy
+import pygame
+import pytest
+import numpy as np
+import scipy.interpolate as scipy_interpolate
+
+
+def test_samples_are_contiguous_rows():
+    points = [pygame.Vector2(10.0 * i, 3.0 * np.sin(0.5 * i)) for i in range(8)]
+    path = BSplinePath(points, 15, 3, 0, 1)
+    assert path.n_samples == 15 * 7
+    assert path.spline_samples.dtype == np.float64
+    for row in [path.spline_x, path.spline_y, path.spline_theta, path.spline_curv, path.spline_station]:
+        assert row.flags.c_contiguous and len(row) == path.n_samples
+        assert np.shares_memory(row, path.spline_samples)
+
+    xy = np.column_stack((path.spline_x, path.spline_y))
+    stations = np.concatenate(([0.0], np.cumsum(np.linalg.norm(np.diff(xy, axis=0), axis=1))))
+    np.testing.assert_allclose(path.spline_station, stations)
+    assert [[p.x, p.y, p.theta] for p in path.spline_list] == path.spline_poses.T.tolist()
+
+
+def test_short_and_empty_paths():
+    path = BSplinePath([pygame.Vector2(0, 0), pygame.Vector2(3, 4)], 15, 3, 0, 1)
+    assert path.n_samples == 2
+    np.testing.assert_array_equal(path.spline_station, [0.0, 5.0])
+    np.testing.assert_array_equal(path.spline_curv, [0.0, 0.0])
+    pose = path.get_pose_at_station(4.0)
+    np.testing.assert_allclose([pose.x, pose.y, pose.theta], [2.4, 3.2, 0.0])
+
+    path.update([pygame.Vector2(0, 0)])
+    assert path.n_samples == 0 and path.path_points is None
+    assert path.get_nearest_pose(pygame.Vector2(0, 0)) == (None, None)
+    assert path.get_pose_at_station(1.0) is None and np.isnan(path.get_curv_at_station(1.0))
+
+
+def global_nearest_idx(path: BSplinePath, point) -> int:
+    return int(np.argmin(np.hypot(path.spline_x - point.x, path.spline_y - point.y)))
+
+
+def test_windowed_search_tracks_reference_points():
+    points = [pygame.Vector2(5.0 * i, 4.0 * np.sin(0.3 * i)) for i in range(40)]
+    path = BSplinePath(points, 15, 3, 0, 1)
+    path.SEARCH_MIN_SAMPLES = 0
+    for x in np.arange(0.0, 190.0, 0.5):
+        # two reference points 3 m apart, tracked independently
+        rear, front = pygame.Vector2(x, 1.0), pygame.Vector2(x + 3.0, 1.0)
+        (rear_pose, _), (front_pose, _) = path.get_nearest_poses([rear, front])
+        assert rear_pose == path._pose(global_nearest_idx(path, rear))
+        assert front_pose == path._pose(global_nearest_idx(path, front))
+    assert path.n_global_searches == 2
+    assert path.n_windowed_searches == 2 * len(np.arange(0.0, 190.0, 0.5)) - 2
+
+    # a jump and a refit search all samples again
+    path.get_nearest_pose(pygame.Vector2(20.0, 1.0))
+    assert path.n_global_searches == 3
+    path.update(points[1:])
+    path.get_nearest_pose(pygame.Vector2(20.5, 1.0))
+    assert path.n_global_searches == 4
+
+    # short paths are always scanned
+    path.SEARCH_MIN_SAMPLES = path.n_samples + 1
+    path.get_nearest_pose(pygame.Vector2(21.0, 1.0))
+    assert path.n_global_searches == 5
+
+
+def test_windowed_search_falls_back_at_window_edge():
+    # samples 1 cm apart, a point moving 1 m has its nearest sample outside of the window
+    path = BSplinePath([pygame.Vector2(2.0 * i, 0.0) for i in range(5)], 200, 3, 0, 1)
+    path.SEARCH_MIN_SAMPLES = 0
+    path.get_nearest_pose(pygame.Vector2(2.0, 1.0))
+    point = pygame.Vector2(3.0, 1.0)
+    pose, _ = path.get_nearest_pose(point)
+    assert pose == path._pose(global_nearest_idx(path, point))
+    assert path.n_global_searches == 2 and path.n_windowed_searches == 0
+
+
+def test_spatial_index_matches_scan_and_is_rebuilt_on_geometry_change():
+    points = [pygame.Vector2(5.0 * i, 4.0 * np.sin(0.3 * i)) for i in range(40)]
+    path = BSplinePath(points, 15, 3, 0, 1, spatial_index=True)
+    rng = np.random.default_rng(0)
+    queries = np.column_stack((rng.uniform(-10, 200, 500), rng.uniform(-10, 10, 500)))
+    poses, stations = path.get_nearest_pose_array(queries)
+    expected_idxs = [global_nearest_idx(path, pygame.Vector2(*query)) for query in queries]
+    np.testing.assert_array_equal(poses, path.spline_poses[:, expected_idxs].T)
+    np.testing.assert_array_equal(stations, path.spline_station[expected_idxs])
+    assert path.n_index_builds == 1
+
+    # same points, the samples and the index are kept
+    samples = path.spline_samples
+    path.update(list(points))
+    assert path.spline_samples is samples
+    path.get_nearest_pose(pygame.Vector2(20.0, 1.0))
+    assert path.n_index_builds == 1
+
+    path.update(points[1:])
+    assert path.spline_samples is not samples
+    pose, _ = path.get_nearest_pose(pygame.Vector2(20.0, 1.0))
+    assert pose == path._pose(global_nearest_idx(path, pygame.Vector2(20.0, 1.0)))
+    assert path.n_index_builds == 2
+
+
+def test_station_lookup_interpolates_between_samples():
+    points = [pygame.Vector2(5.0 * i, 4.0 * np.sin(0.3 * i)) for i in range(40)]
+    path = BSplinePath(points, 15, 3, 0, 1)
+    stations = path.spline_station
+
+    # at the samples, halfway between them and clamped at the ends
+    np.testing.assert_allclose(path.get_pose_array_at_station(stations), path.spline_poses.T, atol=1e-12)
+    np.testing.assert_allclose(path.get_curv_array_at_station(stations), path.spline_curv, atol=1e-12)
+    mid = 0.5 * (stations[:-1] + stations[1:])
+    np.testing.assert_allclose(path.get_pose_array_at_station(mid)[:, :2],
+                               0.5 * (path.spline_poses[:2, :-1] + path.spline_poses[:2, 1:]).T)
+    np.testing.assert_allclose(path.get_curv_array_at_station(mid),
+                               0.5 * (path.spline_curv[:-1] + path.spline_curv[1:]))
+    np.testing.assert_allclose(path.get_pose_array_at_station([-1.0, stations[-1] + 1.0]),
+                               path.spline_poses[:, [0, -1]].T)
+
+    station = 0.3 * stations[100] + 0.7 * stations[101]
+    pose = path.get_pose_at_station(station)
+    assert [pose.x, pose.y, pose.theta] == path.get_pose_array_at_station([station])[0].tolist()
+    assert path.get_curv_at_station(station) == path.get_curv_array_at_station([station])[0]
+    assert np.isnan(path.get_pose_array_at_station([np.nan])).all()
+    assert np.isnan(path.get_curv_array_at_station([np.nan])).all()
+
+
+def test_heading_is_interpolated_across_pi():
+    path = BSplinePath([pygame.Vector2(0, 0), pygame.Vector2(-1, 0)], 15, 3, 0, 1)
+    path.spline_samples[path.THETA] = [np.pi - 0.1, -np.pi + 0.1]
+    assert abs(abs(path.get_pose_at_station(0.5).theta) - np.pi) < 1e-12
+
+
+def splev_samples(points, n_path_points: int) -> np.ndarray:
+    """
+    x, y, theta and curvature rows of the cubic spline with the points as coefficients, evaluated with splev.
+    """
+    n = len(points)
+    ipl_t = np.linspace(0, n - 1, n_path_points * (n - 1))
+    derivs = []
+    for coord in ([p.x for p in points], [p.y for p in points]):
+        tck = list(scipy_interpolate.splrep(range(n), coord, k=3, s=0))
+        tck[1] = coord + [0.0] * 4
+        derivs.append([scipy_interpolate.splev(ipl_t, tck, der=der) for der in range(3)])
+    (x, dx, ddx), (y, dy, ddy) = derivs
+    return np.array([x, y, np.arctan2(dy, dx), (dx * ddy - ddx * dy) * (dx ** 2 + dy ** 2) ** -1.5])
+
+
+def test_local_refit_matches_full_fit():
+    rng = np.random.default_rng(0)
+    points = [pygame.Vector2(5.0 * i, 4.0 * np.sin(0.3 * i)) for i in range(12)]
+    path = BSplinePath(points + [pygame.Vector2(60.0, 0.0)], 11, 3, 0, 4)
+    np.testing.assert_allclose(path.spline_samples[:path.STATION], splev_samples(path.points, 11), rtol=0, atol=1e-12)
+
+    for frame in range(40):
+        if frame % 5 == 4:
+            # a new point 5 m ahead of the last, the oldest point is dropped on the next frame
+            points = points + [pygame.Vector2(points[-1].x + 5.0, rng.uniform(-4, 4))]
+        elif frame % 5 == 0:
+            points = points[1:]
+        n_evaluated = path.n_evaluated_samples
+        path.update(points + [pygame.Vector2(points[-1].x + 5.0, rng.uniform(-4, 4))])
+        # the samples not evaluated again must still agree with an independent evaluation of the whole spline
+        np.testing.assert_allclose(path.spline_samples[:path.STATION], splev_samples(path.points, 11), rtol=0,
+                                   atol=1e-12)
+        if frame % 5 in (1, 2, 3):
+            # only the last point moved, its support is the last 2 segments
+            n = len(path.points)
+            ipl_t = np.linspace(0, n - 1, 11 * (n - 1))
+            assert path.n_evaluated_samples - n_evaluated == np.count_nonzero(ipl_t >= n - 3)
+        else:
+            assert path.n_evaluated_samples - n_evaluated == path.n_samples
+
+    n_evaluated = path.n_evaluated_samples
+    path.update(list(path.points))
+    assert path.n_evaluated_samples == n_evaluated
+
+
+@pytest.mark.parametrize("turn", [1.0, -1.0])
+def test_curvature_is_signed_by_the_turn_direction(turn):
+    # a left (counterclockwise) turn has positive curvature, as the yaw rate of a vehicle following it
+    radius = 20.0
+    angles = np.linspace(0.0, np.pi, 13)
+    points = [pygame.Vector2(radius * np.sin(a), turn * radius * (1.0 - np.cos(a))) for a in angles]
+    path = BSplinePath(points, 15, 3, 0, 0)
+    middle = slice(path.n_samples // 4, 3 * path.n_samples // 4)
+    np.testing.assert_allclose(path.spline_curv[middle], turn / radius, rtol=1e-2)
+    # and agrees with the change of heading along the path
+    dtheta_ds = np.diff(np.unwrap(path.spline_theta)) / np.diff(path.spline_station)
+    np.testing.assert_allclose(dtheta_ds[middle], turn / radius, rtol=1e-2)
+
+
+def test_copy_has_its_own_search_state():
+    points = [pygame.Vector2(5.0 * i, 4.0 * np.sin(0.3 * i)) for i in range(400)]
+    path = BSplinePath(points, 11, 3, 0, 4)
+    path.get_nearest_poses([math.Pose(100.0, 1.0, 0.0)])
+    path.get_nearest_poses([math.Pose(100.5, 1.0, 0.0)])
+    path_copy = copy.copy(path)
+    assert path_copy._tracks == path._tracks and path_copy._bases == path._bases
+
+    # a search on the copy moves its tracks only, a refit of the path leaves the copy's samples and bases alone
+    path_copy.get_nearest_poses([math.Pose(101.0, 1.0, 0.0)])
+    assert path_copy._tracks[-1][0] == 101.0 and path._tracks[-1][0] == 100.5
+    path.update(points[:-1])
+    assert path_copy.n_samples == 11 * 399 and path.n_samples == 11 * 398
+    assert len(path._bases) == 2 and len(path_copy._bases) == 1
@@ -0,0 +1,68 @@
+from paths.BSpline import BSplinePath
+from paths.path_query import PathQuery
+from dynamics.Vehicle import Vehicle
+from utils import math
+import pygame
+import pytest
+import numpy as np
+
+
+class CountingPath(BSplinePath):
+    def __init__(self, *args, **kwargs):
+        self.n_searches = 0
+        super().__init__(*args, **kwargs)
+
+    def get_nearest_poses(self, points):
+        self.n_searches += 1
+        return super().get_nearest_poses(points)
+
+
+@pytest.fixture
+def path():
+    points = [pygame.Vector2(10.0 * i, 3.0 * np.sin(0.5 * i)) for i in range(8)]
+    return CountingPath(points, 15, 3, 0, 1)
+
+
+@pytest.fixture
+def car():
+    return Vehicle(params=Vehicle.Params()).build_pose(math.Pose(20.0, 1.0, 0.2)).build_vel(10.0, 0)
+
+
+def brute_force_nearest(path, point):
+    dist = [np.hypot(point.x - p.x, point.y - p.y) for p in path.spline_list]
+    idx = int(np.argmin(dist))
+    return path.spline_list[idx], path.spline_station[idx]
+
+
+def test_batched_search_matches_brute_force(path, car):
+    points = [car.pose_rear_axle, car.pose_front_axle, car.pose, math.Point(-5.0, 40.0)]
+    for nearest, point in zip(path.get_nearest_poses(points), points):
+        assert nearest == brute_force_nearest(path, point)
+    assert path.get_nearest_pose(car.pose) == brute_force_nearest(path, car.pose)
+
+
+def test_reference_points_share_one_search(path, car):
+    query = PathQuery(path, car)
+    assert query
+
+    assert query.get_nearest_pose(car.pose_rear_axle) == brute_force_nearest(path, car.pose_rear_axle)
+    assert query.get_nearest_pose(car.pose_front_axle) == brute_force_nearest(path, car.pose_front_axle)
+    assert query.get_nearest_pose(car.pose.point) == brute_force_nearest(path, car.pose)
+    assert path.n_searches == 1
+
+    # other points are answered by the path
+    point = math.Point(30.0, -2.0)
+    assert query.get_nearest_pose(point) == brute_force_nearest(path, point)
+    assert path.n_searches == 2
+
+    station = path.spline_station[10]
+    assert query.get_curv_at_station(station) == path.get_curv_at_station(station)
+    pose = query.get_pose_at_station(station)
+    assert pose == path.get_pose_at_station(station)
+    assert query.get_pose_at_station(station) is pose
+    assert query.spline_samples is path.spline_samples
+
+
+def test_empty_path(car):
+    query = PathQuery(BSplinePath([], 15, 3, 0, 1), car)
+    assert query.get_nearest_pose(car.pose) == (None, None)
@@ -13,7 +13,9 @@ from utils.pgutils.text import (
 from factory.control_factory import ControlType, ControlFactory
 from factory.vehicle_factory import VehicleFactory
 from factory.path_factory import PathFactory, PathGenType
+from paths.path_query import PathQuery
 from control.LowLevelControl import SpeedControl, SteerControl
+from sprites.latency_overlay import LatencyOverlay
 import utils.pgutils.text as txt
 
 
@@ -70,6 +72,8 @@ class SandboxScene(SceneBase):
         self.vel = self.vehicle_factory.vehicle_state.state_cog.vx
         self.speed_control = SpeedControl(SpeedControl.Params())
         self.steer_control = SteerControl(SteerControl.Params())
+        self.latency_overlay = LatencyOverlay(self.latency)
+        self.show_latency = False
 
     def process_input(self, events, pressed_keys):
         super().process_input(events, pressed_keys)
@@ -89,40 +93,64 @@ class SandboxScene(SceneBase):
                 self.vehicle_factory.reset_init_pose()
             elif event.type == pygame.KEYDOWN and event.key == pygame.K_p:
                 self.pause_scene = not self.pause_scene
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_l:
+                self.show_latency = not self.show_latency
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_j:
+                self.latency.dump("latency.json")
 
     def update(self):
         if self.pause_scene:
             return
         super().update()
+
+    def fixed_update(self, tick):
         # propagate vehicle with previous control commands
-        self.vehicle_factory.update(
-            self.steer_rate, self.steer_desired, self.vel, self.sim_to_real.sim_dt
-        )
+        with self.latency.measure("motion_model"):
+            self.vehicle_factory.update(
+                self.steer_rate, self.steer_desired, self.vel, tick.dt
+            )
 
-        path = self.path_factory.update(self.sim_to_real.time_s)
-        self.steer_desired = self.control_factory.control.update(
-            self.vehicle_factory.vehicle_state, path
-        )
-        self.steer_rate = self.steer_control.update(
-            self.vehicle_factory.vehicle_state,
-            self.steer_desired,
-            self.sim_to_real.sim_dt,
-        )
-        self.vel = self.speed_control.update(
-            self.vehicle_factory.vehicle_state, path, self.sim_to_real.sim_dt
-        )
+        path = self.path_factory.path
+        if tick.run_tracker:
+            with self.latency.measure("path"):
+                path = self.path_factory.update(self.sim_to_real.time_s)
+        # nearest pose searches of the step are shared by the tracker and the speed control
+        path = PathQuery(path, self.vehicle_factory.vehicle_state)
+        if tick.run_tracker:
+            with self.latency.measure(self.control_factory.latency_name):
+                self.steer_desired = self.control_factory.control.update(
+                    self.vehicle_factory.vehicle_state, path
+                )
+            self.control_factory.control.fixed_update(
+                self.vehicle_factory.vehicle_state
+            )
+        if tick.run_low_level:
+            low_level_dt = self.sim_to_real.scheduler.low_level_dt
+            with self.latency.measure("steer_control"):
+                self.steer_rate = self.steer_control.update(
+                    self.vehicle_factory.vehicle_state,
+                    self.steer_desired,
+                    low_level_dt,
+                )
+            with self.latency.measure("speed_control"):
+                self.vel = self.speed_control.update(
+                    self.vehicle_factory.vehicle_state, path, low_level_dt
+                )
+            self.control_factory.control.preview_speed(
+                self.vel, self.speed_control.max_accel
+            )
 
         if (
             self.path_factory.current_path_gen_type is PathGenType.auto_gen
         ):  # todo move to scene_factory
             self.sim_to_real.params.screen_ref_frame_rel_real.x += (
-                self.scroll_speed_mps * self.sim_to_real.sim_dt
+                self.scroll_speed_mps * tick.dt
             )
         else:
             self.sim_to_real.params.screen_ref_frame_rel_real.x += (
                 1.5
                 * self.scroll_speed_mps
-                * self.sim_to_real.sim_dt
+                * tick.dt
                 * ((pygame.mouse.get_pos()[0] / self.screen.get_width()) - 0.5)
                 * 2
             )
@@ -139,6 +167,8 @@ class SandboxScene(SceneBase):
 
         if self.menu.is_enabled():
             self.menu.draw(self.screen)
+        if self.show_latency:
+            self.latency_overlay.draw(self.screen)
 
         message_to_screen(
             text="FPS: {:.1f}".format(self.clock.get_fps()),
@@ -157,6 +187,8 @@ class SandboxScene(SceneBase):
             ),
             "P: {}".format("PLAY" if self.pause_scene else "PAUSE"),
             "R: RESET CAR",
+            "L: {} LATENCY".format("HIDE" if self.show_latency else "SHOW"),
+            "J: DUMP LATENCY",
             "Q: QUIT",
         ]
         for idx, text in enumerate(reversed(help_txt)):
@@ -3,6 +3,8 @@ from abc import ABC, abstractmethod
 from utils.pgutils.pgutils import *
 from sprites.CarSprite import CarSprite
 from control import ManualControl
+from utils.scheduler import MultiRateScheduler
+from utils.latency import LatencyMonitor
 
 
 class SceneBase(ABC):
@@ -15,6 +17,7 @@ class SceneBase(ABC):
         )
     )
     clock = pygame.time.Clock()
+    latency = LatencyMonitor(LatencyMonitor.Params(frame_budget_ms=1000 / sim_to_real.params.fps))
 
     def __init__(self, screen: pygame.Surface):
         super().__init__()
@@ -24,6 +27,7 @@ class SceneBase(ABC):
         )
         self.next = self
         self.sim_to_real.time_s = 0
+        self.sim_to_real.scheduler.reset()
 
     @abstractmethod
     def process_input(self, events: List[type(pygame.event)], pressed_keys):
@@ -37,7 +41,16 @@ class SceneBase(ABC):
 
     @abstractmethod
     def update(self):
-        self.sim_to_real.update()
+        # run the fixed dynamics substeps due for the real time of the last frame
+        for tick in self.sim_to_real.advance(self.clock.get_time() / 1000):
+            self.sim_to_real.update()
+            self.fixed_update(tick)
+
+    def fixed_update(self, tick: MultiRateScheduler.Tick):
+        """
+        Advance the scene by one dynamics substep, the path tracker and low-level control update on the flagged ticks.
+        """
+        pass
 
     @abstractmethod
     def render(self):
@@ -14,6 +14,7 @@ from utils.pgutils.text import (
 from factory.control_factory import ControlFactory, ControlType
 from factory.vehicle_factory import VehicleFactory
 from factory.path_factory import PathFactory, PathGenType
+from paths.path_query import PathQuery
 from control.LowLevelControl import SpeedControl, SteerControl
 
 
@@ -57,24 +58,44 @@ class StartScene(SceneBase):
 
     def update(self):
         super().update()
-        self.vehicle_factory.update(
-            self.steer_rate, self.steer_desired, self.vel, self.sim_to_real.sim_dt
-        )
-        path = self.path_factory.update(self.get_time_s())
+
+    def fixed_update(self, tick):
+        with self.latency.measure("motion_model"):
+            self.vehicle_factory.update(
+                self.steer_rate, self.steer_desired, self.vel, tick.dt
+            )
+        path = self.path_factory.path
+        if tick.run_tracker:
+            with self.latency.measure("path"):
+                path = self.path_factory.update(self.get_time_s())
+        # nearest pose searches of the step are shared by the tracker and the speed control
+        path = PathQuery(path, self.vehicle_factory.vehicle_state)
         self.sim_to_real.params.screen_ref_frame_rel_real.x += (
-            self.scroll_speed * self.sim_to_real.sim_dt
-        )
-        self.steer_desired = self.control_factory.control.update(
-            self.vehicle_factory.vehicle_state, path
-        )
-        self.steer_rate = self.steer_control.update(
-            self.vehicle_factory.vehicle_state,
-            self.steer_desired,
-            self.sim_to_real.sim_dt,
-        )
-        self.vel = self.speed_control.update(
-            self.vehicle_factory.vehicle_state, path, self.sim_to_real.sim_dt
+            self.scroll_speed * tick.dt
         )
+        if tick.run_tracker:
+            with self.latency.measure(self.control_factory.latency_name):
+                self.steer_desired = self.control_factory.control.update(
+                    self.vehicle_factory.vehicle_state, path
+                )
+            self.control_factory.control.fixed_update(
+                self.vehicle_factory.vehicle_state
+            )
+        if tick.run_low_level:
+            low_level_dt = self.sim_to_real.scheduler.low_level_dt
+            with self.latency.measure("steer_control"):
+                self.steer_rate = self.steer_control.update(
+                    self.vehicle_factory.vehicle_state,
+                    self.steer_desired,
+                    low_level_dt,
+                )
+            with self.latency.measure("speed_control"):
+                self.vel = self.speed_control.update(
+                    self.vehicle_factory.vehicle_state, path, low_level_dt
+                )
+            self.control_factory.control.preview_speed(
+                self.vel, self.speed_control.max_accel
+            )
 
     def render(self):
         self.screen.fill(COLOR1)
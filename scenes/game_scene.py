@@ -7,6 +7,7 @@ from utils.pgutils.text import menu_default, message_to_screen, VertAlign, HorAl
 from factory.control_factory import ControlType, ControlFactory
 from factory.vehicle_factory import VehicleFactory
 from factory.path_factory import PathFactory, PathGenType
+from paths.path_query import PathQuery
 from control.LowLevelControl import SpeedControl, SteerControl
 from factory.wall_factory import WallFactory
 from sprites.health_bar import HealthBar
@@ -109,25 +110,44 @@ class LevelScene(SceneBase):
                 self.health_bar,
             )
 
-        self.vehicle_factory.update(
-            self.steer_rate, self.steer_desired, self.vel, self.sim_to_real.sim_dt
-        )
+    def fixed_update(self, tick):
+        with self.latency.measure("motion_model"):
+            self.vehicle_factory.update(
+                self.steer_rate, self.steer_desired, self.vel, tick.dt
+            )
 
-        path = self.path_factory.update(self.sim_to_real.time_s)
-        self.steer_desired = self.control_factory.control.update(
-            self.vehicle_factory.vehicle_state, path
-        )
-        self.steer_rate = self.steer_control.update(
-            self.vehicle_factory.vehicle_state,
-            self.steer_desired,
-            self.sim_to_real.sim_dt,
-        )
-        self.vel = self.speed_control.update(
-            self.vehicle_factory.vehicle_state, path, self.sim_to_real.sim_dt
-        )
+        path = self.path_factory.path
+        if tick.run_tracker:
+            with self.latency.measure("path"):
+                path = self.path_factory.update(self.sim_to_real.time_s)
+        # nearest pose searches of the step are shared by the tracker and the speed control
+        path = PathQuery(path, self.vehicle_factory.vehicle_state)
+        if tick.run_tracker:
+            with self.latency.measure(self.control_factory.latency_name):
+                self.steer_desired = self.control_factory.control.update(
+                    self.vehicle_factory.vehicle_state, path
+                )
+            self.control_factory.control.fixed_update(
+                self.vehicle_factory.vehicle_state
+            )
+        if tick.run_low_level:
+            low_level_dt = self.sim_to_real.scheduler.low_level_dt
+            with self.latency.measure("steer_control"):
+                self.steer_rate = self.steer_control.update(
+                    self.vehicle_factory.vehicle_state,
+                    self.steer_desired,
+                    low_level_dt,
+                )
+            with self.latency.measure("speed_control"):
+                self.vel = self.speed_control.update(
+                    self.vehicle_factory.vehicle_state, path, low_level_dt
+                )
+            self.control_factory.control.preview_speed(
+                self.vel, self.speed_control.max_accel
+            )
 
         self.sim_to_real.params.screen_ref_frame_rel_real.x += (
-            self.level_params.scroll_speed * self.sim_to_real.sim_dt
+            self.level_params.scroll_speed * tick.dt
         )
 
     def render(self):
@@ -237,6 +257,7 @@ class GameScene(SceneBase):
         ):
             self.next = LevelScene(self.screen, self.level_idx)
 
+    def fixed_update(self, tick):
         colliding = self.wall_factory.update(self.vehicle_factory.car_sprite)
         if (
             not self.wall_factory.wall_sprites
@@ -254,28 +275,46 @@ class GameScene(SceneBase):
             if not self.vehicle_factory.car_sprite.is_colliding:
                 self.health_bar -= 1
             self.vehicle_factory.car_sprite.set_colliding()
-        self.vehicle_factory.update(
-            self.steer_rate, self.steer_desired, self.vel, self.sim_to_real.sim_dt
-        )
+        with self.latency.measure("motion_model"):
+            self.vehicle_factory.update(
+                self.steer_rate, self.steer_desired, self.vel, tick.dt
+            )
 
         if self.vehicle_factory.car_sprite.rect.left < 0:
             self.vehicle_factory.car_sprite.rect.left = 0
 
-        path = self.path_factory.update(self.sim_to_real.time_s)
-        self.steer_desired = self.control_factory.control.update(
-            self.vehicle_factory.vehicle_state, path
-        )
-        self.steer_rate = self.steer_control.update(
-            self.vehicle_factory.vehicle_state,
-            self.steer_desired,
-            self.sim_to_real.sim_dt,
-        )
-        self.vel = self.speed_control.update(
-            self.vehicle_factory.vehicle_state, path, self.sim_to_real.sim_dt
-        )
+        path = self.path_factory.path
+        if tick.run_tracker:
+            with self.latency.measure("path"):
+                path = self.path_factory.update(self.sim_to_real.time_s)
+        # nearest pose searches of the step are shared by the tracker and the speed control
+        path = PathQuery(path, self.vehicle_factory.vehicle_state)
+        if tick.run_tracker:
+            with self.latency.measure(self.control_factory.latency_name):
+                self.steer_desired = self.control_factory.control.update(
+                    self.vehicle_factory.vehicle_state, path
+                )
+            self.control_factory.control.fixed_update(
+                self.vehicle_factory.vehicle_state
+            )
+        if tick.run_low_level:
+            low_level_dt = self.sim_to_real.scheduler.low_level_dt
+            with self.latency.measure("steer_control"):
+                self.steer_rate = self.steer_control.update(
+                    self.vehicle_factory.vehicle_state,
+                    self.steer_desired,
+                    low_level_dt,
+                )
+            with self.latency.measure("speed_control"):
+                self.vel = self.speed_control.update(
+                    self.vehicle_factory.vehicle_state, path, low_level_dt
+                )
+            self.control_factory.control.preview_speed(
+                self.vel, self.speed_control.max_accel
+            )
 
         self.sim_to_real.params.screen_ref_frame_rel_real.x += (
-            self.level_params.scroll_speed * self.sim_to_real.sim_dt
+            self.level_params.scroll_speed * tick.dt
         )
 
     def render(self):
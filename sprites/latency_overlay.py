@@ -0,0 +1,39 @@
+import pygame
+
+import utils.pgutils.text as txt
+from utils.pgutils.pgutils import COLOR9, WHITE
+from utils.latency import LatencyMonitor
+
+
+class LatencyOverlay:
+    """
+    Table of the latency percentiles and the budget of each subsystem, subsystems and frames over budget are drawn in
+    maroon. Subsystems without a budget show "-".
+    """
+
+    def __init__(self, monitor: LatencyMonitor, pose: pygame.Vector2 = pygame.Vector2(0.01, 0.12),
+                 line_height: float = 0.022, fontsize: int = 8):
+        self.monitor = monitor
+        self.pose = pose
+        self.line_height = line_height
+        self.fontsize = fontsize
+
+    def draw(self, screen: pygame.Surface):
+        lines = [("{:<24}{:>8}{:>8}{:>8}{:>8}{:>8}".format("LATENCY [MS]", "P50", "P95", "P99", "BUDGET", "OVER"),
+                  WHITE)]
+        for name, stats in sorted(self.monitor.stats.items()):
+            color = COLOR9 if stats.n_over_budget else WHITE
+            budget = "-" if stats.budget_ms is None else "{:.2f}".format(stats.budget_ms)
+            lines.append(("{:<24}{:>8.2f}{:>8.2f}{:>8.2f}{:>8}{:>8d}".format(
+                name.upper(), stats.p50, stats.p95, stats.p99, budget, stats.n_over_budget), color))
+
+        for idx, (text, color) in enumerate(lines):
+            txt.message_to_screen(
+                text=text,
+                screen=screen,
+                fontsize=self.fontsize,
+                color=color,
+                pose=pygame.Vector2(self.pose.x, self.pose.y + idx * self.line_height),
+                hor_align=txt.HorAlign.LEFT,
+                vert_align=txt.VertAlign.TOP,
+            )
@@ -1,22 +1,32 @@
 import numpy as np
 from pygame import gfxdraw
+from typing import Union
 
 from control.lqr_path_tracker import LQRPathTrackerBase
+from control.mpc_path_tracker import MPCPathTracker
+from control.stability_map import StabilityMap
 from utils.pgutils.pgutils import *
 from utils import math
 from sprites.plot import PgPlot, PlotManager, draw_arrow
 from sprites.sprite_bases import ControlSpriteBase
+from sprites.stability_map_sprite import StabilityMapSprite
 
 
 class LQRSprite(ControlSpriteBase):
     def __init__(
         self,
-        tracker: LQRPathTrackerBase,
+        tracker: Union[LQRPathTrackerBase, MPCPathTracker],
         sim_to_real: SimToReal,
         screen: pygame.Surface,
     ):
         self.tracker = tracker
         self.sim_to_real = sim_to_real
+        self.show_stability_map = False
+        self.stability_map_sprite = None
+        if isinstance(tracker, LQRPathTrackerBase):
+            self.stability_map_sprite = StabilityMapSprite(
+                StabilityMap(tracker, StabilityMap.Params())
+            )
 
         # plotting
         self.plot_manager = PlotManager(0.1 + 0.33, 0.01, 0.01)
@@ -80,6 +90,8 @@ class LQRSprite(ControlSpriteBase):
         )
 
     def draw(self, screen):
+        if self.show_stability_map and self.stability_map_sprite and self.tracker.car:
+            self.stability_map_sprite.draw(screen, self.tracker.car)
         if self.tracker.nearest_pose:
             pygame.draw.circle(
                 screen,
@@ -175,3 +187,10 @@ class LQRSprite(ControlSpriteBase):
 
     def update(self, vehicle, path):
         return self.tracker.update(vehicle, path)
+
+    def fixed_update(self, car):
+        if self.show_stability_map and self.stability_map_sprite:
+            self.stability_map_sprite.stability_map.update(car.params)
+
+    def preview_speed(self, speed_cmd: float, max_accel: float):
+        self.tracker.preview_speed(speed_cmd, max_accel)
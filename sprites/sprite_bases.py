@@ -10,3 +10,10 @@ class ControlSpriteBase(ABC):
     @abstractmethod
     def draw_plots(self, screen: pygame.Surface):
         pass
+
+    def fixed_update(self, car):
+        """
+        Work for what the sprite draws, run by the scene on the main thread after each tracker update rather than on
+        render.
+        """
+        pass
@@ -0,0 +1,77 @@
+import numpy as np
+import pygame
+
+import utils.pgutils.text as txt
+from control.stability_map import StabilityMap
+from dynamics.Vehicle import Vehicle
+from utils.pgutils.pgutils import COLOR4, COLOR7, COLOR9, WHITE
+
+
+class StabilityMapSprite:
+    """
+    Heat map of the closed-loop decay rate over speed (x) and the scaled vehicle parameter (y). Unstable points are
+    drawn in maroon, points the solver did not converge on in grey and rows not refreshed yet dimmed, the current
+    speed and vehicle are outlined. The map is refreshed by its owner in the fixed update, not on draw.
+    """
+
+    def __init__(self, stability_map: StabilityMap, topleft_norm: pygame.Vector2 = pygame.Vector2(0.6, 0.1),
+                 size_norm: pygame.Vector2 = pygame.Vector2(0.3, 0.2), max_decay_rate: float = 5.0):
+        self.stability_map = stability_map
+        self.topleft_norm = topleft_norm
+        self.size_norm = size_norm
+        self.max_decay_rate = max_decay_rate
+
+    def draw(self, screen: pygame.Surface, car: Vehicle):
+        stability_map = self.stability_map
+        if stability_map.gains is None:
+            return
+        params = stability_map.params
+        n_scales, n_speeds = len(params.scales), len(params.speeds)
+
+        left = self.topleft_norm.x * screen.get_width()
+        top = self.topleft_norm.y * screen.get_height()
+        cell_w = self.size_norm.x * screen.get_width() / n_speeds
+        cell_h = self.size_norm.y * screen.get_height() / n_scales
+
+        # largest scale on top
+        decay_rate = stability_map.decay_rate
+        alpha = np.clip(decay_rate / self.max_decay_rate, 0.0, 1.0)
+        for row in range(n_scales):
+            for col in range(n_speeds):
+                if not stability_map.converged[row, col]:
+                    color = (100,) * 3
+                elif decay_rate[row, col] <= 0:
+                    color = COLOR9
+                else:
+                    a = alpha[row, col]
+                    color = tuple(int((1 - a) * c4 + a * c7) for c4, c7 in zip(COLOR4, COLOR7))
+                if stability_map.stale[row]:
+                    color = tuple(c // 2 for c in color)
+                rect = pygame.Rect(left + col * cell_w, top + (n_scales - 1 - row) * cell_h, cell_w + 1, cell_h + 1)
+                pygame.draw.rect(screen, color, rect)
+
+        row = int(np.argmin(np.abs(params.scales - 1.0)))
+        col = stability_map.index(car.state_cog.vx)
+        pygame.draw.rect(screen, WHITE, pygame.Rect(
+            left + col * cell_w, top + (n_scales - 1 - row) * cell_h, cell_w + 1, cell_h + 1), 1)
+
+        labels = [
+            ("CLOSED-LOOP DECAY RATE [1/S] {:.1f} MS".format(stability_map.solve_time_ms),
+             pygame.Vector2(self.topleft_norm.x, self.topleft_norm.y), txt.HorAlign.LEFT, txt.VertAlign.BOTTOM),
+            ("SPEED {:.3g}-{:.3g} M/S".format(params.speeds[0], params.speeds[-1]),
+             pygame.Vector2(self.topleft_norm.x, self.topleft_norm.y + self.size_norm.y), txt.HorAlign.LEFT,
+             txt.VertAlign.TOP),
+            ("{} X{:.2g}-{:.2g}".format(params.vehicle_param.upper(), params.scales[0], params.scales[-1]),
+             pygame.Vector2(self.topleft_norm.x + self.size_norm.x, self.topleft_norm.y + self.size_norm.y),
+             txt.HorAlign.RIGHT, txt.VertAlign.TOP),
+        ]
+        for text, pose, hor_align, vert_align in labels:
+            txt.message_to_screen(
+                text=text,
+                screen=screen,
+                fontsize=8,
+                color=WHITE,
+                pose=pose,
+                hor_align=hor_align,
+                vert_align=vert_align,
+            )
@@ -0,0 +1,141 @@
+import json
+import time
+import numpy as np
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+
+class LatencyStats:
+    """
+    Durations of one subsystem over a rolling window of its last calls, with a count of the calls over its budget.
+    """
+
+    def __init__(self, window: int, budget_ms: Optional[float] = None):
+        self.budget_ms = budget_ms
+        self.n_calls = 0
+        self.n_over_budget = 0
+        self.max_ms = 0.0
+        self._samples = np.zeros(window)
+
+    def add(self, duration_ms: float):
+        self._samples[self.n_calls % len(self._samples)] = duration_ms
+        self.n_calls += 1
+        self.max_ms = max(self.max_ms, duration_ms)
+        if self.budget_ms is not None and duration_ms > self.budget_ms:
+            self.n_over_budget += 1
+
+    @property
+    def samples(self) -> np.ndarray:
+        """
+        Durations in the window [ms], in no particular order.
+        """
+        return self._samples[:min(self.n_calls, len(self._samples))]
+
+    def percentile(self, q: float) -> float:
+        samples = self.samples
+        return float(np.percentile(samples, q)) if len(samples) else float("nan")
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(50)
+
+    @property
+    def p95(self) -> float:
+        return self.percentile(95)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(99)
+
+    def to_dict(self) -> dict:
+        p50, p95, p99 = np.percentile(self.samples, [50, 95, 99]) if self.n_calls else [float("nan")] * 3
+        return {
+            "n_calls": self.n_calls,
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": self.max_ms,
+            "budget_ms": self.budget_ms,
+            "n_over_budget": self.n_over_budget,
+        }
+
+
+class LatencyMonitor:
+    """
+    Timing of the subsystems of a scene by name, e.g. "tracker.mpc" or "motion_model", and of whole frames.
+
+    A frame is the span from begin_frame to end_frame, frames longer than frame_budget_ms are counted as over budget.
+    A subsystem's budget is the one given for its name in budgets_ms, else its share of frame_budget_ms in
+    budget_shares, matched by the longest prefix of its name (e.g. "tracker." for every tracker). Subsystems matching
+    neither have no budget.
+    """
+
+    FRAME = "frame"
+
+    @dataclass
+    class Params:
+        window: int = 600  # calls kept per subsystem for the percentiles
+        frame_budget_ms: float = 1000 / 60
+        budgets_ms: Dict[str, float] = field(default_factory=dict)
+        budget_shares: Dict[str, float] = field(default_factory=lambda: {
+            "tracker.": 0.25,
+            "motion_model": 0.15,
+            "path": 0.1,
+            "steer_control": 0.05,
+            "speed_control": 0.05,
+            "render": 0.4,
+        })
+
+        def budget_ms(self, name: str) -> Optional[float]:
+            if name in self.budgets_ms:
+                return self.budgets_ms[name]
+            prefixes = [prefix for prefix in self.budget_shares if name.startswith(prefix)]
+            if not prefixes:
+                return None
+            return self.budget_shares[max(prefixes, key=len)] * self.frame_budget_ms
+
+    def __init__(self, params: Params):
+        self.params = params
+        self.stats: Dict[str, LatencyStats] = {}
+        self._frame_start_s = None
+
+    def record(self, name: str, duration_ms: float):
+        stats = self.stats.get(name)
+        if stats is None:
+            budget_ms = self.params.frame_budget_ms if name == self.FRAME else self.params.budget_ms(name)
+            stats = self.stats[name] = LatencyStats(self.params.window, budget_ms)
+        stats.add(duration_ms)
+
+    @contextmanager
+    def measure(self, name: str):
+        start_s = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, 1e3 * (time.perf_counter() - start_s))
+
+    def begin_frame(self):
+        self._frame_start_s = time.perf_counter()
+
+    def end_frame(self):
+        if self._frame_start_s is None:
+            return
+        self.record(self.FRAME, 1e3 * (time.perf_counter() - self._frame_start_s))
+        self._frame_start_s = None
+
+    @property
+    def frames_over_budget(self) -> int:
+        frame = self.stats.get(self.FRAME)
+        return frame.n_over_budget if frame else 0
+
+    def reset(self):
+        self.stats.clear()
+        self._frame_start_s = None
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps({name: stats.to_dict() for name, stats in sorted(self.stats.items())}, indent=indent)
+
+    def dump(self, file_path: str):
+        with open(file_path, "w") as f:
+            f.write(self.to_json())
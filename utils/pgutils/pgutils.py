@@ -1,7 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import pygame
 from typing import List, overload, Tuple, Union
 from utils import math
+from utils.scheduler import MultiRateScheduler
 import numpy as np
 from functools import singledispatchmethod
 
@@ -26,12 +27,16 @@ class SimToReal:
         screen_ref_frame_rel_real: (
             math.Pose
         )  # Pose of the screen reference frame relative to the real-world reference frame
-        fps: float  # Frames per second of the simulation
+        fps: float  # Render frames per second
         sim_time_rel_real: float  # Simulation time relative to real-world time
+        scheduler: MultiRateScheduler.Params = field(
+            default_factory=MultiRateScheduler.Params
+        )  # Simulated time rates of the dynamics, path tracker and low-level control
 
     def __init__(self, params: Params):
         self.params = params
         self.time_s = 0.0
+        self.scheduler = MultiRateScheduler(self.params.scheduler)
 
     @singledispatchmethod
     def get_sim_from_real(self, points) -> np.ndarray | math.Point:
@@ -132,12 +137,18 @@ class SimToReal:
     @property
     def sim_dt(self) -> float:
         """
-        Returns the time step for the simulation, calculated as the ratio of simulated time to frames per second.
+        Returns the fixed time step of the dynamics substeps, independent of the render frames per second.
 
         Returns:
             float: The time step for the simulation.
         """
-        return self.params.sim_time_rel_real / self.params.fps
+        return self.scheduler.dynamics_dt
+
+    def advance(self, real_dt_s: float) -> List[MultiRateScheduler.Tick]:
+        """
+        Convert the real time of the last frame to simulated time and return the dynamics substeps due in it.
+        """
+        return self.scheduler.advance(real_dt_s * self.params.sim_time_rel_real)
 
     def update(self):
         self.time_s += self.sim_dt
@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from typing import List
+
+
+class MultiRateScheduler:
+    """
+    Fixed-timestep accumulator that splits the simulated time of a rendered frame into dynamics substeps, and runs the
+    path tracker and the low-level speed/steer controllers on every n-th substep.
+
+    All rates are in simulated time, so changing the render rate or the sim to real time ratio does not change the
+    physics. A frame that runs long is caught up within max_steps_per_frame substeps, the rest of the backlog is
+    dropped so that a stalled frame does not snowball into ever longer frames.
+    """
+
+    @dataclass
+    class Params:
+        dynamics_hz: float = 60.0  # Rate of the vehicle dynamics substeps [Hz, simulated time]
+        tracker_hz: float = 30.0  # Rate of the path tracker [Hz, simulated time]
+        low_level_hz: float = 60.0  # Rate of the speed and steer controllers [Hz, simulated time]
+        max_steps_per_frame: int = 8  # Catch up budget in dynamics substeps per frame
+
+    @dataclass
+    class Tick:
+        step: int  # Index of the dynamics substep since the last reset
+        dt: float  # Dynamics time step [s]
+        run_tracker: bool
+        run_low_level: bool
+
+    def __init__(self, params: Params):
+        self.params = params
+        self._accumulator_s = 0.0
+        self._step = 0
+        self.dropped_s = 0.0  # Simulated time dropped by the catch up budget since the last reset
+
+    @property
+    def dynamics_dt(self) -> float:
+        return 1.0 / self.params.dynamics_hz
+
+    @property
+    def tracker_divider(self) -> int:
+        """
+        Number of dynamics substeps per tracker update, the tracker rate is rounded to a whole divider of the dynamics
+        rate.
+        """
+        return max(1, round(self.params.dynamics_hz / self.params.tracker_hz))
+
+    @property
+    def low_level_divider(self) -> int:
+        return max(1, round(self.params.dynamics_hz / self.params.low_level_hz))
+
+    @property
+    def tracker_dt(self) -> float:
+        return self.tracker_divider * self.dynamics_dt
+
+    @property
+    def low_level_dt(self) -> float:
+        return self.low_level_divider * self.dynamics_dt
+
+    @property
+    def alpha(self) -> float:
+        """
+        Fraction of a dynamics step left in the accumulator, e.g. to interpolate the rendered state.
+        """
+        return self._accumulator_s / self.dynamics_dt
+
+    def reset(self):
+        self._accumulator_s = 0.0
+        self._step = 0
+        self.dropped_s = 0.0
+
+    def advance(self, sim_time_s: float) -> List[Tick]:
+        """
+        Add the simulated time of a frame to the accumulator and return the dynamics substeps due in it.
+
+        Args:
+            sim_time_s (float): simulated time elapsed during the last frame [s].
+
+        Returns:
+            List[Tick]: substeps to run in order, the tracker and low-level flags mark the substeps after which the
+                controllers update, their commands are held until their next update.
+        """
+        dt = self.dynamics_dt
+        self._accumulator_s += sim_time_s
+        # small tolerance so that a frame of exactly n steps is not split by round off
+        n_steps = int(self._accumulator_s / dt + 1e-9)
+        if n_steps > self.params.max_steps_per_frame:
+            n_steps = self.params.max_steps_per_frame
+            self.dropped_s += self._accumulator_s - n_steps * dt
+            self._accumulator_s = 0.0
+        else:
+            self._accumulator_s = max(0.0, self._accumulator_s - n_steps * dt)
+
+        tracker_divider = self.tracker_divider
+        low_level_divider = self.low_level_divider
+        ticks = []
+        for step in range(self._step, self._step + n_steps):
+            ticks.append(
+                self.Tick(
+                    step=step,
+                    dt=dt,
+                    run_tracker=step % tracker_divider == 0,
+                    run_low_level=step % low_level_divider == 0,
+                )
+            )
+        self._step += n_steps
+        return ticks
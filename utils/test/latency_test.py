@@ -0,0 +1,60 @@
+from utils.latency import LatencyMonitor, LatencyStats
+import json
+import numpy as np
+
+
+def test_rolling_percentiles():
+    stats = LatencyStats(window=100, budget_ms=50.0)
+    assert np.isnan(stats.p50)
+    for duration_ms in range(200):
+        stats.add(float(duration_ms))
+
+    # only the last 100 calls are in the window, the counters cover all calls
+    np.testing.assert_allclose(stats.samples.min(), 100.0)
+    np.testing.assert_allclose(stats.p50, 149.5)
+    np.testing.assert_allclose(stats.p99, np.percentile(np.arange(100, 200), 99))
+    assert stats.n_calls == 200
+    assert stats.max_ms == 199.0
+    assert stats.n_over_budget == 149
+
+
+def test_monitor_budgets_and_json(tmp_path):
+    monitor = LatencyMonitor(LatencyMonitor.Params(window=10, frame_budget_ms=10.0, budgets_ms={"tracker.mpc": 4.0},
+                                                   budget_shares={}))
+    with monitor.measure("render"):
+        pass
+    monitor.record("tracker.mpc", 5.0)
+    monitor.record("tracker.mpc", 1.0)
+    for duration_ms in (5.0, 20.0, 30.0):
+        monitor.record(LatencyMonitor.FRAME, duration_ms)
+
+    assert monitor.stats["tracker.mpc"].n_over_budget == 1
+    assert monitor.stats["render"].budget_ms is None and monitor.stats["render"].n_over_budget == 0
+    assert monitor.frames_over_budget == 2
+
+    monitor.begin_frame()
+    monitor.end_frame()
+    assert monitor.stats[LatencyMonitor.FRAME].n_calls == 4
+
+    file_path = tmp_path / "latency.json"
+    monitor.dump(str(file_path))
+    dump = json.loads(file_path.read_text())
+    assert sorted(dump) == ["frame", "render", "tracker.mpc"]
+    assert dump["tracker.mpc"]["p50_ms"] == 3.0 and dump["tracker.mpc"]["n_over_budget"] == 1
+
+    monitor.reset()
+    assert monitor.frames_over_budget == 0 and not monitor.stats
+
+
+def test_default_budgets_are_shares_of_the_frame():
+    params = LatencyMonitor.Params(frame_budget_ms=20.0, budgets_ms={"tracker.mpc": 1.0})
+    assert params.budget_ms("tracker.lqr_dynamic") == 0.25 * 20.0
+    assert params.budget_ms("tracker.mpc") == 1.0
+    assert params.budget_ms("render") == 0.4 * 20.0
+    assert params.budget_ms("unknown") is None
+    assert sum(params.budget_shares.values()) <= 1.0
+
+    monitor = LatencyMonitor(params)
+    monitor.record("motion_model", 2.0)
+    monitor.record("motion_model", 4.0)
+    assert monitor.stats["motion_model"].n_over_budget == 1
@@ -0,0 +1,40 @@
+from utils.scheduler import MultiRateScheduler
+import pytest
+import numpy as np
+
+
+@pytest.fixture
+def scheduler():
+    return MultiRateScheduler(
+        MultiRateScheduler.Params(
+            dynamics_hz=120, tracker_hz=30, low_level_hz=60, max_steps_per_frame=8
+        )
+    )
+
+
+def test_substeps_follow_simulated_time(scheduler):
+    # 1/30s frames of simulated time -> 4 dynamics substeps each, whatever the render rate
+    n_steps = [len(scheduler.advance(1 / 30)) for _ in range(10)]
+    assert n_steps == [4] * 10
+
+    # a frame shorter than a substep is carried over in the accumulator
+    assert len(scheduler.advance(0.5 / 120)) == 0
+    assert np.isclose(scheduler.alpha, 0.5)
+    assert len(scheduler.advance(0.5 / 120)) == 1
+
+
+def test_controller_rates(scheduler):
+    ticks = scheduler.advance(1.0)[:8]
+    assert [tick.run_tracker for tick in ticks] == [True, False, False, False] * 2
+    assert [tick.run_low_level for tick in ticks] == [True, False] * 4
+    assert np.isclose(scheduler.tracker_dt, 1 / 30)
+    assert np.isclose(scheduler.low_level_dt, 1 / 60)
+
+
+def test_long_frame_catch_up_is_bounded(scheduler):
+    ticks = scheduler.advance(1.0)
+    assert len(ticks) == scheduler.params.max_steps_per_frame
+    assert np.isclose(scheduler.dropped_s, 1.0 - 8 / 120)
+    # the dropped backlog does not spill into the next frame
+    assert len(scheduler.advance(1 / 120)) == 1
+    assert [tick.step for tick in ticks] == list(range(8))